@@ -1,17 +1,33 @@
-from typing import Dict, List, Any, AsyncIterator, Optional
+from typing import Dict, List, Any, AsyncIterator, Callable, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import contextvars
+import json
 import logging
+import os
 import re
+import time
 from pathlib import Path
 from dotenv import load_dotenv
 
 from langgraph.graph import StateGraph, END
+from langgraph.config import get_stream_writer
 
 # Import Tools
 from agent.tools import (
     search_youtube_videos,
     generate_mermaid_for_topic,
+    generate_flashcards_for_topic,
+    generate_quiz_for_topic,
+    generic_flashcards,
 )
-from agent.llm import LLMClient
+from agent.llm import LLMClient, track_usage
+from agent.profiles import DEFAULT_DEPTH, get_profile
+from agent.checkpoint import get_checkpointer
+from core.cancellation import raise_if_cancelled
+from core.deadline import DeadlineExceeded, current_deadline, deadline_scope
+from core.metrics import metrics
+from core.module_cache import module_cache
+from core.prompt_index import prompt_index
 
 # Setup
 env_path = Path(__file__).resolve().parent.parent / ".env"
@@ -21,6 +37,21 @@ load_dotenv(dotenv_path=env_path)
 llm_client = LLMClient()
 logger = logging.getLogger(__name__)
 
+# Share of a module's remaining time the subtopic and video stages may use
+# before they degrade; the content package gets whatever is left
+SUBTOPICS_BUDGET = 0.15
+VIDEOS_BUDGET = 0.35
+
+# single: one JSON completion per module | fanout: one call per subtopic, plus
+# flashcards, quiz and diagram, all in parallel
+MODULE_GENERATION_MODE = os.getenv("MODULE_GENERATION_MODE", "single").strip().lower()
+# Parallel LLM calls a single fan-out module may make
+FANOUT_MAX_CONCURRENCY = int(os.getenv("FANOUT_MAX_CONCURRENCY", "6"))
+
+# Part of the shared module cache key: bump it whenever the module prompts or
+# depth profiles change, so modules written by the old prompts stop being served
+MODULE_PROMPT_VERSION = "1"
+
 # -------------------------------------------------------------------
 # STATE
 # -------------------------------------------------------------------
@@ -28,6 +59,15 @@ logger = logging.getLogger(__name__)
 class CourseState(dict):
     """Represents the flow state of course generation."""
     prompt: str
+    user_id: Optional[str]
+    # Leave flashcards and quiz out of generated modules (made on first access)
+    lazy_assessments: bool
+    # Depth profile name, see agent/profiles.py
+    depth: str
+    # Serve and store modules through the cross-user module cache
+    shared_cache: bool
+    # Title and topics were taken from a near-identical earlier prompt
+    reused_outline: bool
     enhanced_prompt: str
     topics: List[str]
     pending_topics: List[str]
@@ -88,7 +128,7 @@ Requirements:
 
 PROMPT_SUBTOPICS_SYS = "You are a subject matter expert. Return raw JSON array only."
 PROMPT_SUBTOPICS_USER = """
-For the course module "{topic}", generate 4–6 detailed submodules.
+For the course module "{topic}", generate {count} detailed submodules.
 Each submodule should represent a single, clear learning unit (e.g., "Arithmetic Operators" instead of "Operators and Expressions").
 Return ONLY a JSON array of short, descriptive strings.
 """
@@ -139,12 +179,66 @@ Requirements:
 Return ONLY a JSON object with keys: "explanations", "flashcards", "quiz", "mermaid".
 """
 
+PROMPT_REGENERATE_SUBTOPIC_USER = """
+REGENERATE one subtopic of the module "{topic}": "{subtopic}".
+Other subtopics of the module (do not cover them): {subtopics}
+
+ORIGINAL EXPLANATION (excerpt):
+{original_content}
+
+Requirements:
+- Expand the explanation to be twice as detailed.
+- Return ONLY the markdown explanation of this subtopic, no JSON and no preamble.
+"""
+
+PROMPT_SUBTOPIC_EXPLAIN_SYS = """You are an expert technical instructor writing one section of a course module.
+
+Write a textbook-level explanation of the given subtopic.
+{detail}
+Structure it with at least {sections} of these exact markdown headings (e.g. `### 1. Topic Introduction`):
+1. Topic Introduction
+2. Core Concepts
+3. Foundational Background
+4. Detailed Explanation
+5. Concept Breakdown / Mechanism / Theory Analysis
+6. Examples / Case Studies / Illustrations
+7. Applications / Significance
+8. Key Insights or Important Points
+9. Recap Summary
+
+Adapt content logically: derive for math/physics, explain principles for science, analyze frameworks for humanities.
+Return ONLY the markdown explanation, no JSON and no preamble.
+"""
+
+PROMPT_SUBTOPIC_EXPLAIN_USER = """
+Module: "{topic}"
+All subtopics of the module (for context, do not cover the others): {subtopics}
+Write the explanation for this subtopic: "{subtopic}"
+Related video: {video}
+"""
+
+PROMPT_DIAGRAM_SYS = """You design Mermaid.js diagrams for course modules.
+Return ONLY Mermaid code (graph LR), no markdown fences and no commentary.
+The diagram must visually explain the core process or logic of the module, not give a generic overview.
+Use 'style' commands for colors (e.g., style NodeA fill:#f96).
+"""
+
+PROMPT_DIAGRAM_USER = """
+Module: "{topic}"
+Subtopics: {subtopics}
+"""
+
 
 # -------------------------------------------------------------------
 # NODES
 # -------------------------------------------------------------------
 
 def node_validate_prompt(state: CourseState) -> CourseState:
+    if state.get("reused_outline"):
+        # The matching prompt was validated when its outline was built
+        state["is_valid"] = True
+        return state
+
     logger.info(f"Validating prompt: {state.get('prompt', '')[:50]}...")
     
     resp = llm_client.invoke(
@@ -165,6 +259,9 @@ def node_validate_prompt(state: CourseState) -> CourseState:
 
 
 def node_enhance_prompt(state: CourseState) -> CourseState:
+    if state.get("reused_outline"):
+        return state
+
     resp = llm_client.invoke(
         system_prompt=PROMPT_ENHANCER_SYS,
         human_prompt_template=PROMPT_ENHANCER_USER,
@@ -187,17 +284,20 @@ def node_enhance_prompt(state: CourseState) -> CourseState:
 
 
 def node_generate_topics(state: CourseState) -> CourseState:
-    resp = llm_client.invoke(
-        system_prompt=PROMPT_TOPICS_SYS,
-        human_prompt_template=PROMPT_TOPICS_USER,
-        input_vars={"title": state["enhanced_prompt"]}
-    )
-
-    if isinstance(resp, list):
-        state["topics"] = [str(item) if not isinstance(item, str) else item for item in resp]
-    else:
-        # Fallback or strict error
-        state["topics"] = [f"Module {i}: General Concept" for i in range(1, 6)]
+    if not state.get("reused_outline"):
+        resp = llm_client.invoke(
+            system_prompt=PROMPT_TOPICS_SYS,
+            human_prompt_template=PROMPT_TOPICS_USER,
+            input_vars={"title": state["enhanced_prompt"]}
+        )
+
+        if isinstance(resp, list):
+            state["topics"] = [str(item) if not isinstance(item, str) else item for item in resp]
+            # Near-identical prompts can reuse this title and outline from now on
+            prompt_index.add(state["prompt"], state["enhanced_prompt"], state["topics"])
+        else:
+            # Fallback or strict error
+            state["topics"] = [f"Module {i}: General Concept" for i in range(1, 6)]
         
     state["pending_topics"] = state["topics"][:]
     state["generated_modules"] = {}
@@ -211,20 +311,105 @@ def node_generate_topics(state: CourseState) -> CourseState:
 # Removed score_video_relevance
 
 
-def generate_module_content(topic: str, course_title: str = "") -> Dict[str, Any]:
-    """Generates full content for a single module (public helper)."""
-    subtopics = _generate_subtopics(topic)
+def generate_module_content(
+    topic: str,
+    course_title: str = "",
+    mode: Optional[str] = None,
+    on_subtopic: Optional[Callable[[str, str], None]] = None,
+    include_assessments: bool = True,
+    depth: str = DEFAULT_DEPTH,
+    use_cache: bool = True,
+) -> Dict[str, Any]:
+    """
+    Generates full content for a single module (public helper) at the given
+    depth profile (see agent/profiles.py).
+
+    Modules are shared between users through the module cache (see
+    core/module_cache.py) unless `use_cache` is off, so an identical course
+    title and topic is only generated once.
+
+    `mode` overrides MODULE_GENERATION_MODE; in fan-out mode `on_subtopic` is
+    called with (subtopic, explanation) as each explanation completes. Without
+    `include_assessments` the module is marked "lazy_assessments" and its
+    flashcards and quiz are generated on first access instead.
+
+    Under a deadline each stage gets a share of the remaining time. A stage
+    that runs out degrades instead of failing, and is listed under "degraded".
+    """
+    mode = mode or MODULE_GENERATION_MODE
+    cache_key = None
+    if use_cache and module_cache.enabled:
+        cache_key = module_cache.key(course_title, topic, MODULE_PROMPT_VERSION, depth, include_assessments)
+        cached = module_cache.get(cache_key)
+        if cached is not None:
+            # Keep this course's spelling of the title
+            cached["module_title"] = topic
+            return cached
+
+    started = time.monotonic()
+    with track_usage() as usage:
+        module = _generate_module(topic, course_title, mode, on_subtopic, include_assessments, depth)
+
+    # Per-profile cost and latency, to pick defaults from data
+    metrics.observe("module.generation_seconds", time.monotonic() - started, depth=depth, mode=mode)
+    metrics.observe("module.output_tokens", usage["output_tokens"], depth=depth, mode=mode)
+    metrics.observe("module.llm_calls", usage["calls"], depth=depth, mode=mode)
+
+    if cache_key is not None:
+        module_cache.put(cache_key, module, topic)
+    return module
+
+
+def _generate_module(
+    topic: str,
+    course_title: str,
+    mode: str,
+    on_subtopic: Optional[Callable[[str, str], None]],
+    include_assessments: bool,
+    depth: str,
+) -> Dict[str, Any]:
+    profile = get_profile(depth)
+    deadline = current_deadline()
+    degraded = []
+
+    with deadline_scope(deadline.budget(SUBTOPICS_BUDGET) if deadline else None) as stage:
+        subtopics = _generate_subtopics(topic, depth)
+        if stage is not None and stage.expired:
+            degraded.append("subtopics")
 
     # Fetch and select 1 highly relevant video per subtopic.
     # Include the course subject in the search query for contextual, domain-specific results.
     selected_videos = []
-    for st in subtopics:
-        video = _fetch_video_with_retry(st, topic, course_title)
-        selected_videos.append(video)
-
-    # Single LLM call per module to get everything
-    package = _generate_module_package(topic, subtopics, selected_videos)
+    with deadline_scope(deadline.budget(VIDEOS_BUDGET) if deadline else None) as stage:
+        for st in subtopics:
+            if stage is not None and stage.expired:
+                selected_videos.append(None)
+                continue
+            video = _fetch_video_with_retry(st, topic, course_title)
+            selected_videos.append(video)
+        if stage is not None and stage.expired:
+            degraded.append("videos")
+
+    if mode == "fanout":
+        package = _generate_module_package_fanout(
+            topic, subtopics, selected_videos, on_subtopic, include_assessments, profile
+        )
+    else:
+        # Single LLM call per module to get everything
+        package = _generate_module_package(topic, subtopics, selected_videos, include_assessments, profile)
     explanations = package.get("explanations", {})
+    if package.get("truncated"):
+        degraded.append("explanations")
+        if include_assessments:
+            degraded.extend(part for part in ("flashcards", "quiz") if not package.get(part))
+
+    mermaid = package.get("mermaid", "")
+    if not mermaid:
+        # Deterministic outline diagram when the package has none; that only
+        # counts as degraded if the deadline is why the diagram is missing
+        mermaid = generate_mermaid_for_topic(topic, subtopics)
+        if package.get("truncated") or (deadline is not None and deadline.expired):
+            degraded.append("diagram")
 
     # Ensure contextual placement: Attach [[VIDEO_i]] tag to the end of each subtopic 
     # if the LLM didn't already place it, ensuring every subtopic has its corresponding video.
@@ -238,14 +423,52 @@ def generate_module_content(topic: str, course_title: str = "") -> Dict[str, Any
             # Clean up broken tags if no video exists
             explanations[key] = explanations[key].replace(f"[[VIDEO_{i}]]", "")
 
-    return {
+    module = {
         "module_title": topic,
         "explanations": explanations,
         "videos": selected_videos,
-        "mermaid": package.get("mermaid", ""),
+        "mermaid": mermaid,
         "flashcards": package.get("flashcards", []),
         "quiz": package.get("quiz", []),
+        "summary": summarize_module(explanations),
     }
+    if not include_assessments:
+        module["lazy_assessments"] = True
+    if degraded:
+        logger.warning(f"Module '{topic}' degraded to meet its deadline: {', '.join(degraded)}")
+        module["degraded"] = degraded
+    return module
+
+
+def generate_module_assessment(
+    topic: str, module: Dict[str, Any], kind: str, depth: str = DEFAULT_DEPTH
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Generates the "flashcards" or "quiz" of an already generated module.
+    Returns the items and whether they are only a fallback (generic flashcards
+    or an empty quiz) that should not be stored.
+    """
+    profile = get_profile(depth)
+    subtopics = list(module.get("explanations", {}).keys()) or _generate_subtopics(topic, depth)
+    if kind == "flashcards":
+        cards = generate_flashcards_for_topic(topic, subtopics, count=profile["flashcards"], fallback=False)
+        if not cards:
+            return generic_flashcards(topic), True
+        return cards, False
+    # The quiz tool validates questions with _filter_and_clean_questions
+    questions = generate_quiz_for_topic(topic, subtopics, num_questions=profile["quiz_questions"])
+    return questions, not questions
+
+
+def summarize_module(explanations: Dict[str, str]) -> str:
+    """
+    A bare-bones summary of a module's explanations, stored with the module so
+    regeneration has a base to work from without sending the full content.
+    """
+    summary = ""
+    for st, exp in explanations.items():
+        summary += f"### {st}\n{exp[:300]}...\n\n"
+    return summary
 
 
 def regenerate_module_content(topic: str, original_data: Dict[str, Any], course_title: str = "") -> Dict[str, Any]:
@@ -254,10 +477,8 @@ def regenerate_module_content(topic: str, original_data: Dict[str, Any], course_
     if not subtopics:
         subtopics = _generate_subtopics(topic)
 
-    # Extract a bare-bones summary of original content to avoid context bloat but give LLM a base
-    original_summary = ""
-    for st, exp in original_data.get("explanations", {}).items():
-        original_summary += f"### {st}\n{exp[:300]}...\n\n"
+    # Modules generated before summaries were stored get one on the fly
+    original_summary = original_data.get("summary") or summarize_module(original_data.get("explanations", {}))
 
     # We reuse the same videos
     selected_videos = original_data.get("videos", [])
@@ -292,17 +513,97 @@ def regenerate_module_content(topic: str, original_data: Dict[str, Any], course_
         "mermaid": resp.get("mermaid", original_data.get("mermaid", "")),
         "flashcards": resp.get("flashcards", original_data.get("flashcards", [])),
         "quiz": resp.get("quiz", original_data.get("quiz", [])),
+        "summary": summarize_module(explanations),
         "is_regenerated": True
     }
 
 
+def regenerate_module_parts(
+    topic: str,
+    module: Dict[str, Any],
+    subtopics: List[str],
+    quiz: bool = False,
+    flashcards: bool = False,
+    diagram: bool = False,
+    depth: str = DEFAULT_DEPTH,
+) -> Dict[str, Any]:
+    """
+    Regenerates only the requested parts of a module, in parallel, and returns
+    just those fields ("explanations" holds the regenerated subtopics only).
+    """
+    profile = get_profile(depth)
+    all_subtopics = list(module.get("explanations", {}).keys())
+    videos = module.get("videos", [])
+
+    def regenerate(subtopic: str) -> str:
+        text = llm_client.invoke(
+            system_prompt=PROMPT_REGENERATE_SYS,
+            human_prompt_template=PROMPT_REGENERATE_SUBTOPIC_USER,
+            input_vars={
+                "topic": topic,
+                "subtopic": subtopic,
+                "subtopics": ", ".join(st for st in all_subtopics if st != subtopic),
+                "original_content": module["explanations"][subtopic][:300] + "...",
+            },
+            require_json=False,
+        )
+        if not text:
+            return ""
+        i = all_subtopics.index(subtopic)
+        if i < len(videos) and videos[i] is not None and f"[[VIDEO_{i}]]" not in text:
+            text = text.strip() + f"\n\n[[VIDEO_{i}]]"
+        return text
+
+    parts: Dict[str, Any] = {}
+    with ThreadPoolExecutor(max_workers=max(1, FANOUT_MAX_CONCURRENCY)) as pool:
+        explained = {st: _submit(pool, regenerate, st) for st in subtopics}
+        quiz_future = (
+            _submit(pool, generate_quiz_for_topic, topic, all_subtopics, profile["quiz_questions"]) if quiz else None
+        )
+        flashcards_future = (
+            _submit(pool, generate_flashcards_for_topic, topic, all_subtopics, profile["flashcards"]) if flashcards else None
+        )
+        diagram_future = _submit(pool, _generate_module_diagram, topic, all_subtopics) if diagram else None
+
+        explanations = {st: future.result() for st, future in explained.items()}
+        if explanations:
+            # A subtopic that failed keeps its old explanation
+            parts["explanations"] = {st: text for st, text in explanations.items() if text}
+        if quiz_future is not None:
+            parts["quiz"] = quiz_future.result()
+        if flashcards_future is not None:
+            parts["flashcards"] = flashcards_future.result()
+        if diagram_future is not None:
+            parts["mermaid"] = diagram_future.result()
+
+    # Never replace existing content with an empty result
+    return {field: value for field, value in parts.items() if value}
+
+
 def node_generate_module(state: CourseState) -> CourseState:
     if not state["pending_topics"]:
         return state
+    raise_if_cancelled()
     
     current_topic = state["pending_topics"].pop(0)
     course_title = state.get("enhanced_prompt", "")
-    state["generated_modules"][current_topic] = generate_module_content(current_topic, course_title=course_title)
+
+    # Fan-out mode streams each explanation to the client as soon as it is written
+    writer = get_stream_writer()
+    def on_subtopic(subtopic: str, explanation: str) -> None:
+        writer({
+            "type": "subtopic",
+            "module_title": current_topic,
+            "subtopic": subtopic,
+            "explanation": explanation,
+        })
+
+    state["generated_modules"][current_topic] = generate_module_content(
+        current_topic, course_title=course_title, on_subtopic=on_subtopic,
+        include_assessments=not state.get("lazy_assessments", False),
+        depth=state.get("depth") or DEFAULT_DEPTH,
+        use_cache=state.get("shared_cache", True)
+    )
     return state
 
 
@@ -326,13 +627,17 @@ def _generate_module_package(
     topic: str,
     subtopics: List[str],
     videos: List[Dict[str, Any]],
+    include_assessments: bool = True,
+    profile: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
     """
     Use a single LLM call to generate explanations, flashcards, quiz, 
-    and a custom Mermaid diagram for a module.
+    and a custom Mermaid diagram for a module. Without `include_assessments`
+    flashcards and quiz are left out (they are generated on first access).
     """
+    profile = profile or get_profile()
     video_context = "\n".join(
-        [f"Video {i}: {v.get('title', 'Video')}" for i, v in enumerate(videos)]
+        [f"Video {i}: {v.get('title', 'Video')}" for i, v in enumerate(videos) if v]
     ) or "No videos available."
 
     system_prompt = """
@@ -341,10 +646,9 @@ You create deep explanations, practical flashcards, rigorous quizzes, and detail
 
 TASK:
 - For the given module topic and its subtopics, generate:
-  1) Detailed explanations per subtopic (with optional [[MERMAID]] and [[VIDEO_i]] tags)
-  2) 5–8 spaced-repetition flashcards
-  3) 6 multiple-choice quiz questions
-  4) Exactly ONE Mermaid diagram (graph LR) that visually explains the core process or logic of this module.
+  - Detailed explanations per subtopic (with optional [[MERMAID]] and [[VIDEO_i]] tags)
+  - Exactly ONE Mermaid diagram (graph LR) that visually explains the core process or logic of this module.
+{assessment_tasks}
 
 AVAILABLE RESOURCES:
 - Topic: {topic}
@@ -353,8 +657,7 @@ AVAILABLE RESOURCES:
 {video_context}
 
 EXPLANATIONS REQUIREMENTS:
-- DO NOT summarize. Expand every concept thoroughly, providing MAXIMUM detail.
-- Prefer completeness over brevity. Write extremely comprehensive paragraphs.
+{detail}
 - Tone: Educational, professional, and textbook-level.
 
 FOR EVERY SUBTOPIC, you MUST structure your explanation using the following exact numbered headings. Do not alter the names of these headings. You can use markdown like `### 1. Topic Introduction` but the text MUST match exactly one of the following:
@@ -369,7 +672,7 @@ FOR EVERY SUBTOPIC, you MUST structure your explanation using the following exac
 9. Recap Summary
 
 Rules for Subtopic Explanations:
-- You must generate AT LEAST 4-5 of the above structure sections for each subtopic.
+- You must generate AT LEAST {sections} of the above structure sections for each subtopic.
 - NEVER combine everything into a single short paragraph. Break the text under each heading into detailed, in-depth explanations.
 - Adapt content logically: derive logically for math/physics, explain principles for science, analyze frameworks for humanities. Let the content be natural.
 - The keys within the "explanations" JSON object MUST EXACTLY MATCH the items listed in Subtopics. Do not alter the subtopic names at all.
@@ -380,41 +683,75 @@ DIAGRAM REQUIREMENTS:
 - Format: Mermaid.js (graph LR)
 - Content: Must be specific to this module's logic, not a generic overview.
 - Styling: Use 'style' commands for colors (e.g., style NodeA fill:#f96).
-
-FLASHCARDS REQUIREMENTS:
-- 5–8 items
-- JSON array: {{ "front": "...", "back": "..." }}
-
-QUIZ REQUIREMENTS:
-- 6 questions testing SUBJECT MATTER knowledge.
-- Fields: "question", "options" (4), "answer_index" (0-3), "explanation".
-
+{assessment_requirements}
 OUTPUT FORMAT (JSON ONLY, NO MARKDOWN):
 {{
-  "explanations": {{ "Subtopic": "..." }},
-  "flashcards": [ ... ],
-  "quiz": [ ... ],
+  "explanations": {{ "Subtopic": "..." }},{assessment_keys}
   "mermaid": "graph LR\\n    A[Step 1] --> B[Step 2]..."
 }}
 """.strip()
 
     human_prompt = (
-        "Generate explanations, flashcards, and quiz content for:\n"
+        "Generate {content} for:\n"
         "Topic: {topic}\n"
         "Subtopics: {subtopics}\n"
-        "Return ONLY the JSON object with keys 'explanations', 'flashcards', and 'quiz'."
+        "Return ONLY the JSON object with keys {keys}."
     )
 
-    resp = llm_client.invoke(
-        system_prompt=system_prompt,
-        human_prompt_template=human_prompt,
-        input_vars={
-            "topic": topic,
-            "subtopics": ", ".join(subtopics),
-            "video_context": video_context,
-        },
-        require_json=True,
-    )
+    # Filled in as prompt variables, so braces here are literal
+    if include_assessments:
+        assessment_vars = {
+            "assessment_tasks": (
+                f"  - {profile['flashcards']} spaced-repetition flashcards\n"
+                f"  - {profile['quiz_questions']} multiple-choice quiz questions"
+            ),
+            "assessment_requirements": (
+                "\nFLASHCARDS REQUIREMENTS:\n"
+                f"- {profile['flashcards']} items\n"
+                '- JSON array: { "front": "...", "back": "..." }\n'
+                "\nQUIZ REQUIREMENTS:\n"
+                f"- {profile['quiz_questions']} questions testing SUBJECT MATTER knowledge.\n"
+                '- Fields: "question", "options" (4), "answer_index" (0-3), "explanation".\n'
+            ),
+            "assessment_keys": '\n  "flashcards": [ ... ],\n  "quiz": [ ... ],',
+            "content": "explanations, flashcards, and quiz content",
+            "keys": "'explanations', 'flashcards', 'quiz', and 'mermaid'",
+        }
+    else:
+        assessment_vars = {
+            "assessment_tasks": "- Do NOT generate flashcards or quiz questions.",
+            "assessment_requirements": "",
+            "assessment_keys": "",
+            "content": "explanations and the diagram",
+            "keys": "'explanations' and 'mermaid'",
+        }
+
+    try:
+        resp = llm_client.invoke(
+            system_prompt=system_prompt,
+            human_prompt_template=human_prompt,
+            input_vars={
+                "topic": topic,
+                "subtopics": ", ".join(subtopics),
+                "video_context": video_context,
+                "detail": profile["detail"],
+                "sections": profile["sections"],
+                **assessment_vars,
+            },
+            require_json=True,
+            raise_on_deadline=True,
+            max_output_tokens=profile["max_output_tokens"],
+        )
+    except DeadlineExceeded as e:
+        # Ship whatever explanations were written before time ran out
+        logger.warning(f"Module package for '{topic}' cut short by the deadline.")
+        return {
+            "explanations": _salvage_explanations(e.partial, subtopics),
+            "flashcards": [],
+            "quiz": [],
+            "mermaid": "",
+            "truncated": True,
+        }
 
     if isinstance(resp, dict):
         return resp
@@ -429,11 +766,139 @@ OUTPUT FORMAT (JSON ONLY, NO MARKDOWN):
     }
 
 
-def _generate_subtopics(topic: str) -> List[str]:
+def _submit(pool: ThreadPoolExecutor, fn: Callable[..., Any], *args):
+    """Submits to `pool` in a copy of the current context, so deadlines and cancellation follow the call."""
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
+
+def _generate_module_diagram(topic: str, subtopics: List[str]) -> str:
+    """LLM-designed Mermaid diagram for a module, or "" if none usable came back."""
+    code = llm_client.invoke(
+        system_prompt=PROMPT_DIAGRAM_SYS,
+        human_prompt_template=PROMPT_DIAGRAM_USER,
+        input_vars={"topic": topic, "subtopics": ", ".join(subtopics)},
+        require_json=False,
+    )
+    code = re.sub(r"^```(?:mermaid)?\s*|\s*```$", "", code or "").strip()
+    return code if code.startswith("graph") else ""
+
+
+def _generate_module_package_fanout(
+    topic: str,
+    subtopics: List[str],
+    videos: List[Optional[Dict[str, Any]]],
+    on_subtopic: Optional[Callable[[str, str], None]] = None,
+    include_assessments: bool = True,
+    profile: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Same result as `_generate_module_package`, but every subtopic explanation,
+    the flashcards, the quiz and the diagram come from separate LLM calls run
+    in parallel, so latency follows the longest call instead of the sum.
+    """
+    profile = profile or get_profile()
+    # The module's output budget is shared by its explanations
+    max_tokens = profile["max_output_tokens"]
+    max_tokens_per_subtopic = max_tokens // max(1, len(subtopics)) if max_tokens else None
+
+    def explain(index: int, subtopic: str) -> Tuple[str, bool]:
+        video = videos[index] if index < len(videos) else None
+        try:
+            text = llm_client.invoke(
+                system_prompt=PROMPT_SUBTOPIC_EXPLAIN_SYS,
+                human_prompt_template=PROMPT_SUBTOPIC_EXPLAIN_USER,
+                input_vars={
+                    "topic": topic,
+                    "subtopics": ", ".join(subtopics),
+                    "subtopic": subtopic,
+                    "video": video.get("title", "Video") if video else "None",
+                    "detail": profile["detail"],
+                    "sections": profile["sections"],
+                },
+                require_json=False,
+                raise_on_deadline=True,
+                max_output_tokens=max_tokens_per_subtopic,
+            )
+        except DeadlineExceeded as e:
+            if not e.partial:
+                return "", True
+            return e.partial.rstrip() + "\n\n*(This section was shortened to meet the time limit.)*", True
+        if text and on_subtopic:
+            on_subtopic(subtopic, text)
+        return text or "", False
+
+    explanations: Dict[str, str] = {}
+    truncated = False
+    with ThreadPoolExecutor(max_workers=max(1, FANOUT_MAX_CONCURRENCY)) as pool:
+        # Explanations go first: they are what the learner reads first
+        explained = {_submit(pool, explain, i, st): st for i, st in enumerate(subtopics)}
+        flashcards = quiz = None
+        if include_assessments:
+            flashcards = _submit(pool, generate_flashcards_for_topic, topic, subtopics, profile["flashcards"])
+            quiz = _submit(pool, generate_quiz_for_topic, topic, subtopics, profile["quiz_questions"])
+        mermaid = _submit(pool, _generate_module_diagram, topic, subtopics)
+
+        for future in as_completed(explained):
+            text, cut = future.result()
+            truncated = truncated or cut
+            if text:
+                explanations[explained[future]] = text
+
+        package = {
+            # Keep the subtopic order regardless of completion order
+            "explanations": {st: explanations[st] for st in subtopics if st in explanations},
+            "flashcards": flashcards.result() if flashcards else [],
+            "quiz": quiz.result() if quiz else [],
+            "mermaid": mermaid.result(),
+        }
+    if truncated:
+        package["truncated"] = True
+    return package
+
+
+def _read_json_string(text: str, start: int) -> Tuple[str, bool]:
+    """Decodes the JSON string body starting at `start`; also reports whether it was closed."""
+    i = start
+    while i < len(text):
+        if text[i] == '"':
+            return json.loads('"' + text[start:i] + '"', strict=False), True
+        if text[i] == "\\":
+            # An escape sequence cut in half ends the usable text
+            width = 6 if text[i + 1:i + 2] == "u" else 2
+            if i + width > len(text):
+                break
+            i += width
+            continue
+        i += 1
+    try:
+        return json.loads('"' + text[start:i] + '"', strict=False), False
+    except ValueError:
+        return text[start:i], False
+
+
+def _salvage_explanations(partial: str, subtopics: List[str]) -> Dict[str, str]:
+    """Recovers the subtopic explanations a cut-off package response had already written."""
+    start = partial.find('"explanations"')
+    if start < 0:
+        return {}
+    text = partial[start:]
+    explanations = {}
+    for match in re.finditer(r'"((?:[^"\\]|\\.)*)"\s*:\s*"', text):
+        key = match.group(1)
+        if key not in subtopics or key in explanations:
+            continue
+        body, closed = _read_json_string(text, match.end())
+        if not closed:
+            body = body.rstrip() + "\n\n*(This section was shortened to meet the time limit.)*"
+        explanations[key] = body
+    return explanations
+
+
+def _generate_subtopics(topic: str, depth: str = DEFAULT_DEPTH) -> List[str]:
     resp = llm_client.invoke(
         system_prompt=PROMPT_SUBTOPICS_SYS,
         human_prompt_template=PROMPT_SUBTOPICS_USER,
-        input_vars={"topic": topic}
+        input_vars={"topic": topic, "count": get_profile(depth)["subtopics"]}
     )
     
     if isinstance(resp, list):
@@ -481,10 +946,14 @@ def _fetch_video_with_retry(subtopic: str, topic: str, course_title: str) -> Opt
     # 3. Search and Validate
     seen_queries = set()
     first_result = None
+    deadline = current_deadline()
     
     for q in queries:
         if q in seen_queries:
             continue
+        if seen_queries and deadline is not None and deadline.expired:
+            # Out of time: skip the remaining retries
+            break
         seen_queries.add(q)
         
         logger.info(f"Searching YouTube for: {q}")
@@ -518,7 +987,7 @@ def should_continue_after_validation(state: CourseState) -> str:
     return "enhance_prompt"
 
 
-def build_graph():
+def build_graph(checkpointer=None):
     graph = StateGraph(CourseState)
 
     graph.add_node("validate_prompt", node_validate_prompt)
@@ -552,13 +1021,44 @@ def build_graph():
     
     graph.add_edge("finalize_course", END)
 
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
+
+
+def _thread_config(thread_id: str) -> Dict[str, Any]:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def _as_update(mode: str, chunk: Any) -> Dict[str, Any]:
+    """Node updates pass through; progress written by nodes arrives as {"progress": event}."""
+    return chunk if mode == "updates" else {"progress": chunk}
 
 
-async def run_workflow_stream(user_prompt: str, single_step: bool = False) -> AsyncIterator[Dict[str, Any]]:
-    workflow = build_graph()
+async def run_workflow_stream(
+    user_prompt: str,
+    single_step: bool = False,
+    thread_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    lazy_assessments: bool = False,
+    depth: str = DEFAULT_DEPTH,
+    shared_cache: bool = True,
+    outline: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streams node updates of a fresh course generation, interleaved with
+    {"progress": event} chunks written by nodes while they run. With a
+    `thread_id` every node result is checkpointed, so `resume_workflow_stream`
+    can continue it. An `outline` ({"title", "topics"}) of an earlier,
+    near-identical prompt skips validation, title and outline generation.
+    """
+    checkpointer = await get_checkpointer() if thread_id else None
+    workflow = build_graph(checkpointer)
+    config = _thread_config(thread_id) if checkpointer else None
     initial_state = {
         "prompt": user_prompt,
+        "user_id": user_id,
+        "lazy_assessments": lazy_assessments,
+        "depth": depth,
+        "shared_cache": shared_cache,
         "is_valid": True,
         "validation_error": None,
         "single_step": single_step,
@@ -567,6 +1067,44 @@ async def run_workflow_stream(user_prompt: str, single_step: bool = False) -> As
         "generated_modules": {},
         "course": {}
     }
+    if outline:
+        initial_state.update({
+            "reused_outline": True,
+            "enhanced_prompt": outline["title"],
+            "topics": list(outline["topics"]),
+        })
     
-    async for event in workflow.astream(initial_state, stream_mode="updates"):
-        yield event
+    async for mode, chunk in workflow.astream(
+        initial_state, config, stream_mode=["updates", "custom"],
+        # Only meaningful (and only supported) with a checkpointer
+        durability="sync" if checkpointer else None
+    ):
+        yield _as_update(mode, chunk)
+
+
+async def get_workflow_state(thread_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns the last checkpointed state of a generation as
+    {"values": {...}, "next": [pending node names]}, or None if there is none.
+    """
+    checkpointer = await get_checkpointer()
+    if checkpointer is None:
+        return None
+
+    snapshot = await build_graph(checkpointer).aget_state(_thread_config(thread_id))
+    if not snapshot or not snapshot.values:
+        return None
+    return {"values": dict(snapshot.values), "next": list(snapshot.next)}
+
+
+async def resume_workflow_stream(thread_id: str) -> AsyncIterator[Dict[str, Any]]:
+    """Continues a checkpointed generation from its last completed node."""
+    checkpointer = await get_checkpointer()
+    if checkpointer is None:
+        return
+
+    workflow = build_graph(checkpointer)
+    async for mode, chunk in workflow.astream(
+        None, _thread_config(thread_id), stream_mode=["updates", "custom"], durability="sync"
+    ):
+        yield _as_update(mode, chunk)
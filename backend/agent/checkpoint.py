@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+try:
+    from langgraph.checkpoint.base import BaseCheckpointSaver
+except ImportError:
+    BaseCheckpointSaver = None
+
+logger = logging.getLogger(__name__)
+
+# mongo (default) | sqlite | none
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "mongo").strip().lower()
+CHECKPOINT_SQLITE_PATH = os.getenv("CHECKPOINT_SQLITE_PATH", "checkpoints.sqlite")
+# Checkpoints of finished or abandoned generations expire after this many seconds
+CHECKPOINT_TTL_SECONDS = int(os.getenv("CHECKPOINT_TTL_SECONDS", str(7 * 24 * 3600)))
+# After a failed attempt to set up the checkpointer (e.g. MongoDB unreachable),
+# generations run without checkpoints until it is retried this many seconds later
+CHECKPOINT_RETRY_SECONDS = float(os.getenv("CHECKPOINT_RETRY_SECONDS", "60"))
+
+_checkpointer: Optional["BaseCheckpointSaver"] = None
+# Set when checkpointing can never work in this process (disabled or not installed)
+_disabled = CHECKPOINT_BACKEND not in ("mongo", "sqlite") or BaseCheckpointSaver is None
+_retry_at = 0.0
+_lock = asyncio.Lock()
+
+
+def _mongo_checkpointer() -> Optional["BaseCheckpointSaver"]:
+    """Blocking: the saver creates its indexes over the network when constructed."""
+    try:
+        from langgraph.checkpoint.mongodb import MongoDBSaver
+    except ImportError:
+        logger.warning("langgraph-checkpoint-mongodb not installed, checkpointing disabled.")
+        return None
+
+    # The saver runs its (blocking) calls off the event loop itself
+    from db import sync_client, DATABASE_NAME
+    if sync_client is None:
+        logger.warning("Database unavailable, checkpointing disabled.")
+        return None
+
+    return MongoDBSaver(
+        sync_client,
+        db_name=DATABASE_NAME or "ai_course_generator",
+        checkpoint_collection_name="graph_checkpoints",
+        writes_collection_name="graph_checkpoint_writes",
+        ttl=CHECKPOINT_TTL_SECONDS,
+    )
+
+
+def _sqlite_checkpointer() -> Optional["BaseCheckpointSaver"]:
+    """Local stand-in for tests and development without MongoDB."""
+    try:
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    except ImportError:
+        logger.warning("langgraph-checkpoint-sqlite not installed, checkpointing disabled.")
+        return None
+
+    # The connection is opened lazily by the saver on first use
+    return AsyncSqliteSaver(aiosqlite.connect(CHECKPOINT_SQLITE_PATH))
+
+
+async def get_checkpointer() -> Optional["BaseCheckpointSaver"]:
+    """
+    Returns the process-wide graph checkpointer, or None when checkpointing is
+    disabled or unavailable. Must be called from a running event loop; the
+    saver is built in a worker thread, so the loop never waits on MongoDB.
+    """
+    global _checkpointer, _disabled, _retry_at
+    if _checkpointer is not None or _disabled or time.monotonic() < _retry_at:
+        return _checkpointer
+
+    async with _lock:
+        if _checkpointer is not None or _disabled or time.monotonic() < _retry_at:
+            return _checkpointer
+        try:
+            if CHECKPOINT_BACKEND == "mongo":
+                _checkpointer = await asyncio.to_thread(_mongo_checkpointer)
+            else:
+                _checkpointer = _sqlite_checkpointer()
+            # None means the backend cannot be used at all: don't try again
+            _disabled = _checkpointer is None
+        except Exception as e:
+            logger.error(f"Failed to initialize graph checkpointer, retrying in {CHECKPOINT_RETRY_SECONDS:.0f}s: {e}")
+            _retry_at = time.monotonic() + CHECKPOINT_RETRY_SECONDS
+
+    return _checkpointer
+
+
+async def close_checkpointer() -> None:
+    """Releases the sqlite connection, if any, on application shutdown."""
+    conn = getattr(_checkpointer, "conn", None)
+    if conn is not None and hasattr(conn, "close"):
+        try:
+            await conn.close()
+        except Exception as e:
+            logger.error(f"Failed to close checkpointer: {e}")
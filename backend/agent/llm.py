@@ -1,9 +1,16 @@
+import contextvars
 import json
 import os
 import re
 import logging
+import threading
+from contextlib import contextmanager
 from typing import Any, Dict, List, Optional, Union
 
+from core.cancellation import CancelToken, GenerationCancelled, current_token
+from core.deadline import Deadline, DeadlineExceeded, current_deadline
+from core.metrics import metrics
+
 try:
     from langchain_google_genai import ChatGoogleGenerativeAI
     from langchain_core.prompts import ChatPromptTemplate
@@ -13,6 +20,59 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Upper bound for a single provider request, whatever deadline the caller has
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "120"))
+
+# Running totals of completed calls, used to estimate what a cancelled call would have cost
+_usage_lock = threading.Lock()
+_usage = {"calls": 0, "output_tokens": 0}
+
+# Optional per-unit-of-work usage counter, see track_usage()
+_usage_sink: contextvars.ContextVar[Optional[Dict[str, int]]] = contextvars.ContextVar(
+    "llm_usage_sink", default=None
+)
+
+
+@contextmanager
+def track_usage():
+    """
+    Counts the LLM calls and output tokens of the block, including calls made
+    from threads that copied its context (e.g. fan-out workers).
+    """
+    usage = {"calls": 0, "output_tokens": 0}
+    previous = _usage_sink.set(usage)
+    try:
+        yield usage
+    finally:
+        _usage_sink.reset(previous)
+
+
+def _output_tokens(response: Any) -> int:
+    """Output tokens reported by the provider, or a ~4 chars/token estimate."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage.get("output_tokens"):
+        return int(usage["output_tokens"])
+    content = getattr(response, "content", "") or ""
+    return len(str(content)) // 4
+
+
+def _text(response: Any) -> str:
+    raw = response.content if hasattr(response, "content") else str(response)
+    # Gemini returns content as a list of parts, e.g. [{'type': 'text', 'text': '...'}]
+    # Extract all text parts and join them into a single string.
+    if isinstance(raw, list):
+        return " ".join(
+            part.get("text", "") if isinstance(part, dict) else str(part)
+            for part in raw
+        ).strip()
+    return str(raw).strip()
+
+
+def _average_output_tokens() -> float:
+    with _usage_lock:
+        return _usage["output_tokens"] / _usage["calls"] if _usage["calls"] else 0.0
+
+
 class LLMClient:
     """
     A unified client for interacting with Gemini LLMs (via ChatGoogleGenAI)
@@ -41,6 +101,7 @@ class LLMClient:
                     model=self.model_name,
                     temperature=self.temperature,
                     google_api_key=api_key,
+                    timeout=LLM_REQUEST_TIMEOUT,
                 )
             except Exception as e:
                 logger.error(f"Failed to initialize ChatGoogleGenerativeAI: {e}")
@@ -52,7 +113,8 @@ class LLMClient:
     def is_available(self) -> bool:
         return self._llm is not None and ChatPromptTemplate is not None
 
-    def invoke(self, system_prompt: str, human_prompt_template: str, input_vars: Dict[str, Any], require_json: bool = True) -> Union[Dict, List, str, None]:
+    def invoke(self, system_prompt: str, human_prompt_template: str, input_vars: Dict[str, Any], require_json: bool = True,
+               raise_on_deadline: bool = False, max_output_tokens: Optional[int] = None) -> Union[Dict, List, str, None]:
         """
         Executes the LLM chain.
         
@@ -61,6 +123,9 @@ class LLMClient:
             human_prompt_template: The user query template.
             input_vars: Variables to fill into the human prompt.
             require_json: If True, attempts to parse response as JSON.
+            raise_on_deadline: If True, running out of the current deadline raises
+                DeadlineExceeded carrying the partial output instead of returning None.
+            max_output_tokens: Caps the completion length for this call only.
             
         Returns:
             Parsed JSON object (if require_json=True) or raw string. None if failure.
@@ -69,35 +134,91 @@ class LLMClient:
             logger.error("LLM Service is unavailable.")
             return None
 
+        # Don't start a request for a generation that has already been cancelled
+        token = current_token()
+        if token is not None and token.cancelled:
+            metrics.incr("cancellation.llm_requests_saved")
+            metrics.incr("cancellation.output_tokens_saved_estimate", _average_output_tokens())
+            raise GenerationCancelled(token.reason)
+
+        deadline = current_deadline()
+        if deadline is not None and deadline.expired:
+            metrics.incr("deadline.llm_calls_skipped")
+            if raise_on_deadline:
+                raise DeadlineExceeded()
+            return None
+
         try:
             prompt = ChatPromptTemplate.from_messages([
                 ("system", system_prompt),
                 ("human", human_prompt_template),
             ])
             
-            chain = prompt | self._llm
-            response = chain.invoke(input_vars)
-            
-            raw = response.content if hasattr(response, "content") else str(response)
-            
-            # Gemini returns content as a list of parts, e.g. [{'type': 'text', 'text': '...'}]
-            # Extract all text parts and join them into a single string.
-            if isinstance(raw, list):
-                content = " ".join(
-                    part.get("text", "") if isinstance(part, dict) else str(part)
-                    for part in raw
-                ).strip()
+            llm = self._llm.bind(max_output_tokens=max_output_tokens) if max_output_tokens else self._llm
+            chain = prompt | llm
+            if token is None and deadline is None:
+                response = chain.invoke(input_vars)
             else:
-                content = str(raw).strip()
+                response = self._stream_interruptible(chain, input_vars, token, deadline)
+            self._record_usage(response)
+            
+            content = _text(response)
             
             if require_json:
                 return self._parse_json(content)
             return content
             
+        except GenerationCancelled:
+            raise
+        except DeadlineExceeded:
+            if raise_on_deadline:
+                raise
+            logger.warning("LLM call cut short by the generation deadline")
+            return None
         except Exception as e:
             logger.error(f"LLM invocation failed: {e}")
             return None
 
+    def _stream_interruptible(self, chain, input_vars: Dict[str, Any],
+                              token: Optional[CancelToken], deadline: Optional[Deadline]) -> Any:
+        """
+        Streams the completion so it can be abandoned between chunks. Closing
+        the stream drops the provider connection, which stops generation there.
+        """
+        response = None
+        stream = chain.stream(input_vars)
+        try:
+            for chunk in stream:
+                response = chunk if response is None else response + chunk
+                if deadline is not None and deadline.expired:
+                    metrics.incr("deadline.llm_calls_cut")
+                    raise DeadlineExceeded(partial=_text(response))
+                if token is not None and token.cancelled:
+                    produced = _output_tokens(response)
+                    metrics.incr("cancellation.llm_streams_aborted")
+                    metrics.incr(
+                        "cancellation.output_tokens_saved_estimate",
+                        max(_average_output_tokens() - produced, 0)
+                    )
+                    raise GenerationCancelled(token.reason)
+        finally:
+            close = getattr(stream, "close", None)
+            if close:
+                close()
+        return response
+
+    def _record_usage(self, response: Any) -> None:
+        tokens = _output_tokens(response)
+        sink = _usage_sink.get()
+        with _usage_lock:
+            _usage["calls"] += 1
+            _usage["output_tokens"] += tokens
+            if sink is not None:
+                sink["calls"] += 1
+                sink["output_tokens"] += tokens
+        metrics.incr("llm.requests")
+        metrics.incr("llm.output_tokens", tokens)
+
     def _parse_json(self, text: str) -> Union[Dict, List, None]:
         """
         Robustly parses JSON from LLM output, handling markdown blocks and escapement issues.
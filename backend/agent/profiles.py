@@ -0,0 +1,47 @@
+from typing import Any, Dict, Optional
+
+# Depth used when a course does not ask for one; "standard" matches the original prompts
+DEFAULT_DEPTH = "standard"
+
+# How much content a module gets per depth, and the output budget of its
+# content call. max_output_tokens None leaves the provider default in place.
+DEPTH_PROFILES: Dict[str, Dict[str, Any]] = {
+    "quick": {
+        "subtopics": "2–3",
+        "sections": "3",
+        "detail": (
+            "- Write a focused primer: explain each concept clearly and concisely, skip exhaustive detail.\n"
+            "- Prefer one strong example over many."
+        ),
+        "flashcards": "3–4",
+        "quiz_questions": 3,
+        "max_output_tokens": 8192,
+    },
+    "standard": {
+        "subtopics": "4–6",
+        "sections": "4-5",
+        "detail": (
+            "- DO NOT summarize. Expand every concept thoroughly, providing MAXIMUM detail.\n"
+            "- Prefer completeness over brevity. Write extremely comprehensive paragraphs."
+        ),
+        "flashcards": "5–8",
+        "quiz_questions": 6,
+        "max_output_tokens": None,
+    },
+    "deep": {
+        "subtopics": "5–7",
+        "sections": "7",
+        "detail": (
+            "- DO NOT summarize. Expand every concept thoroughly, providing MAXIMUM detail.\n"
+            "- Derive, prove or walk through every non-trivial step, and add worked examples and edge cases."
+        ),
+        "flashcards": "8–11",
+        "quiz_questions": 8,
+        "max_output_tokens": 32768,
+    },
+}
+
+
+def get_profile(depth: Optional[str] = None) -> Dict[str, Any]:
+    """The profile for `depth`, falling back to the default for unknown names."""
+    return DEPTH_PROFILES.get(depth or DEFAULT_DEPTH, DEPTH_PROFILES[DEFAULT_DEPTH])
@@ -2,7 +2,7 @@ from .explain import generate_explanations_for_topic
 from .youtube import search_youtube_videos
 from .mermaid import generate_mermaid_for_topic
 
-from .flashcards import generate_flashcards_for_topic
+from .flashcards import generate_flashcards_for_topic, generic_flashcards
 from .quiz import generate_quiz_for_topic
 
 __all__ = [
@@ -10,6 +10,7 @@ __all__ = [
     "search_youtube_videos",
     "generate_mermaid_for_topic",
     "generate_flashcards_for_topic",
+    "generic_flashcards",
     "generate_quiz_for_topic",
 ]
 
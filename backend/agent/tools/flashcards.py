@@ -5,17 +5,20 @@ from ..llm import LLMClient
 llm_client = LLMClient()
 logger = logging.getLogger(__name__)
 
-def generate_flashcards_for_topic(topic: str, subtopics: List[str]) -> List[Dict[str, str]]:
+def generate_flashcards_for_topic(
+    topic: str, subtopics: List[str], count: str = "5-8", fallback: bool = True
+) -> List[Dict[str, str]]:
     """
     Generate flashcards (front/back) for a topic and its subtopics.
     Returns: [{"front": "Term/Question", "back": "Definition/Answer"}]
+    With `fallback=False` a failed generation returns [] instead of generic cards.
     """
     
     system_prompt = """
     You are an expert educator creating practical flashcards for spaced repetition learning.
     Return JSON only.
     
-    Create 5-8 high-quality, concept-based flashcards for the given topic.
+    Create {count} high-quality, concept-based flashcards for the given topic.
     
     RULES:
     1. Avoid generic "What is X?" questions unless X is a complex concept.
@@ -41,7 +44,7 @@ def generate_flashcards_for_topic(topic: str, subtopics: List[str]) -> List[Dict
     response = llm_client.invoke(
         system_prompt=system_prompt,
         human_prompt_template=human_prompt,
-        input_vars={"topic": topic, "subtopics": ", ".join(subtopics)}
+        input_vars={"topic": topic, "subtopics": ", ".join(subtopics), "count": count}
     )
 
     # Validate and normalize response
@@ -50,10 +53,13 @@ def generate_flashcards_for_topic(topic: str, subtopics: List[str]) -> List[Dict
     elif isinstance(response, dict) and "flashcards" in response:
         return response["flashcards"]
         
+    if not fallback:
+        logger.warning(f"Failed to generate flashcards for topic: {topic}")
+        return []
     logger.warning(f"Using fallback flashcards for topic: {topic}")
-    return _generate_fallback(topic)
+    return generic_flashcards(topic)
 
-def _generate_fallback(topic: str) -> List[Dict[str, str]]:
+def generic_flashcards(topic: str) -> List[Dict[str, str]]:
     """Generates generic flashcards on failure."""
     return [
         {"front": f"What is {topic}?", "back": f"{topic} is a key concept covered in this module."},
@@ -1,13 +1,20 @@
 import json
 import re
 import logging
-from typing import List, Dict
+import time
+from typing import List, Dict, Optional
 
 import requests
 
+from core.cancellation import CancelToken, GenerationCancelled, current_token
+from core.deadline import current_deadline
+from core.metrics import metrics
+
 logger = logging.getLogger(__name__)
 
 MAX_DURATION_SECONDS = 20 * 60
+# Longest single socket read; cancellation is checked at least this often while downloading
+READ_POLL_SECONDS = 2
 
 HEADERS = {
     "User-Agent": (
@@ -18,6 +25,26 @@ HEADERS = {
 }
 
 
+def _fetch(url: str, timeout: float, token: Optional[CancelToken]) -> str:
+    """
+    Downloads a page in chunks, so a cancelled generation stops waiting for it
+    within READ_POLL_SECONDS rather than after the whole timeout.
+    """
+    started = time.monotonic()
+    read_timeout = min(timeout, READ_POLL_SECONDS)
+    with requests.get(url, headers=HEADERS, timeout=(timeout, read_timeout), stream=True) as resp:
+        resp.raise_for_status()
+        body = bytearray()
+        for chunk in resp.iter_content(chunk_size=16 * 1024):
+            if token is not None and token.cancelled:
+                metrics.incr("cancellation.youtube_requests_aborted")
+                raise GenerationCancelled(token.reason)
+            if time.monotonic() - started > timeout:
+                raise requests.Timeout(f"No complete response within {timeout:.0f}s")
+            body.extend(chunk)
+        return body.decode(resp.encoding or "utf-8", errors="replace")
+
+
 def _parse_duration_text(text: str) -> int:
     """Parse duration like '12:34' or '1:23:45' to seconds."""
     if not text:
@@ -68,12 +95,17 @@ def search_youtube_videos(query: str, limit: int = 1) -> List[Dict[str, str]]:
     Search YouTube and return videos under 20 minutes with real metadata.
     Scrapes ytInitialData from the search page for reliable results.
     """
+    token = current_token()
+    if token is not None and token.cancelled:
+        metrics.incr("cancellation.youtube_requests_saved")
+        raise GenerationCancelled(token.reason)
+
     try:
         url = f"https://www.youtube.com/results?search_query={requests.utils.quote(query)}"
-        resp = requests.get(url, headers=HEADERS, timeout=10)
-        resp.raise_for_status()
-
-        data = _extract_initial_data(resp.text)
+        # Never wait past the caller's deadline (but give the request a fair chance)
+        deadline = current_deadline()
+        timeout = 10 if deadline is None else min(10, max(1.0, deadline.remaining()))
+        data = _extract_initial_data(_fetch(url, timeout, token))
         if not data:
             logger.warning("Could not extract ytInitialData, using fallback.")
             return _fallback(query)
@@ -114,6 +146,8 @@ def search_youtube_videos(query: str, limit: int = 1) -> List[Dict[str, str]]:
         if results:
             return results
 
+    except GenerationCancelled:
+        raise
     except Exception as e:
         logger.error(f"YouTube search error: {e}")
 
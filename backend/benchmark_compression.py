@@ -0,0 +1,130 @@
+"""
+Measures what compressing explanation bodies (core/compression.py) saves on a
+corpus of generated courses, per codec and level.
+
+Usage: python benchmark_compression.py [--limit 200] [--user email] [--catalog]
+       python benchmark_compression.py --file courses.json
+
+Reads courses from MongoDB (the `courses` collection, or `course_catalog` with
+--catalog) or from a JSON file holding a list of course documents, and reports:
+  storage  - BSON size of course_data, plain vs with compressed explanations
+  network  - bytes of a full-course reply with and without wire compression
+             (MONGO_COMPRESSORS), approximated by zlib over the BSON reply
+  cpu      - compress and decompress time per course
+"""
+import argparse
+import json
+import logging
+import statistics
+import sys
+import time
+import zlib
+
+logging.basicConfig(level=logging.WARNING)
+
+from dotenv import load_dotenv
+from pathlib import Path
+load_dotenv(Path('../.env'))
+
+import bson
+
+from core.compression import compress_text, decompress_course, decompress_text, zstandard
+
+CODECS = [("zlib", 1), ("zlib", 6), ("zlib", 9)]
+if zstandard is not None:
+    CODECS += [("zstd", 3), ("zstd", 10), ("zstd", 19)]
+
+
+def load_corpus(args):
+    if args.file:
+        courses = json.loads(Path(args.file).read_text(encoding="utf-8"))
+    else:
+        from db import sync_db
+        if sync_db is None:
+            print("No database configured (MONGODB_URI); use --file")
+            sys.exit(1)
+        if args.catalog:
+            cursor = sync_db["course_catalog"].find({}, {"title": 1, "topics": 1, "modules": 1})
+            courses = [{"course_data": doc} for doc in cursor.limit(args.limit)]
+        else:
+            query = {"user_id": args.user} if args.user else {}
+            cursor = sync_db["courses"].find(query, {"course_data": 1}).sort("created_at", -1)
+            courses = list(cursor.limit(args.limit))
+    # Content already stored compressed is measured from its plain form
+    return [
+        decompress_course(course)["course_data"] for course in courses
+        if course.get("course_data", {}).get("modules")
+    ]
+
+
+def explanation_bodies(course_data):
+    for module in course_data["modules"].values():
+        for body in (module.get("explanations") or {}).values():
+            if isinstance(body, str):
+                yield body
+
+
+def with_compressed_explanations(course_data, codec, level):
+    modules = {}
+    for topic, module in course_data["modules"].items():
+        explanations = module.get("explanations") or {}
+        modules[topic] = {
+            **module,
+            "explanations": {st: compress_text(body, codec, level) for st, body in explanations.items()},
+        }
+    return {**course_data, "modules": modules}
+
+
+def measure(corpus, codec, level):
+    stored, wire, compress_ms, decompress_ms = 0, 0, [], []
+    for course_data in corpus:
+        start = time.perf_counter()
+        packed = with_compressed_explanations(course_data, codec, level)
+        compress_ms.append((time.perf_counter() - start) * 1000)
+
+        encoded = bson.encode(packed)
+        stored += len(encoded)
+        wire += len(zlib.compress(encoded, 6))
+
+        start = time.perf_counter()
+        for module in packed["modules"].values():
+            for body in (module.get("explanations") or {}).values():
+                decompress_text(body)
+        decompress_ms.append((time.perf_counter() - start) * 1000)
+    return stored, wire, statistics.mean(compress_ms), statistics.mean(decompress_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure compression of stored course content")
+    parser.add_argument("--file", help="JSON file with a list of course documents")
+    parser.add_argument("--limit", type=int, default=200, help="courses read from the database")
+    parser.add_argument("--user", help="only this user's courses")
+    parser.add_argument("--catalog", action="store_true", help="read the course catalog instead")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args)
+    if not corpus:
+        print("No generated courses found")
+        sys.exit(1)
+
+    bodies = [body for course_data in corpus for body in explanation_bodies(course_data)]
+    text_bytes = sum(len(body.encode("utf-8")) for body in bodies)
+    plain = [bson.encode(course_data) for course_data in corpus]
+    plain_stored = sum(len(doc) for doc in plain)
+    plain_wire = sum(len(zlib.compress(doc, 6)) for doc in plain)
+
+    print(f"{len(corpus)} courses, {sum(len(c['modules']) for c in corpus)} modules, "
+          f"{len(bodies)} explanations ({text_bytes / 1024:.0f} KB of text, "
+          f"{text_bytes / max(plain_stored, 1):.0%} of course_data)\n")
+    print(f"{'codec':<10} {'stored KB':>10} {'saved':>7} {'reply KB':>10} {'+wire zlib KB':>14} "
+          f"{'compress ms':>12} {'decompress ms':>14}   (per course)")
+    print(f"{'plain':<10} {plain_stored / 1024:>10.1f} {'':>7} {plain_stored / 1024:>10.1f} "
+          f"{plain_wire / 1024:>14.1f} {'':>12} {'':>14}")
+    for codec, level in CODECS:
+        stored, wire, compress_ms, decompress_ms = measure(corpus, codec, level)
+        print(f"{f'{codec}-{level}':<10} {stored / 1024:>10.1f} {1 - stored / plain_stored:>7.0%} "
+              f"{stored / 1024:>10.1f} {wire / 1024:>14.1f} {compress_ms:>12.2f} {decompress_ms:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Compares single-call and fan-out module generation against the real LLM.
+
+Usage: python benchmark_fanout.py ["Module topic" ...]
+Videos are left out so that only LLM latency is measured.
+"""
+import logging
+import statistics
+import sys
+import time
+
+logging.basicConfig(level=logging.WARNING)
+
+from dotenv import load_dotenv
+from pathlib import Path
+load_dotenv(Path('../.env'))
+
+from agent.agent import (
+    FANOUT_MAX_CONCURRENCY,
+    _generate_module_package,
+    _generate_module_package_fanout,
+    _generate_subtopics,
+)
+
+DEFAULT_TOPICS = [
+    "C Basics and Environment Setup",
+    "Module 2: Supervised Learning Fundamentals",
+]
+RUNS = 2
+
+
+def run_single(topic, subtopics, videos):
+    start = time.perf_counter()
+    package = _generate_module_package(topic, subtopics, videos)
+    return time.perf_counter() - start, None, package
+
+
+def run_fanout(topic, subtopics, videos):
+    first = []
+    start = time.perf_counter()
+
+    def on_subtopic(subtopic, explanation):
+        if not first:
+            first.append(time.perf_counter() - start)
+
+    package = _generate_module_package_fanout(topic, subtopics, videos, on_subtopic)
+    return time.perf_counter() - start, (first[0] if first else None), package
+
+
+def describe(package):
+    explanations = package.get("explanations", {})
+    chars = sum(len(text) for text in explanations.values())
+    return (
+        f"{len(explanations)} explanations / {chars} chars, "
+        f"{len(package.get('flashcards', []))} flashcards, {len(package.get('quiz', []))} quiz, "
+        f"diagram={'yes' if package.get('mermaid') else 'no'}"
+    )
+
+
+def main():
+    topics = sys.argv[1:] or DEFAULT_TOPICS
+    print(f"Fan-out concurrency: {FANOUT_MAX_CONCURRENCY}, runs per mode: {RUNS}\n")
+
+    for topic in topics:
+        subtopics = _generate_subtopics(topic)
+        videos = [None] * len(subtopics)
+        print(f"== {topic} ({len(subtopics)} subtopics)")
+
+        for name, runner in (("single", run_single), ("fanout", run_fanout)):
+            totals, firsts = [], []
+            for _ in range(RUNS):
+                total, first, package = runner(topic, subtopics, videos)
+                totals.append(total)
+                if first is not None:
+                    firsts.append(first)
+            line = f"  {name:<7} total {statistics.mean(totals):6.1f}s"
+            # Single-call mode shows nothing until the whole package is parsed
+            first_visible = statistics.mean(firsts) if firsts else statistics.mean(totals)
+            line += f" | first subtopic {first_visible:6.1f}s | {describe(package)}"
+            print(line)
+        print()
+
+
+if __name__ == "__main__":
+    main()
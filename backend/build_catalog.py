@@ -0,0 +1,158 @@
+"""
+Pre-generates complete courses for popular prompts into the course catalog,
+which /course/generate then serves by copying them into the user's account.
+
+Usage: python build_catalog.py prompts.txt [--depth standard] [--concurrency 2]
+                               [--per-minute 6] [--force]
+
+prompts.txt holds one prompt per line (blank lines and # comments ignored).
+Prompts already in the catalog are skipped unless --force is given, and with a
+graph checkpointer configured (CHECKPOINT_BACKEND) a course interrupted half
+way is continued from its last finished module on the next run.
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import sys
+import time
+
+logging.basicConfig(level=logging.WARNING)
+
+from dotenv import load_dotenv
+from pathlib import Path
+# The .env sits in the project root, wherever the script is started from
+load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+
+from agent.agent import get_workflow_state, resume_workflow_stream, run_workflow_stream
+from agent.profiles import DEFAULT_DEPTH, DEPTH_PROFILES
+from core.catalog import catalog
+from core.prompt_index import prompt_key
+
+# Owner recorded in the checkpoints of catalog runs
+CATALOG_USER = "catalog"
+
+
+def read_prompts(path):
+    prompts, seen = [], set()
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        prompt = line.strip()
+        if not prompt or prompt.startswith("#"):
+            continue
+        # "learn python basics" and "Python basics" are the same catalog entry
+        key = prompt_key(prompt)
+        if key not in seen:
+            seen.add(key)
+            prompts.append(prompt)
+    return prompts
+
+
+class RateLimiter:
+    """Spaces course starts at least `60 / per_minute` seconds apart."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            delay = self._next - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next = max(self._next, loop.time()) + self.interval
+
+
+async def build_course(prompt, depth, label):
+    """Runs (or resumes) the full graph for one prompt; returns the course or an error string."""
+    thread_id = "catalog-" + hashlib.sha1(f"{depth}:{prompt_key(prompt)}".encode("utf-8")).hexdigest()[:16]
+    state = await get_workflow_state(thread_id)
+    if state is not None and state["next"]:
+        print(f"{label} resuming '{prompt}' at {', '.join(state['next'])}")
+        chunks = resume_workflow_stream(thread_id)
+    else:
+        chunks = run_workflow_stream(
+            prompt, single_step=False, thread_id=thread_id, user_id=CATALOG_USER, depth=depth
+        )
+
+    topics, done = [], 0
+    async for chunk in chunks:
+        for node_name, updates in chunk.items():
+            if node_name == "validate_prompt" and not updates.get("is_valid", True):
+                return updates.get("validation_error") or "invalid prompt"
+            if node_name == "generate_topics":
+                topics = updates.get("topics", [])
+                print(f"{label} '{prompt}': outline with {len(topics)} modules")
+            elif node_name == "generate_module":
+                done = len(updates.get("generated_modules", {}))
+                print(f"{label} '{prompt}': module {done}/{len(topics) or '?'}")
+            elif node_name == "finalize_course":
+                return updates.get("course", {})
+    return "generation stopped before the course was finished"
+
+
+async def run(prompts, depth, concurrency, per_minute, force):
+    limiter = RateLimiter(per_minute)
+    slots = asyncio.Semaphore(max(1, concurrency))
+    results = {"built": 0, "skipped": 0, "failed": 0}
+    total = len(prompts)
+
+    async def one(i, prompt):
+        label = f"[{i}/{total}]"
+        if not force and await asyncio.to_thread(catalog.get, prompt, depth) is not None:
+            results["skipped"] += 1
+            print(f"{label} skip '{prompt}' (already in the catalog)")
+            return
+        async with slots:
+            await limiter.wait()
+            started = time.monotonic()
+            try:
+                course = await build_course(prompt, depth, label)
+            except Exception as e:
+                course = f"{type(e).__name__}: {e}"
+
+            problem = None
+            if isinstance(course, str):
+                problem = course
+            elif course.get("pending_topics") or len(course.get("modules", {})) < len(course.get("topics", [])):
+                problem = "not every module was generated"
+            elif any(m.get("degraded") for m in course["modules"].values()):
+                problem = "some modules were degraded"
+
+            if problem:
+                results["failed"] += 1
+                print(f"{label} FAILED '{prompt}': {problem}")
+                return
+            await asyncio.to_thread(catalog.save, prompt, depth, course)
+            results["built"] += 1
+            print(f"{label} done '{prompt}' -> '{course['title']}' "
+                  f"({len(course['modules'])} modules, {time.monotonic() - started:.0f}s)")
+
+    await asyncio.gather(*(one(i, p) for i, p in enumerate(prompts, 1)))
+    print(f"\nBuilt {results['built']}, skipped {results['skipped']}, failed {results['failed']} of {total}")
+    return results["failed"] == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate popular courses into the course catalog")
+    parser.add_argument("prompts", help="file with one prompt per line")
+    parser.add_argument("--depth", default=DEFAULT_DEPTH, choices=sorted(DEPTH_PROFILES))
+    parser.add_argument("--concurrency", type=int, default=2, help="courses generated at once")
+    parser.add_argument("--per-minute", type=float, default=6, help="course starts per minute (0 = unlimited)")
+    parser.add_argument("--force", action="store_true", help="rebuild prompts already in the catalog")
+    args = parser.parse_args()
+
+    if not catalog.enabled:
+        print("The catalog needs MongoDB (MONGODB_URI)")
+        sys.exit(1)
+
+    prompts = read_prompts(args.prompts)
+    print(f"{len(prompts)} prompts, depth {args.depth}, concurrency {args.concurrency}, "
+          f"{args.per_minute or 'unlimited'} starts/minute\n")
+    ok = asyncio.run(run(prompts, args.depth, args.concurrency, args.per_minute, args.force))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
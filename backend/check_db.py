@@ -1,8 +1,10 @@
 
-from db import courses_collection, client
+from db import sync_db
 import os
 from dotenv import load_dotenv
 
+courses_collection = sync_db["courses"] if sync_db is not None else None
+
 print("Checking DB connection...")
 if courses_collection is None:
     print("courses_collection is None!")
@@ -0,0 +1,37 @@
+"""
+Creates the application's indexes and checks with explain() that every hot
+query (core/indexes.py HOT_QUERIES) is answered through an index.
+
+Usage: python check_indexes.py
+Exits non-zero if an index could not be created or a query scans a collection.
+tests/test_indexes.py checks the same queries against the declared indexes
+without a server; this script is the check against MongoDB's own planner.
+"""
+import asyncio
+import sys
+
+import db
+from core.indexes import HOT_QUERIES, ensure_indexes, plan_stages, uses_index
+
+
+async def main():
+    if db.db is None:
+        print(f"Database unavailable: {db.connection_error}")
+        return False
+
+    ok = await ensure_indexes(db.db)
+    for name, query, sort in HOT_QUERIES:
+        cursor = db.db[name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.limit(1).explain()
+        indexed = uses_index(explain)
+        ok = ok and indexed
+        print(f"{'ok  ' if indexed else 'SCAN'} {name} {query}{f' sort {sort}' if sort else ''}: "
+              f"{' <- '.join(plan_stages(explain))}")
+    await db.client.close()
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,56 @@
+import contextvars
+import threading
+from typing import Optional
+
+
+class GenerationCancelled(Exception):
+    """Raised inside generation work once its cancel token has been set."""
+
+
+class CancelToken:
+    """
+    Thread-safe cancellation flag shared by an async job and the worker
+    threads running its blocking LLM and YouTube calls.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+_current_token: contextvars.ContextVar[Optional[CancelToken]] = contextvars.ContextVar(
+    "generation_cancel_token", default=None
+)
+
+
+def current_token() -> Optional[CancelToken]:
+    """The token of the generation running in this context, if any."""
+    return _current_token.get()
+
+
+def use_token(token: Optional[CancelToken]) -> contextvars.Token:
+    """
+    Binds `token` to the current context. asyncio tasks, asyncio.to_thread and
+    LangGraph's node executor copy the context, so the token follows the work.
+    """
+    return _current_token.set(token)
+
+
+def raise_if_cancelled() -> None:
+    token = _current_token.get()
+    if token is not None and token.cancelled:
+        raise GenerationCancelled(token.reason)
+
+
+def reset_token(previous: contextvars.Token) -> None:
+    """Restores the binding that was active before `use_token`."""
+    _current_token.reset(previous)
@@ -0,0 +1,115 @@
+import copy
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+
+from agent.agent import MODULE_PROMPT_VERSION
+from core.compression import compress_modules
+from core.metrics import metrics
+from core.prompt_index import prompt_index, prompt_key
+from db import sync_db as db
+
+logger = logging.getLogger(__name__)
+
+catalog_collection = db["course_catalog"] if db is not None else None
+
+# Estimated similarity a prompt needs to an indexed prompt to be served that prompt's
+# catalog course; much stricter than PROMPT_INDEX_THRESHOLD, as nobody reviews the match
+CATALOG_MATCH_THRESHOLD = float(os.getenv("CATALOG_MATCH_THRESHOLD", "0.9"))
+
+
+def _words(text: str) -> Set[str]:
+    return set(prompt_key(text).split())
+
+
+class CourseCatalog:
+    """
+    Complete courses generated ahead of time by build_catalog.py for popular
+    subjects, stored in `course_catalog` once per (prompt key, depth). A new
+    course request matching an entry gets a copy instead of a generation.
+
+    Prompts match on their filler-free key (see core/prompt_index.py), or
+    through the prompt index when a near-identical prompt has an entry that
+    covers every word of the request.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    @property
+    def enabled(self) -> bool:
+        return self.collection is not None
+
+    def get(self, prompt: str, depth: str) -> Optional[Dict[str, Any]]:
+        """The entry of exactly this prompt (by key), ignoring fuzzy matches."""
+        if not self.enabled:
+            return None
+        return self.collection.find_one({
+            "key": prompt_key(prompt),
+            "depth": depth,
+            "prompt_version": MODULE_PROMPT_VERSION,
+        })
+
+    def find(self, prompt: str, depth: str) -> Optional[Dict[str, Any]]:
+        """The catalog course for `prompt` at `depth`, or None."""
+        if not self.enabled:
+            return None
+        entry = self.get(prompt, depth) or self._similar(prompt, depth)
+        metrics.incr("catalog.hits" if entry else "catalog.misses", depth=depth)
+        return entry
+
+    def _similar(self, prompt: str, depth: str) -> Optional[Dict[str, Any]]:
+        """The entry of a near-identical prompt, if it covers everything `prompt` asks for."""
+        similar = prompt_index.lookup(prompt)
+        if similar is None or similar["similarity"] < CATALOG_MATCH_THRESHOLD:
+            return None
+        entry = self.get(similar["prompt"], depth)
+        if entry is None:
+            return None
+        # "python for data science" must not get the "python" course
+        if not _words(prompt) <= _words(entry["prompt"]) | _words(entry["title"]):
+            metrics.incr("catalog.rejected", depth=depth)
+            return None
+        return entry
+
+    def save(self, prompt: str, depth: str, course: Dict[str, Any]) -> None:
+        """Stores a fully generated course (the graph's final "course" value)."""
+        self.collection.update_one(
+            {"key": prompt_key(prompt), "depth": depth},
+            {"$set": {
+                "prompt": prompt,
+                "prompt_version": MODULE_PROMPT_VERSION,
+                "title": course["title"],
+                "topics": course["topics"],
+                "modules": compress_modules(course["modules"]),
+                "created_at": datetime.utcnow(),
+            }},
+            upsert=True,
+        )
+
+    @staticmethod
+    def course_doc(entry: Dict[str, Any], course_id: str, user_id: str, prompt: str,
+                   options: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        The document of a user's copy of a catalog course, ready to insert; the
+        modules are copied as stored, explanation bodies still compressed.
+        """
+        return {
+            "course_id": course_id,
+            "user_id": user_id,
+            "prompt": prompt,
+            "title": entry["title"] or "Untitled Course",
+            "course_data": {
+                "title": entry["title"],
+                "modules": copy.deepcopy(entry["modules"]),
+                "topics": list(entry["topics"]),
+                "pending_topics": [],
+            },
+            **options,
+            "catalog_key": entry["key"],
+            "created_at": datetime.utcnow(),
+        }
+
+
+catalog = CourseCatalog(catalog_collection)
@@ -0,0 +1,143 @@
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+# Messages per chat bucket document; a full bucket is followed by a new one
+CHAT_BUCKET_SIZE = int(os.getenv("CHAT_BUCKET_SIZE", "50"))
+
+# A course conversation is stored in `chats` as bucket documents
+# {course_id, user_id, bucket, count, messages} of at most CHAT_BUCKET_SIZE
+# messages, numbered 0, 1, 2... A unique index on (course_id, user_id, bucket)
+# lets only one writer start each bucket. Messages are only ever appended, so a
+# message's (bucket, index) position never changes and serves as the pagination
+# cursor. Conversations from before bucketing are one document without `bucket`:
+# it is never appended to again and reads as the conversation's oldest bucket.
+
+# Buckets newest first; the unnumbered one from before bucketing sorts last
+BUCKET_SORT = [("bucket", -1)]
+
+
+def conversation_filter(course_id: str, user_id: str) -> Dict[str, Any]:
+    """All buckets of one user's conversation about a course."""
+    return {"course_id": course_id, "user_id": user_id}
+
+
+def open_bucket_filter(course_id: str, user_id: str, bucket: int, incoming: int) -> Dict[str, Any]:
+    """Bucket number `bucket` of a conversation, if it has room for `incoming` more messages."""
+    room = CHAT_BUCKET_SIZE - incoming
+    return {**conversation_filter(course_id, user_id), "bucket": bucket, "count": {"$lte": room}}
+
+
+def older_buckets_filter(course_id: str, user_id: str, bucket: Optional[int]) -> Dict[str, Any]:
+    """The buckets of a conversation up to and including `bucket` (None: the unnumbered one)."""
+    if bucket is None:
+        return {**conversation_filter(course_id, user_id), "bucket": None}
+    # Also matches the unnumbered bucket, which comes before bucket 0
+    return {**conversation_filter(course_id, user_id), "bucket": {"$not": {"$gt": bucket}}}
+
+
+async def append_messages(collection, course_id: str, user_id: str, messages: List[Dict[str, Any]]) -> None:
+    """Appends `messages` to the newest bucket if they fit, or starts the next one."""
+    while True:
+        now = datetime.utcnow()
+        newest = await collection.find_one(
+            conversation_filter(course_id, user_id), {"bucket": 1}, sort=BUCKET_SORT
+        )
+        number = newest.get("bucket") if newest else None
+        if number is not None:
+            appended = await collection.update_one(
+                open_bucket_filter(course_id, user_id, number, len(messages)),
+                {
+                    "$push": {"messages": {"$each": messages}},
+                    "$inc": {"count": len(messages)},
+                    "$set": {"updated_at": now},
+                },
+            )
+            if appended.modified_count:
+                return
+        try:
+            await collection.insert_one({
+                **conversation_filter(course_id, user_id),
+                "bucket": 0 if number is None else number + 1,
+                "count": len(messages),
+                "messages": messages,
+                "created_at": now,
+                "updated_at": now,
+            })
+            return
+        except DuplicateKeyError:
+            # Another request started that bucket first: append to it instead
+            continue
+
+
+async def recent_messages(collection, course_id: str, user_id: str, limit: int) -> List[Dict[str, Any]]:
+    """The last `limit` messages in chronological order, reading only the buckets' tails."""
+    tail: List[Dict[str, Any]] = []
+    buckets = collection.find(
+        conversation_filter(course_id, user_id),
+        {"messages": {"$slice": -limit}},
+    ).sort(BUCKET_SORT)
+    try:
+        async for bucket in buckets:
+            tail = bucket.get("messages", []) + tail
+            if len(tail) >= limit:
+                break
+    finally:
+        await buckets.close()
+    return tail[-limit:]
+
+
+def encode_chat_cursor(bucket: Optional[int], index: int) -> str:
+    """Opaque position of a message: the page after it starts with the message before it."""
+    position = {"b": bucket, "i": index}
+    return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii")
+
+
+def decode_chat_cursor(cursor: str) -> Tuple[Optional[int], int]:
+    """Inverse of encode_chat_cursor; raises ValueError for a malformed cursor."""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        bucket, index = position["b"], position["i"]
+    except (KeyError, TypeError, UnicodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+    if not (bucket is None or type(bucket) is int) or type(index) is not int:
+        raise ValueError("Invalid cursor: bucket and index must be integers")
+    return bucket, index
+
+
+async def message_page(collection, course_id: str, user_id: str, limit: int,
+                       before: Optional[Tuple[Optional[int], int]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Up to `limit` messages older than `before` (the newest ones without it),
+    newest first, and the cursor of the next page or None when there is none.
+    Only the buckets that hold the page are read.
+    """
+    if before is None:
+        query = conversation_filter(course_id, user_id)
+    else:
+        query = older_buckets_filter(course_id, user_id, before[0])
+    buckets = collection.find(query, {"bucket": 1, "messages": 1}).sort(BUCKET_SORT)
+
+    page: List[Dict[str, Any]] = []
+    last: Optional[Tuple[Optional[int], int]] = None
+    more = False
+    try:
+        async for bucket in buckets:
+            messages = bucket.get("messages", [])
+            number = bucket.get("bucket")
+            end = before[1] if before is not None and number == before[0] else len(messages)
+            for index in range(min(end, len(messages)) - 1, -1, -1):
+                if len(page) == limit:
+                    more = True
+                    break
+                page.append(messages[index])
+                last = (number, index)
+            if more:
+                break
+    finally:
+        await buckets.close()
+    return page, encode_chat_cursor(*last) if more and last else None
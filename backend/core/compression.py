@@ -0,0 +1,98 @@
+import logging
+import os
+import zlib
+from typing import Any, Dict, Optional
+
+from bson import Binary
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Codec for explanation bodies written from now on: zlib | zstd | none.
+# Stored values name their codec, so changing this never breaks older content.
+CONTENT_COMPRESSION = os.getenv("CONTENT_COMPRESSION", "zlib").strip().lower()
+CONTENT_COMPRESSION_LEVEL = int(os.getenv("CONTENT_COMPRESSION_LEVEL", "6"))
+# Explanations shorter than this (in UTF-8 bytes) are stored as plain text
+CONTENT_COMPRESSION_MIN_BYTES = int(os.getenv("CONTENT_COMPRESSION_MIN_BYTES", "256"))
+
+# BSON binary subtype (user-defined range) marking a compressed text value;
+# the first byte of the payload says which codec compressed the rest
+COMPRESSED_SUBTYPE = 0x80
+_ZLIB = 1
+_ZSTD = 2
+
+if CONTENT_COMPRESSION == "zstd" and zstandard is None:
+    logger.warning("zstandard not installed, compressing course content with zlib.")
+    CONTENT_COMPRESSION = "zlib"
+
+
+def compress_text(text: str, codec: str = CONTENT_COMPRESSION, level: int = CONTENT_COMPRESSION_LEVEL) -> Any:
+    """`text` as a compressed BSON value, or unchanged if too short to be worth it."""
+    raw = text.encode("utf-8")
+    if codec == "none" or len(raw) < CONTENT_COMPRESSION_MIN_BYTES:
+        return text
+    if codec == "zstd":
+        payload = bytes([_ZSTD]) + zstandard.ZstdCompressor(level=level).compress(raw)
+    else:
+        payload = bytes([_ZLIB]) + zlib.compress(raw, level)
+    # Repetitive markdown nearly always shrinks, but never store a bigger value
+    if len(payload) >= len(raw):
+        return text
+    return Binary(payload, COMPRESSED_SUBTYPE)
+
+
+def decompress_text(value: Any) -> Any:
+    """Inverse of compress_text; anything that is not a compressed value is returned as is."""
+    if not isinstance(value, Binary) or value.subtype != COMPRESSED_SUBTYPE:
+        return value
+    codec, payload = value[0], bytes(value[1:])
+    if codec == _ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Course content is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(payload).decode("utf-8")
+    return zlib.decompress(payload).decode("utf-8")
+
+
+def compress_module(module: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    A copy of `module` ready to store, with its explanation bodies compressed.
+    Subtopic names stay readable keys; already compressed bodies are kept.
+    """
+    explanations = module.get("explanations")
+    if not isinstance(explanations, dict):
+        return module
+    stored = dict(module)
+    stored["explanations"] = {
+        subtopic: compress_text(body) if isinstance(body, str) else body
+        for subtopic, body in explanations.items()
+    }
+    return stored
+
+
+def decompress_module(module: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """`module` as read from the database, with its explanation bodies as text again."""
+    if not module or not isinstance(module.get("explanations"), dict):
+        return module
+    module = dict(module)
+    module["explanations"] = {
+        subtopic: decompress_text(body) for subtopic, body in module["explanations"].items()
+    }
+    return module
+
+
+def compress_modules(modules: Dict[str, Any]) -> Dict[str, Any]:
+    return {topic: compress_module(module) for topic, module in modules.items()}
+
+
+def decompress_course(course_doc: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Decompresses, in place, every module of a course document read from the database."""
+    modules = (course_doc or {}).get("course_data", {}).get("modules")
+    if isinstance(modules, dict):
+        course_doc["course_data"]["modules"] = {
+            topic: decompress_module(module) for topic, module in modules.items()
+        }
+    return course_doc
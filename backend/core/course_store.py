@@ -0,0 +1,389 @@
+import asyncio
+import base64
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from core.compression import compress_module
+
+Update = Union[Dict[str, Any], List[Dict[str, Any]]]
+
+# Times an outline edit is re-applied after concurrent changes before giving up
+EDIT_OUTLINE_ATTEMPTS = 5
+# Pause before the n-th retry of an outline edit is n times this long
+EDIT_OUTLINE_BACKOFF_SECONDS = 0.05
+
+
+class OutlineConflict(Exception):
+    """The course kept changing while its outline was being edited."""
+
+
+def course_filter(course_id: str, user_id: Optional[str] = None) -> Dict[str, Any]:
+    """Matches one course, and only if it belongs to `user_id` when one is given."""
+    query: Dict[str, Any] = {"course_id": course_id}
+    if user_id is not None:
+        query["user_id"] = user_id
+    return query
+
+
+def is_path_safe(key: str) -> bool:
+    """Whether `key` can be addressed as a dotted field path segment in MongoDB."""
+    return bool(key) and "." not in key and not key.startswith("$")
+
+
+def module_update(
+    topic: str,
+    module: Dict[str, Any],
+    unset_fields: Optional[List[str]] = None,
+    pull_pending: bool = False,
+) -> Update:
+    """
+    Builds an update that writes a single module to `course_data.modules.<topic>`
+    without rewriting the rest of the course. With `pull_pending` the topic is
+    also removed from `course_data.pending_topics`.
+
+    Module titles such as "Node.js Basics" cannot be used in a dotted path, so
+    those fall back to an update pipeline using `$setField` (MongoDB 5.0+).
+    Explanation bodies are stored compressed (see core/compression.py).
+    """
+    unset_fields = unset_fields or []
+    module = compress_module(module)
+
+    if is_path_safe(topic):
+        update: Dict[str, Any] = {"$set": {f"course_data.modules.{topic}": module}}
+        if unset_fields:
+            update["$unset"] = {field: "" for field in unset_fields}
+        if pull_pending:
+            update["$pull"] = {"course_data.pending_topics": topic}
+        return update
+
+    stage: Dict[str, Any] = {
+        "course_data.modules": {
+            "$setField": {
+                "field": {"$literal": topic},
+                "input": {"$ifNull": ["$course_data.modules", {}]},
+                "value": {"$literal": module},
+            }
+        }
+    }
+    if pull_pending:
+        stage["course_data.pending_topics"] = {
+            "$filter": {
+                "input": {"$ifNull": ["$course_data.pending_topics", []]},
+                "cond": {"$ne": ["$$this", {"$literal": topic}]},
+            }
+        }
+    pipeline: List[Dict[str, Any]] = [{"$set": stage}]
+    if unset_fields:
+        pipeline.append({"$unset": unset_fields})
+    return pipeline
+
+
+def module_field_update(topic: str, field: str, value: Any) -> Update:
+    """
+    Builds an update that sets one field of an existing module, e.g. the quiz
+    generated on first access, leaving the rest of the module untouched.
+    """
+    return module_fields_update(topic, {field: value})
+
+
+def module_fields_update(topic: str, fields: Dict[str, Any]) -> Update:
+    """Like `module_field_update`, for several top-level fields of the module at once."""
+    fields = compress_module(fields)
+    if is_path_safe(topic):
+        return {"$set": {f"course_data.modules.{topic}.{field}": value for field, value in fields.items()}}
+
+    return [{"$set": {
+        "course_data.modules": {
+            "$setField": {
+                "field": {"$literal": topic},
+                "input": "$course_data.modules",
+                "value": {"$mergeObjects": [
+                    {"$getField": {"field": {"$literal": topic}, "input": "$course_data.modules"}},
+                    {"$literal": fields},
+                ]},
+            }
+        }
+    }}]
+
+
+def progress_update(topic: str, completed: bool, quiz_score: Optional[int]) -> Optional[Update]:
+    """
+    Builds an update that marks `topic` completed and/or records its quiz
+    score in `course_progress`, applied atomically by MongoDB so concurrent
+    posts for different modules cannot overwrite each other. None if there
+    is nothing to change.
+    """
+    if not completed and quiz_score is None:
+        return None
+
+    if is_path_safe(topic):
+        update: Dict[str, Any] = {}
+        if completed:
+            update["$addToSet"] = {"course_progress.completed_modules": topic}
+        if quiz_score is not None:
+            update["$set"] = {f"course_progress.quiz_scores.{topic}": quiz_score}
+        return update
+
+    stage: Dict[str, Any] = {}
+    if completed:
+        done = {"$ifNull": ["$course_progress.completed_modules", []]}
+        stage["course_progress.completed_modules"] = {"$cond": [
+            {"$in": [{"$literal": topic}, done]},
+            done,
+            {"$concatArrays": [done, [{"$literal": topic}]]},
+        ]}
+    if quiz_score is not None:
+        stage["course_progress.quiz_scores"] = {"$setField": {
+            "field": {"$literal": topic},
+            "input": {"$ifNull": ["$course_progress.quiz_scores", {}]},
+            "value": {"$literal": quiz_score},
+        }}
+    return [{"$set": stage}]
+
+
+def module_revision(module: Dict[str, Any]) -> int:
+    """The revision of a stored module; modules written before revisions existed are 0."""
+    return module.get("revision", 0)
+
+
+def module_revision_filter(topic: str, revision: int) -> Dict[str, Any]:
+    """
+    A query clause matching the course only while module `topic` is still at
+    `revision`, so a rewrite based on that revision cannot clobber a newer one.
+    """
+    if is_path_safe(topic):
+        path = f"course_data.modules.{topic}.revision"
+        return {path: {"$in": [None, 0]}} if revision == 0 else {path: revision}
+
+    stored = {"$getField": {
+        "field": "revision",
+        "input": {"$getField": {"field": {"$literal": topic}, "input": "$course_data.modules"}},
+    }}
+    return {"$expr": {"$eq": [{"$ifNull": [stored, 0]}, revision]}}
+
+
+async def edit_outline(collection, course_id: str, user_id: str, topics: List[str]) -> Optional[Dict[str, List[str]]]:
+    """
+    Replaces the module list of a course with `topics`, keeping the content of
+    modules that stay, queueing new (or renamed) topics into `pending_topics`
+    in outline order and dropping the modules of removed topics. A claim on a
+    removed topic is released, so its result is discarded when it completes.
+
+    Returns {"kept", "added", "removed"} topic lists, or None if there is no
+    such course. Concurrent claims are detected and the edit is re-applied, up
+    to EDIT_OUTLINE_ATTEMPTS times before OutlineConflict is raised.
+    """
+    base = course_filter(course_id, user_id)
+
+    for attempt in range(EDIT_OUTLINE_ATTEMPTS):
+        if attempt:
+            await asyncio.sleep(EDIT_OUTLINE_BACKOFF_SECONDS * attempt)
+        doc = await collection.find_one(
+            base, {"generation_claim": 1, "course_data.topics": 1, "course_data.pending_topics": 1}
+        )
+        if not doc:
+            return None
+
+        course_data = doc.get("course_data", {})
+        old_topics = course_data.get("topics", [])
+        old_pending = course_data.get("pending_topics", [])
+        claim = doc.get("generation_claim")
+
+        wanted = set(topics)
+        removed = [t for t in old_topics if t not in wanted]
+        pending = [t for t in topics if t in old_pending or t not in old_topics]
+        release = claim is not None and claim["topic"] not in wanted
+
+        unchanged = {
+            **base,
+            "course_data.topics": old_topics,
+            "course_data.pending_topics": old_pending,
+            "generation_claim": claim,
+        }
+        if all(is_path_safe(t) for t in removed):
+            update: Update = {"$set": {"course_data.topics": topics, "course_data.pending_topics": pending}}
+            unset = {f"course_data.modules.{t}": "" for t in removed}
+            if release:
+                unset["generation_claim"] = ""
+            if unset:
+                update["$unset"] = unset
+        else:
+            update = [{"$set": {
+                "course_data.topics": {"$literal": topics},
+                "course_data.pending_topics": {"$literal": pending},
+                "course_data.modules": {"$arrayToObject": {"$filter": {
+                    "input": {"$objectToArray": {"$ifNull": ["$course_data.modules", {}]}},
+                    "cond": {"$not": [{"$in": ["$$this.k", {"$literal": removed}]}]},
+                }}},
+            }}]
+            if release:
+                update.append({"$unset": ["generation_claim"]})
+
+        if (await collection.update_one(unchanged, update)).matched_count:
+            return {
+                "kept": [t for t in topics if t in old_topics],
+                "added": [t for t in topics if t not in old_topics],
+                "removed": removed,
+            }
+        # The course changed underneath us (e.g. a topic was claimed): look again
+    raise OutlineConflict(f"Course {course_id} kept changing during the outline edit")
+
+
+# -------------------------------------------------------------------
+# NEXT-MODULE CLAIMS
+# -------------------------------------------------------------------
+
+async def claim_next_topic(collection, course_id: str, user_id: str, ttl_seconds: int) -> Tuple[str, Optional[str]]:
+    """
+    Atomically claims the next pending topic of a course for generation.
+
+    Returns one of:
+      ("claimed", topic) - the caller owns the topic and must generate it
+      ("busy", topic)    - another caller is generating it right now
+      ("empty", None)    - nothing left to generate
+      ("missing", None)  - no such course for this user
+    A claim older than `ttl_seconds` is treated as abandoned and taken over.
+    """
+    base = course_filter(course_id, user_id)
+
+    while True:
+        now = datetime.utcnow()
+        doc = await collection.find_one(base, {"generation_claim": 1, "course_data.pending_topics": 1})
+        if not doc:
+            return "missing", None
+
+        claim = doc.get("generation_claim")
+        if claim:
+            if claim["claimed_at"] >= now - timedelta(seconds=ttl_seconds):
+                return "busy", claim["topic"]
+            taken = await collection.update_one(
+                {**base, "generation_claim": claim},
+                {"$set": {"generation_claim.claimed_at": now}},
+            )
+            if taken.modified_count:
+                return "claimed", claim["topic"]
+            continue
+
+        pending = doc.get("course_data", {}).get("pending_topics", [])
+        if not pending:
+            return "empty", None
+
+        topic = pending[0]
+        claimed = await collection.update_one(
+            {**base, "generation_claim": None, "course_data.pending_topics.0": topic},
+            {
+                "$pop": {"course_data.pending_topics": -1},
+                "$set": {"generation_claim": {"topic": topic, "claimed_at": now}},
+            },
+        )
+        if claimed.modified_count:
+            return "claimed", topic
+        # Lost the race to another caller: look again
+
+
+async def complete_claim(collection, course_id: str, topic: str, module: Dict[str, Any]) -> None:
+    """Stores the generated module and releases the claim in one update."""
+    await collection.update_one(
+        {**course_filter(course_id), "generation_claim.topic": topic},
+        module_update(topic, module, unset_fields=["generation_claim"]),
+    )
+
+
+async def release_claim(collection, course_id: str, topic: str) -> None:
+    """Gives a claimed topic back to the front of `pending_topics` after a failure."""
+    await collection.update_one(
+        {**course_filter(course_id), "generation_claim.topic": topic},
+        {
+            "$unset": {"generation_claim": ""},
+            "$push": {"course_data.pending_topics": {"$each": [topic], "$position": 0}},
+        },
+    )
+
+
+def course_read_pipeline(course_id: str, user_id: str, topics: List[str]) -> List[Dict[str, Any]]:
+    """
+    Aggregation that reads a course with only the modules named in `topics`,
+    so a client can open a course without downloading every module. All
+    stored module titles are listed in `course_data.generated_topics`.
+    """
+    modules = {"$objectToArray": {"$ifNull": ["$course_data.modules", {}]}}
+    return [
+        {"$match": course_filter(course_id, user_id)},
+        {"$set": {
+            "course_data.generated_topics": {"$map": {"input": modules, "as": "m", "in": "$$m.k"}},
+            "course_data.modules": {"$arrayToObject": {"$filter": {
+                "input": modules,
+                "as": "m",
+                "cond": {"$in": ["$$m.k", {"$literal": topics}]},
+            }}},
+        }},
+    ]
+
+
+# One course in the course list: counts are computed by the server, so module
+# bodies (explanations, quizzes, flashcards) are never sent over the wire
+COURSE_SUMMARY_STAGE = {"$project": {
+    "_id": 1,
+    "course_id": 1,
+    "title": 1,
+    "prompt": 1,
+    "depth": 1,
+    "created_at": 1,
+    "course_progress": 1,
+    "topic_count": {"$size": {"$ifNull": ["$course_data.topics", []]}},
+    "module_count": {"$size": {"$objectToArray": {"$ifNull": ["$course_data.modules", {}]}}},
+    "pending_count": {"$size": {"$ifNull": ["$course_data.pending_topics", []]}},
+}}
+
+
+def encode_list_cursor(doc: Dict[str, Any]) -> str:
+    """Opaque position after `doc` in the (created_at, _id) descending course list."""
+    created_at = doc.get("created_at")
+    position = {"t": created_at.isoformat() if created_at else None, "id": str(doc["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii")
+
+
+def decode_list_cursor(cursor: str) -> Tuple[Optional[datetime], ObjectId]:
+    """Inverse of encode_list_cursor; raises ValueError for a malformed cursor."""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        created_at = datetime.fromisoformat(position["t"]) if position["t"] else None
+        return created_at, ObjectId(position["id"])
+    except (InvalidId, KeyError, TypeError, UnicodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+
+
+# The course list order; _id breaks ties between courses created at the same time
+COURSE_LIST_SORT = {"created_at": -1, "_id": -1}
+
+
+def course_list_match(user_id: str, after: Optional[Tuple[Optional[datetime], ObjectId]]) -> Dict[str, Any]:
+    """A user's courses that come after `after` in COURSE_LIST_SORT order (all of them without it)."""
+    match: Dict[str, Any] = {"user_id": user_id}
+    if after is not None:
+        created_at, last_id = after
+        later = [{"created_at": created_at, "_id": {"$lt": last_id}}]
+        if created_at is not None:
+            # Courses without a creation date sort after every dated one
+            later += [{"created_at": {"$lt": created_at}}, {"created_at": None}]
+        match["$or"] = later
+    return match
+
+
+def course_list_pipeline(user_id: str, after: Optional[Tuple[Optional[datetime], ObjectId]],
+                         limit: int) -> List[Dict[str, Any]]:
+    """
+    Aggregation for one page of a user's courses, newest first. Paging is by
+    keyset on (created_at, _id), so a page costs the same however deep it is
+    and courses created meanwhile neither shift nor repeat entries.
+    """
+    return [
+        {"$match": course_list_match(user_id, after)},
+        {"$sort": COURSE_LIST_SORT},
+        {"$limit": limit},
+        COURSE_SUMMARY_STAGE,
+    ]
@@ -0,0 +1,59 @@
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+
+class DeadlineExceeded(Exception):
+    """Raised by a stage that ran out of time; `partial` holds any output it got."""
+
+    def __init__(self, message: str = "deadline exceeded", partial: str = ""):
+        super().__init__(message)
+        self.partial = partial
+
+
+class Deadline:
+    """A point in (monotonic) time by which a piece of generation work must be done."""
+
+    def __init__(self, seconds: float, parent: Optional["Deadline"] = None):
+        expires_at = time.monotonic() + seconds
+        if parent is not None:
+            expires_at = min(expires_at, parent.expires_at)
+        self.expires_at = expires_at
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def budget(self, fraction: float) -> "Deadline":
+        """A stage deadline taking `fraction` of the time that is left."""
+        return Deadline(self.remaining() * fraction, parent=self)
+
+
+_current_deadline: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar(
+    "generation_deadline", default=None
+)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """The innermost deadline of the work running in this context, if any."""
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]):
+    """
+    Runs the block under `deadline`, never extending an enclosing one. Like
+    the cancel token, it follows the work into asyncio.to_thread and graph nodes.
+    """
+    outer = _current_deadline.get()
+    if deadline is not None and outer is not None and outer.expires_at < deadline.expires_at:
+        deadline = outer
+    previous = _current_deadline.set(deadline if deadline is not None else outer)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(previous)
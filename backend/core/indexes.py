@@ -0,0 +1,130 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from core.chat_store import BUCKET_SORT, conversation_filter, older_buckets_filter, open_bucket_filter
+from core.course_store import COURSE_LIST_SORT, course_filter, course_list_match
+from core.jobs import CLAIM_SORT, JOB_RETENTION_SECONDS, active_filter, claimable_filter
+from core.prefetch import PREFETCH_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Every index the application relies on, per collection. Creating an index that
+# already exists with the same keys and options is a no-op, so this is applied
+# on every (re)connect. The module cache manages its own (see module_cache.py).
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "courses": [
+        IndexModel([("course_id", ASCENDING)], name="course_id_unique", unique=True),
+        # Course list: a user's courses, newest first, paged on (created_at, _id)
+        IndexModel(
+            [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="user_id_created_at_id",
+        ),
+    ],
+    "chats": [
+        # Message buckets of a conversation, newest first; one writer starts each bucket
+        IndexModel(
+            [("course_id", ASCENDING), ("user_id", ASCENDING), ("bucket", DESCENDING)],
+            name="course_id_user_id_bucket_unique",
+            unique=True,
+        ),
+    ],
+    "generation_jobs": [
+        IndexModel([("job_id", ASCENDING)], name="job_id_unique", unique=True),
+        # Claiming the oldest queued (or expired) job
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created_at"),
+        IndexModel([("key", ASCENDING), ("status", ASCENDING)], name="key_status"),
+        # Finished jobs expire; queued and running ones have no finished_at yet
+        IndexModel([("finished_at", ASCENDING)], name="finished_at_ttl", expireAfterSeconds=JOB_RETENTION_SECONDS),
+    ],
+    "generation_job_events": [
+        IndexModel([("job_id", ASCENDING), ("seq", ASCENDING)], name="job_id_seq_unique", unique=True),
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=JOB_RETENTION_SECONDS),
+    ],
+    "prefetched_modules": [
+        IndexModel([("course_id", ASCENDING), ("topic", ASCENDING)], name="course_id_topic_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", ASCENDING)], name="user_id_created_at"),
+        # Abandoned prefetches are removed once they are a day old (by default)
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=PREFETCH_TTL_SECONDS),
+    ],
+    "course_catalog": [
+        IndexModel([("key", ASCENDING), ("depth", ASCENDING)], name="key_depth_unique", unique=True),
+    ],
+    "prompt_index": [
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+        IndexModel([("last_used_at", DESCENDING)], name="last_used_at"),
+    ],
+}
+
+# The hot queries, as (collection, filter, sort), built with the same helpers the
+# application queries with; check_indexes.py explains each one and fails if any of
+# them is answered with a collection scan
+_SAMPLE_ID = ObjectId()
+_SAMPLE_DATE = datetime(2000, 1, 1)
+HOT_QUERIES: List[Tuple[str, Dict[str, Any], Optional[List[Tuple[str, int]]]]] = [
+    ("users", {"email": "someone@example.com"}, None),
+    ("courses", course_filter("c", "u"), None),
+    ("courses", course_filter("c"), None),
+    ("courses", course_list_match("u", None), list(COURSE_LIST_SORT.items())),
+    ("courses", course_list_match("u", (_SAMPLE_DATE, _SAMPLE_ID)), list(COURSE_LIST_SORT.items())),
+    ("courses", course_list_match("u", (None, _SAMPLE_ID)), list(COURSE_LIST_SORT.items())),
+    ("chats", conversation_filter("c", "u"), BUCKET_SORT),
+    ("chats", open_bucket_filter("c", "u", 3, 2), None),
+    ("chats", older_buckets_filter("c", "u", 3), BUCKET_SORT),
+    ("generation_jobs", {"job_id": "j"}, None),
+    ("generation_jobs", claimable_filter(_SAMPLE_DATE), CLAIM_SORT),
+    ("generation_jobs", active_filter("c"), None),
+    ("generation_job_events", {"job_id": "j", "seq": {"$gt": 0}}, [("seq", ASCENDING)]),
+    ("prefetched_modules", {"course_id": "c", "topic": "t"}, None),
+    ("prefetched_modules", {"user_id": "u", "course_id": {"$ne": "c"}}, [("created_at", ASCENDING)]),
+    ("course_catalog", {"key": "k", "depth": "standard"}, None),
+]
+
+# Plan stages that read through an index rather than the whole collection
+_INDEX_STAGES = {"IXSCAN", "EXPRESS_IXSCAN", "IDHACK", "COUNT_SCAN", "DISTINCT_SCAN"}
+
+
+async def ensure_indexes(database) -> bool:
+    """Creates any missing index; returns False if one of them could not be created."""
+    ok = True
+    for name, models in INDEXES.items():
+        for model in models:
+            try:
+                await database[name].create_indexes([model])
+            except Exception as e:
+                # Usually an existing index with other options, or duplicates
+                # blocking a unique one: the rest still get created
+                ok = False
+                logger.error(f"Could not create index {name}.{model.document['name']}: {e}")
+    if ok:
+        logger.info(f"Indexes ensured on {len(INDEXES)} collections")
+    return ok
+
+
+def plan_stages(explain: Dict[str, Any]) -> List[str]:
+    """All stage names in the winning plan of an explain() result."""
+    stages = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            if isinstance(node.get("stage"), str):
+                stages.append(node["stage"])
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(explain.get("queryPlanner", {}).get("winningPlan", {}))
+    return stages
+
+
+def uses_index(explain: Dict[str, Any]) -> bool:
+    stages = plan_stages(explain)
+    return "COLLSCAN" not in stages and any(stage in _INDEX_STAGES for stage in stages)
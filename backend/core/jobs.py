@@ -0,0 +1,489 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+from core.cancellation import CancelToken, GenerationCancelled, use_token
+from core.compression import compress_module, compress_modules, compress_text, decompress_module, decompress_text
+from core.metrics import metrics
+from db import db
+
+logger = logging.getLogger(__name__)
+
+# mongo (default, shared by all uvicorn workers) | local (in-process stand-in)
+JOB_BROKER = os.getenv("JOB_BROKER", "mongo").strip().lower()
+# Number of jobs each process executes concurrently
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# A running job whose worker stops heartbeating for this long is picked up again
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+# An attached job nobody has followed for this long is cancelled (detached jobs never are)
+JOB_ABANDON_SECONDS = int(os.getenv("JOB_ABANDON_SECONDS", "45"))
+# How often a running job checks for cancel requests and abandonment
+JOB_CANCEL_POLL_SECONDS = float(os.getenv("JOB_CANCEL_POLL_SECONDS", "2"))
+# Finished jobs and their events are removed by TTL indexes after this many seconds
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+TERMINAL_STATUSES = {"done", "failed", "cancelled"}
+
+Job = Dict[str, Any]
+Event = Dict[str, Any]
+JobHandler = Callable[[Job], AsyncIterator[Event]]
+
+# Jobs are claimed oldest first
+CLAIM_SORT = [("created_at", 1)]
+
+
+def claimable_filter(now: datetime) -> Dict[str, Any]:
+    """Queued jobs, and running ones whose worker stopped heartbeating."""
+    return {"$or": [
+        {"status": "queued"},
+        {"status": "running", "lease_until": {"$lt": now}},
+    ]}
+
+
+def active_filter(key: str) -> Dict[str, Any]:
+    """The unfinished jobs working on `key`."""
+    return {"key": key, "status": {"$nin": list(TERMINAL_STATUSES)}}
+
+
+def _pack_event(event: Event) -> Event:
+    """`event` as stored: the module content it carries is compressed like stored courses."""
+    kind = event.get("type")
+    if kind == "module" and isinstance(event.get("data"), dict):
+        return {**event, "data": compress_module(event["data"])}
+    if kind == "complete" and isinstance((event.get("data") or {}).get("modules"), dict):
+        return {**event, "data": {**event["data"], "modules": compress_modules(event["data"]["modules"])}}
+    if kind == "subtopic" and isinstance(event.get("explanation"), str):
+        return {**event, "explanation": compress_text(event["explanation"])}
+    return event
+
+
+def _unpack_event(event: Event) -> Event:
+    kind = event.get("type")
+    if kind == "module":
+        return {**event, "data": decompress_module(event.get("data"))}
+    if kind == "complete" and isinstance((event.get("data") or {}).get("modules"), dict):
+        modules = {topic: decompress_module(module) for topic, module in event["data"]["modules"].items()}
+        return {**event, "data": {**event["data"], "modules": modules}}
+    if kind == "subtopic":
+        return {**event, "explanation": decompress_text(event.get("explanation"))}
+    return event
+
+
+def _new_job(kind: str, payload: Dict[str, Any], user_id: str, key: Optional[str], attached: bool) -> Job:
+    return {
+        "job_id": str(uuid.uuid4()),
+        "kind": kind,
+        "key": key,
+        "payload": payload,
+        "user_id": user_id,
+        "status": "queued",
+        "error": None,
+        # Attached jobs are cancelled once their client stops following them
+        "attached": attached,
+        "follower_seen_at": datetime.utcnow(),
+        "cancel_requested": False,
+        # Last event number handed out, kept on the job so any worker continues it
+        "last_seq": 0,
+        "created_at": datetime.utcnow(),
+        "started_at": None,
+        "finished_at": None,
+    }
+
+
+class JobLeaseLost(Exception):
+    """The job was reclaimed by another worker; this worker's writes are rejected."""
+
+
+class LocalJobBroker:
+    """
+    In-process broker keeping jobs and events in memory. It needs no external
+    service, which makes it the stand-in for tests and single-worker setups.
+    """
+
+    def __init__(self):
+        self._jobs: Dict[str, Job] = {}
+        self._events: Dict[str, List[Event]] = {}
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._changed: Dict[str, asyncio.Event] = {}
+
+    async def enqueue(self, kind: str, payload: Dict[str, Any], user_id: str,
+                      key: Optional[str] = None, attached: bool = False) -> Job:
+        job = _new_job(kind, payload, user_id, key, attached)
+        self._jobs[job["job_id"]] = job
+        self._events[job["job_id"]] = []
+        await self._queue.put(job["job_id"])
+        return dict(job)
+
+    async def claim(self, worker_id: str, timeout: float) -> Optional[Job]:
+        try:
+            job_id = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        job = self._jobs[job_id]
+        if job["status"] != "queued":
+            return None  # cancelled while waiting in the queue
+        job.update({"status": "running", "worker": worker_id, "started_at": datetime.utcnow()})
+        return dict(job)
+
+    async def heartbeat(self, job_id: str, worker_id: Optional[str] = None) -> None:
+        pass
+
+    async def request_cancel(self, job_id: str, reason: str = "cancelled by user") -> None:
+        job = self._jobs.get(job_id)
+        if job is None or job["status"] in TERMINAL_STATUSES:
+            return
+        if job["status"] == "queued":
+            await self.finish(job_id, "cancelled", error="cancelled before it started")
+        else:
+            job.update({"cancel_requested": True, "cancel_reason": reason})
+
+    async def touch_follower(self, job_id: str) -> None:
+        if job_id in self._jobs:
+            self._jobs[job_id]["follower_seen_at"] = datetime.utcnow()
+
+    async def publish(self, job_id: str, event: Event, worker_id: Optional[str] = None) -> int:
+        events = self._events[job_id]
+        events.append({"seq": len(events) + 1, "event": event})
+        self._notify(job_id)
+        return len(events)
+
+    async def finish(self, job_id: str, status: str, error: Optional[str] = None,
+                     worker_id: Optional[str] = None) -> None:
+        self._jobs[job_id].update({"status": status, "error": error, "finished_at": datetime.utcnow()})
+        self._notify(job_id)
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def find_active(self, key: str) -> Optional[Job]:
+        for job in self._jobs.values():
+            if job["key"] == key and job["status"] not in TERMINAL_STATUSES:
+                return dict(job)
+        return None
+
+    async def delete_by_key(self, key: str) -> None:
+        for job_id in [job_id for job_id, job in self._jobs.items() if job["key"] == key]:
+            del self._jobs[job_id]
+            self._events.pop(job_id, None)
+
+    async def events_after(self, job_id: str, after: int, timeout: float) -> List[Dict[str, Any]]:
+        if job_id not in self._jobs:
+            return []
+        events = self._events[job_id]
+        if len(events) <= after and self._jobs[job_id]["status"] not in TERMINAL_STATUSES:
+            changed = self._changed.setdefault(job_id, asyncio.Event())
+            try:
+                await asyncio.wait_for(changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._events[job_id][after:]
+
+    def _notify(self, job_id: str) -> None:
+        changed = self._changed.pop(job_id, None)
+        if changed is not None:
+            changed.set()
+
+
+class MongoJobBroker:
+    """
+    Broker backed by the `generation_jobs` and `generation_job_events`
+    collections, so any uvicorn worker can run a job and any worker can serve
+    its event stream.
+    """
+
+    POLL_SECONDS = 0.5
+
+    def __init__(self, database):
+        self.jobs = database["generation_jobs"]
+        self.events = database["generation_job_events"]
+
+    async def enqueue(self, kind: str, payload: Dict[str, Any], user_id: str,
+                      key: Optional[str] = None, attached: bool = False) -> Job:
+        job = _new_job(kind, payload, user_id, key, attached)
+        await self.jobs.insert_one(dict(job))
+        return job
+
+    async def claim(self, worker_id: str, timeout: float) -> Optional[Job]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            now = datetime.utcnow()
+            job = await self.jobs.find_one_and_update(
+                claimable_filter(now),
+                {
+                    "$set": {
+                        "status": "running",
+                        "worker": worker_id,
+                        "started_at": now,
+                        "lease_until": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                    },
+                    "$inc": {"attempts": 1},
+                },
+                sort=CLAIM_SORT,
+                projection={"_id": 0},
+                return_document=ReturnDocument.AFTER,
+            )
+            if job:
+                return job
+            if loop.time() >= deadline:
+                return None
+            await asyncio.sleep(self.POLL_SECONDS)
+
+    async def heartbeat(self, job_id: str, worker_id: Optional[str] = None) -> None:
+        await self.jobs.update_one(
+            {**self._owned(job_id, worker_id), "status": "running"},
+            {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=JOB_LEASE_SECONDS)}},
+        )
+
+    async def request_cancel(self, job_id: str, reason: str = "cancelled by user") -> None:
+        now = datetime.utcnow()
+        # A job still in the queue is cancelled outright; a running one is asked to stop
+        queued = await self.jobs.update_one(
+            {"job_id": job_id, "status": "queued"},
+            {"$set": {"status": "cancelled", "error": "cancelled before it started", "finished_at": now}},
+        )
+        if not queued.modified_count:
+            await self.jobs.update_one(
+                {"job_id": job_id, "status": "running"},
+                {"$set": {"cancel_requested": True, "cancel_reason": reason}},
+            )
+
+    async def touch_follower(self, job_id: str) -> None:
+        await self.jobs.update_one({"job_id": job_id}, {"$set": {"follower_seen_at": datetime.utcnow()}})
+
+    async def publish(self, job_id: str, event: Event, worker_id: Optional[str] = None) -> int:
+        # Numbered on the job document, so a job reclaimed by another process
+        # continues the sequence instead of starting it over
+        job = await self.jobs.find_one_and_update(
+            self._owned(job_id, worker_id),
+            {"$inc": {"last_seq": 1}},
+            projection={"_id": 0, "last_seq": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if job is None:
+            raise JobLeaseLost(f"Job {job_id} is no longer held by {worker_id}")
+        seq = job["last_seq"]
+        await self.events.insert_one({
+            "job_id": job_id,
+            "seq": seq,
+            "event": _pack_event(event),
+            "created_at": datetime.utcnow(),
+        })
+        return seq
+
+    async def finish(self, job_id: str, status: str, error: Optional[str] = None,
+                     worker_id: Optional[str] = None) -> None:
+        await self.jobs.update_one(
+            self._owned(job_id, worker_id),
+            {"$set": {"status": status, "error": error, "finished_at": datetime.utcnow()},
+             "$unset": {"lease_until": ""}},
+        )
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await self.jobs.find_one({"job_id": job_id}, {"_id": 0})
+
+    @staticmethod
+    def _owned(job_id: str, worker_id: Optional[str]) -> Dict[str, Any]:
+        """The job, only while `worker_id` (when given) still holds it."""
+        query: Dict[str, Any] = {"job_id": job_id}
+        if worker_id is not None:
+            query["worker"] = worker_id
+        return query
+
+    async def find_active(self, key: str) -> Optional[Job]:
+        return await self.jobs.find_one(active_filter(key), {"_id": 0})
+
+    async def delete_by_key(self, key: str) -> None:
+        """Deletes the jobs working on `key` (e.g. a deleted course) and their events."""
+        job_ids = [job["job_id"] async for job in self.jobs.find({"key": key}, {"job_id": 1})]
+        if job_ids:
+            await self.events.delete_many({"job_id": {"$in": job_ids}})
+            await self.jobs.delete_many({"job_id": {"$in": job_ids}})
+
+    async def events_after(self, job_id: str, after: int, timeout: float) -> List[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            events = await self.events.find(
+                {"job_id": job_id, "seq": {"$gt": after}},
+                {"_id": 0, "seq": 1, "event": 1},
+            ).sort("seq", 1).to_list()
+            if events or loop.time() >= deadline:
+                return [{**record, "event": _unpack_event(record["event"])} for record in events]
+            job = await self.jobs.find_one({"job_id": job_id}, {"status": 1})
+            if not job or job["status"] in TERMINAL_STATUSES:
+                return []
+            await asyncio.sleep(self.POLL_SECONDS)
+
+
+class JobQueue:
+    """Runs registered job handlers on a pool of worker tasks in this process."""
+
+    def __init__(self, broker, concurrency: int = JOB_WORKERS):
+        self.broker = broker
+        self.concurrency = concurrency
+        self._handlers: Dict[str, JobHandler] = {}
+        self._workers: List[asyncio.Task] = []
+        self._worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self._handlers[kind] = handler
+
+    async def submit(self, kind: str, payload: Dict[str, Any], user_id: str,
+                     key: Optional[str] = None, attached: bool = False) -> Job:
+        """
+        Enqueues a job; `key` identifies the entity it works on (e.g. a course
+        id). An `attached` job is cancelled once nobody follows its events.
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        return await self.broker.enqueue(kind, payload, user_id, key, attached)
+
+    async def cancel(self, job_id: str, reason: str = "cancelled by user") -> None:
+        """
+        Asks a job to stop; the running worker notices within
+        JOB_CANCEL_POLL_SECONDS and finishes it with `reason` as its error.
+        """
+        await self.broker.request_cancel(job_id, reason)
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+        for n in range(self.concurrency):
+            self._workers.append(asyncio.create_task(self._worker(f"{self._worker_prefix}:{n}")))
+        logger.info(f"Started {self.concurrency} job workers ({type(self.broker).__name__})")
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def follow(self, job_id: str, after: int = 0) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields {"seq", "event"} records of a job after `after`, waiting for new
+        ones until the job has finished. Safe to call again to reattach.
+        """
+        while True:
+            await self.broker.touch_follower(job_id)
+            records = await self.broker.events_after(job_id, after, timeout=JOB_ABANDON_SECONDS / 3)
+            for record in records:
+                after = record["seq"]
+                yield record
+            if not records:
+                job = await self.broker.get(job_id)
+                if not job or job["status"] in TERMINAL_STATUSES:
+                    return
+
+    async def _worker(self, worker_id: str) -> None:
+        while True:
+            try:
+                job = await self.broker.claim(worker_id, timeout=5)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker {worker_id} failed to claim a job: {e}")
+                await asyncio.sleep(5)
+                continue
+            if not job:
+                continue
+            try:
+                await self._run(job, worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The job is reclaimed once its lease runs out; this worker carries on
+                logger.error(f"Job worker {worker_id} failed running job {job['job_id']}: {e}")
+
+    async def _run(self, job: Job, worker_id: Optional[str] = None) -> None:
+        job_id = job["job_id"]
+        handler = self._handlers.get(job["kind"])
+        if handler is None:
+            await self._report(job_id, worker_id, None, "failed", f"Unknown job kind '{job['kind']}'")
+            return
+
+        token = CancelToken()
+        runner = asyncio.create_task(self._publish_events(job_id, worker_id, handler(job), token))
+        watcher = asyncio.create_task(self._watch(job_id, worker_id, token, runner))
+        try:
+            await runner
+            await self.broker.finish(job_id, "done", worker_id=worker_id)
+        except (asyncio.CancelledError, GenerationCancelled):
+            if not token.cancelled:
+                # The worker itself is shutting down: leave the job to be reclaimed
+                raise
+            logger.info(f"Job {job_id} cancelled: {token.reason}")
+            metrics.incr("cancellation.jobs_cancelled", reason=token.reason)
+            event = {"type": "cancelled", "message": f"Generation cancelled: {token.reason}"}
+            await self._report(job_id, worker_id, event, "cancelled", token.reason)
+        except JobLeaseLost as e:
+            # Another worker owns the job now and reports its outcome
+            logger.warning(str(e))
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            await self._report(job_id, worker_id, {"type": "error", "message": str(e)}, "failed", str(e))
+        finally:
+            watcher.cancel()
+
+    async def _report(self, job_id: str, worker_id: Optional[str], event: Optional[Event],
+                      status: str, error: Optional[str]) -> None:
+        """Publishes the final event and status of a job; a failed write is logged, not raised."""
+        try:
+            if event is not None:
+                await self.broker.publish(job_id, event, worker_id=worker_id)
+            await self.broker.finish(job_id, status, error=error, worker_id=worker_id)
+        except Exception as e:
+            logger.error(f"Could not record the outcome ({status}) of job {job_id}: {e}")
+
+    async def _publish_events(self, job_id: str, worker_id: Optional[str], events: AsyncIterator[Event],
+                              token: CancelToken) -> None:
+        # Runs in its own task so the token is bound to everything the handler spawns
+        use_token(token)
+        async for event in events:
+            await self.broker.publish(job_id, event, worker_id=worker_id)
+
+    async def _watch(self, job_id: str, worker_id: Optional[str], token: CancelToken,
+                     runner: asyncio.Task) -> None:
+        """Keeps the lease alive and cancels the job when asked to or when abandoned."""
+        loop = asyncio.get_running_loop()
+        last_heartbeat = loop.time()
+        while True:
+            await asyncio.sleep(JOB_CANCEL_POLL_SECONDS)
+            try:
+                job = await self.broker.get(job_id) or {}
+                reason = None
+                if job.get("cancel_requested"):
+                    reason = job.get("cancel_reason") or "cancelled by user"
+                elif job.get("attached") and job.get("follower_seen_at") and (
+                    datetime.utcnow() - job["follower_seen_at"] > timedelta(seconds=JOB_ABANDON_SECONDS)
+                ):
+                    reason = "client disconnected"
+                if reason:
+                    # Running LLM/YouTube threads see the token; queued work is dropped with the task
+                    token.cancel(reason)
+                    runner.cancel()
+                    return
+
+                if loop.time() - last_heartbeat >= JOB_LEASE_SECONDS / 3:
+                    await self.broker.heartbeat(job_id, worker_id=worker_id)
+                    last_heartbeat = loop.time()
+            except Exception as e:
+                logger.error(f"Watching job {job_id} failed: {e}")
+
+
+def _make_broker():
+    if JOB_BROKER == "mongo" and db is not None:
+        return MongoJobBroker(db)
+    if JOB_BROKER == "mongo":
+        logger.warning("Database unavailable, using the in-process job broker.")
+    return LocalJobBroker()
+
+
+job_queue = JobQueue(_make_broker())
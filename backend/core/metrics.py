@@ -0,0 +1,71 @@
+import threading
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict
+
+# Recent observations kept per timing series for percentile estimates
+SAMPLE_SIZE = 1000
+
+
+def _key(name: str, labels: Dict[str, Any]) -> str:
+    if not labels:
+        return name
+    return name + "{" + ",".join(f"{k}={labels[k]}" for k in sorted(labels)) + "}"
+
+
+def _percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Metrics:
+    """
+    Minimal in-process metrics registry (counters, gauges and timings) served
+    as JSON by the /metrics endpoint. Safe to use from worker threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._gauges: Dict[str, float] = {}
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=SAMPLE_SIZE))
+        self._totals: Dict[str, Dict[str, float]] = defaultdict(lambda: {"count": 0, "sum": 0.0, "max": 0.0})
+
+    def incr(self, name: str, value: float = 1, **labels) -> None:
+        with self._lock:
+            self._counters[_key(name, labels)] += value
+
+    def gauge(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            self._samples[key].append(value)
+            totals = self._totals[key]
+            totals["count"] += 1
+            totals["sum"] += value
+            totals["max"] = max(totals["max"], value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            timings = {}
+            for key, totals in self._totals.items():
+                recent = sorted(self._samples[key])
+                timings[key] = {
+                    "count": totals["count"],
+                    "avg": totals["sum"] / totals["count"] if totals["count"] else 0.0,
+                    "max": totals["max"],
+                    "p50": _percentile(recent, 0.50),
+                    "p95": _percentile(recent, 0.95),
+                }
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "timings": timings,
+            }
+
+
+metrics = Metrics()
@@ -0,0 +1,136 @@
+import copy
+import hashlib
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from core.compression import compress_module, decompress_module
+from core.metrics import metrics
+from db import sync_db as db
+
+logger = logging.getLogger(__name__)
+
+# Set to "false" to stop sharing generated modules between users altogether
+MODULE_CACHE_ENABLED = os.getenv("MODULE_CACHE_ENABLED", "true").strip().lower() != "false"
+# How long a shared module is served before it is generated afresh
+MODULE_CACHE_TTL_SECONDS = int(os.getenv("MODULE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Upper bound on cached modules; the least recently used ones are evicted first
+MODULE_CACHE_MAX_ENTRIES = int(os.getenv("MODULE_CACHE_MAX_ENTRIES", "5000"))
+
+# Fields that describe one learner's copy of a module rather than the content
+_PER_COURSE_FIELDS = ("revision", "is_regenerated", "degraded")
+
+
+# Bumped whenever `normalize` changes, so entries keyed the old way are no longer served
+_KEY_VERSION = "2"
+
+
+def normalize(text: str) -> str:
+    """
+    Case and whitespace-insensitive form of a title or topic. Symbols are kept:
+    "C++", "C#" and "C" are different subjects.
+    """
+    return " ".join(text.casefold().split())
+
+
+class ModuleCache:
+    """
+    Generated modules shared between users in the `module_cache` collection,
+    keyed on the normalized course title and topic plus everything that shapes
+    the content (prompt version, depth, whether assessments are included).
+
+    Entries expire after MODULE_CACHE_TTL_SECONDS (a TTL index removes them
+    from MongoDB, reads ignore them before that) and the collection is capped
+    at MODULE_CACHE_MAX_ENTRIES by evicting the least recently served entries.
+    """
+
+    def __init__(self, database, ttl_seconds: int = MODULE_CACHE_TTL_SECONDS,
+                 max_entries: int = MODULE_CACHE_MAX_ENTRIES):
+        self.collection = database["module_cache"] if database is not None else None
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._indexed = False
+
+    @property
+    def enabled(self) -> bool:
+        return (
+            MODULE_CACHE_ENABLED
+            and self.collection is not None
+            and self.ttl_seconds > 0
+            and self.max_entries > 0
+        )
+
+    @staticmethod
+    def key(course_title: str, topic: str, prompt_version: str, depth: str, include_assessments: bool) -> str:
+        parts = [_KEY_VERSION, normalize(course_title), normalize(topic), prompt_version, depth, str(include_assessments)]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """A copy of the cached module for `key`, or None on a miss or error."""
+        if not self.enabled:
+            return None
+        now = datetime.utcnow()
+        try:
+            doc = self.collection.find_one_and_update(
+                {"key": key, "expires_at": {"$gt": now}},
+                {"$set": {"last_hit_at": now}, "$inc": {"hits": 1}},
+                projection={"module": 1},
+            )
+        except Exception as e:
+            logger.warning(f"Module cache lookup failed: {e}")
+            return None
+        metrics.incr("module_cache.hits" if doc else "module_cache.misses")
+        return decompress_module(doc["module"]) if doc else None
+
+    def put(self, key: str, module: Dict[str, Any], topic: str) -> None:
+        """Stores a freshly generated module; degraded modules are never shared."""
+        if not self.enabled or module.get("degraded"):
+            return
+        shared = copy.deepcopy(module)
+        for field in _PER_COURSE_FIELDS:
+            shared.pop(field, None)
+        shared = compress_module(shared)
+
+        now = datetime.utcnow()
+        try:
+            self._ensure_indexes()
+            self.collection.update_one(
+                {"key": key},
+                {
+                    "$set": {
+                        "topic": topic,
+                        "module": shared,
+                        "created_at": now,
+                        "last_hit_at": now,
+                        "expires_at": now + timedelta(seconds=self.ttl_seconds),
+                    },
+                    "$setOnInsert": {"hits": 0},
+                },
+                upsert=True,
+            )
+            metrics.incr("module_cache.stores")
+            self._evict()
+        except Exception as e:
+            logger.warning(f"Failed to cache module '{topic}': {e}")
+
+    def _evict(self) -> None:
+        excess = self.collection.estimated_document_count() - self.max_entries
+        if excess <= 0:
+            return
+        stale = self.collection.find({}, {"_id": 1}).sort("last_hit_at", 1).limit(excess)
+        stale_ids = [doc["_id"] for doc in stale]
+        if stale_ids:
+            self.collection.delete_many({"_id": {"$in": stale_ids}})
+            metrics.incr("module_cache.evictions", len(stale_ids))
+
+    def _ensure_indexes(self) -> None:
+        if self._indexed:
+            return
+        self.collection.create_index("key", unique=True)
+        self.collection.create_index("last_hit_at")
+        self.collection.create_index("expires_at", expireAfterSeconds=0)
+        self._indexed = True
+
+
+module_cache = ModuleCache(db)
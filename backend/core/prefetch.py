@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from agent.agent import generate_module_content
+from agent.profiles import DEFAULT_DEPTH
+from core.cancellation import CancelToken, GenerationCancelled, use_token
+from core.compression import compress_module, decompress_module
+from core.scheduler import Priority, scheduler
+from db import db, courses_collection
+
+logger = logging.getLogger(__name__)
+
+prefetched_collection = db["prefetched_modules"] if db is not None else None
+
+# How many pending topics of a course are prepared ahead of the learner
+PREFETCH_AHEAD = int(os.getenv("PREFETCH_AHEAD", "2"))
+# Upper bound on parked (prepared but not yet delivered) modules per user
+PREFETCH_MAX_PER_USER = int(os.getenv("PREFETCH_MAX_PER_USER", "4"))
+# Parked modules nobody asked for within this many seconds are removed by a TTL index
+PREFETCH_TTL_SECONDS = int(os.getenv("PREFETCH_TTL_SECONDS", str(24 * 3600)))
+
+
+class ModulePrefetcher:
+    """
+    Generates the next pending modules of a course in the background and parks
+    them in `prefetched_modules` until `generate_next_module` asks for them.
+
+    Only one course per user is prefetched at a time: scheduling a new course
+    cancels the previous one, since the learner has moved on from it.
+    """
+
+    def __init__(self, ahead: int = PREFETCH_AHEAD, max_per_user: int = PREFETCH_MAX_PER_USER):
+        self.ahead = ahead
+        self.max_per_user = max_per_user
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._tokens: Dict[str, CancelToken] = {}
+        self._user_course: Dict[str, str] = {}
+        # course_id -> (topic being generated, future resolved when it is done)
+        self._inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return (
+            self.ahead > 0
+            and self.max_per_user > 0
+            and prefetched_collection is not None
+            and courses_collection is not None
+        )
+
+    def schedule(self, course_id: str, user_id: str) -> None:
+        """Starts (or keeps) a prefetch task topping the course up to `ahead` modules."""
+        if not self.enabled:
+            return
+
+        previous = self._user_course.get(user_id)
+        if previous and previous != course_id:
+            logger.info(f"Prefetch for course {previous} abandoned by {user_id}")
+            self.cancel(previous)
+
+        self._user_course[user_id] = course_id
+        task = self._tasks.get(course_id)
+        if task is not None and not task.done():
+            return
+
+        token = CancelToken()
+        task = asyncio.create_task(self._run(course_id, user_id, token))
+        self._tasks[course_id] = task
+        self._tokens[course_id] = token
+        task.add_done_callback(lambda t: self._forget(course_id, user_id, t))
+
+    def cancel(self, course_id: str) -> None:
+        """Stops prefetching a course."""
+        task = self._tasks.pop(course_id, None)
+        token = self._tokens.pop(course_id, None)
+        if token is not None:
+            # Also stops the generation thread, which task.cancel() cannot reach
+            token.cancel("prefetch cancelled")
+        if task is not None:
+            task.cancel()
+
+    async def drop(self, course_id: str) -> None:
+        """Stops prefetching a course and discards its parked modules."""
+        self.cancel(course_id)
+        if prefetched_collection is not None:
+            await prefetched_collection.delete_many({"course_id": course_id})
+
+    async def discard(self, course_id: str, topics: List[str]) -> None:
+        """
+        Drops the parked modules of topics removed from a course, stopping the
+        prefetch if it is generating one of them.
+        """
+        inflight = self._inflight.get(course_id)
+        if inflight is not None and inflight[0] in topics:
+            self.cancel(course_id)
+        if prefetched_collection is not None and topics:
+            await prefetched_collection.delete_many({"course_id": course_id, "topic": {"$in": topics}})
+
+    async def take(self, course_id: str, topic: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the prepared module for `topic` and removes it from the parking
+        area. Waits for the prefetcher if it is generating that very topic.
+        """
+        if prefetched_collection is None:
+            return None
+
+        inflight = self._inflight.get(course_id)
+        if inflight is not None and inflight[0] == topic:
+            # asyncio.wait never raises, even if the prefetch task gets cancelled
+            await asyncio.wait({inflight[1]})
+
+        doc = await prefetched_collection.find_one_and_delete({"course_id": course_id, "topic": topic})
+        return decompress_module(doc["module"]) if doc else None
+
+    async def _run(self, course_id: str, user_id: str, token: CancelToken) -> None:
+        use_token(token)
+        loop = asyncio.get_running_loop()
+        while True:
+            course_doc = await courses_collection.find_one(
+                {"course_id": course_id, "user_id": user_id},
+                {"title": 1, "lazy_assessments": 1, "depth": 1, "shared_cache": 1, "course_data.pending_topics": 1},
+            )
+            if not course_doc:
+                # Course was deleted while we were working on it
+                await prefetched_collection.delete_many({"course_id": course_id})
+                return
+
+            pending = course_doc.get("course_data", {}).get("pending_topics", [])[:self.ahead]
+            parked = {
+                doc["topic"]
+                async for doc in prefetched_collection.find({"course_id": course_id}, {"topic": 1})
+            }
+            todo = [t for t in pending if t not in parked]
+            if not todo:
+                return
+            if not await self._make_room(user_id, course_id):
+                logger.info(f"Prefetch cap reached for {user_id}, stopping")
+                return
+
+            topic = todo[0]
+            async with scheduler.slot(user_id, Priority.PREFETCH):
+                # Only registered once running, so a click never waits on a queued
+                # prefetch, but before the check below: a claim made after it is
+                # then seen by the check, and its take() waits for the outcome
+                done = loop.create_future()
+                self._inflight[course_id] = (topic, done)
+                try:
+                    # The learner may have claimed the topic while we were queued
+                    if not await courses_collection.find_one(
+                        {"course_id": course_id, "course_data.pending_topics": topic}, {"_id": 1}
+                    ):
+                        continue
+
+                    logger.info(f"Prefetching '{topic}' for course {course_id}")
+                    module = await asyncio.to_thread(
+                        generate_module_content, topic, course_doc.get("title", ""),
+                        include_assessments=not course_doc.get("lazy_assessments", False),
+                        depth=course_doc.get("depth") or DEFAULT_DEPTH,
+                        use_cache=course_doc.get("shared_cache") is not False
+                    )
+                    await prefetched_collection.update_one(
+                        {"course_id": course_id, "topic": topic},
+                        {"$set": {
+                            "user_id": user_id,
+                            "module": compress_module(module),
+                            "created_at": datetime.utcnow(),
+                        }},
+                        upsert=True,
+                    )
+                except GenerationCancelled:
+                    logger.info(f"Prefetch of '{topic}' cancelled for course {course_id}")
+                    return
+                except Exception as e:
+                    logger.error(f"Prefetch of '{topic}' failed for course {course_id}: {e}")
+                    return
+                finally:
+                    self._inflight.pop(course_id, None)
+                    if not done.done():
+                        done.set_result(None)
+
+    async def _make_room(self, user_id: str, course_id: str) -> bool:
+        """Evicts the oldest parked modules of the user's other courses if over the cap."""
+        parked = await prefetched_collection.count_documents({"user_id": user_id})
+        if parked < self.max_per_user:
+            return True
+
+        stale = prefetched_collection.find(
+            {"user_id": user_id, "course_id": {"$ne": course_id}},
+            {"_id": 1},
+        ).sort("created_at", 1).limit(parked - self.max_per_user + 1)
+        stale_ids = [doc["_id"] async for doc in stale]
+        if stale_ids:
+            await prefetched_collection.delete_many({"_id": {"$in": stale_ids}})
+        return await prefetched_collection.count_documents({"user_id": user_id}) < self.max_per_user
+
+    def _forget(self, course_id: str, user_id: str, task: asyncio.Task) -> None:
+        if self._tasks.get(course_id) is task:
+            del self._tasks[course_id]
+            self._tokens.pop(course_id, None)
+        if self._user_course.get(user_id) == course_id and course_id not in self._tasks:
+            del self._user_course[user_id]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Prefetch task for course {course_id} crashed: {task.exception()}")
+
+
+prefetcher = ModulePrefetcher()
@@ -0,0 +1,236 @@
+import hashlib
+import logging
+import os
+import random
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from core.metrics import metrics
+from db import sync_db as db
+
+logger = logging.getLogger(__name__)
+
+# Set to "false" to always build a fresh outline for every prompt
+PROMPT_INDEX_ENABLED = os.getenv("PROMPT_INDEX_ENABLED", "true").strip().lower() != "false"
+# Accepted prompts remembered (in memory and in MongoDB); least recently used go first
+PROMPT_INDEX_MAX_ENTRIES = int(os.getenv("PROMPT_INDEX_MAX_ENTRIES", "5000"))
+# Estimated Jaccard similarity of two prompts' shingles needed to reuse an outline
+PROMPT_INDEX_THRESHOLD = float(os.getenv("PROMPT_INDEX_THRESHOLD", "0.6"))
+
+# MinHash signature length, split into LSH bands of NUM_PERM // BANDS rows each
+NUM_PERM = 64
+BANDS = 32
+SHINGLE_SIZE = 3
+
+# Bumped whenever `prompt_key` changes; entries stored under older keys are dropped on load
+KEY_VERSION = 2
+
+# Function words only: "basics" or "intro" change what a course should cover
+_FILLER_WORDS = {
+    "a", "an", "the", "to", "for", "of", "on", "in", "with", "and", "or", "about",
+    "i", "me", "my", "would", "how",
+}
+# Words keep the symbols that tell subjects apart ("c++", "c#", "node.js")
+_WORD = re.compile(r"[\w+#.]+")
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)
+# Fixed seed: signatures persisted by an earlier process must stay comparable
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def prompt_key(prompt: str) -> str:
+    """Casefolded prompt without filler words, in word order-independent form."""
+    # A trailing "." ends the sentence rather than the word
+    words = [w for w in (token.rstrip(".") for token in _WORD.findall(prompt.casefold())) if w]
+    meaningful = [w for w in words if w not in _FILLER_WORDS] or words
+    return " ".join(sorted(set(meaningful)))
+
+
+def _symbol_words(key: str) -> Set[str]:
+    """Words of a prompt key that name a subject by its symbols, like "c++" or ".net"."""
+    return {w for w in key.split() if not w.isalnum()}
+
+
+def _shingles(text: str) -> Set[str]:
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def signature(prompt: str) -> List[int]:
+    """MinHash signature over the character shingles of the prompt."""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+        for s in _shingles(prompt_key(prompt))
+    ]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity(left: List[int], right: List[int]) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(1 for x, y in zip(left, right) if x == y) / NUM_PERM
+
+
+def _bands(sig: List[int]) -> List[Tuple[int, Tuple[int, ...]]]:
+    rows = NUM_PERM // BANDS
+    return [(band, tuple(sig[band * rows:(band + 1) * rows])) for band in range(BANDS)]
+
+
+class PromptIndex:
+    """
+    In-process MinHash/LSH index over previously accepted course prompts, used
+    to reuse the validated title and outline of a near-duplicate prompt instead
+    of asking the LLM again.
+
+    Entries are kept in LRU order up to `max_entries` and mirrored to the
+    `prompt_index` collection, which is loaded on first use so the index
+    survives restarts. Each process only sees other processes' entries from
+    its next start on.
+    """
+
+    def __init__(self, database, max_entries: int = PROMPT_INDEX_MAX_ENTRIES,
+                 threshold: float = PROMPT_INDEX_THRESHOLD):
+        self.collection = database["prompt_index"] if database is not None else None
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[str]] = {}
+        self._loaded = False
+
+    @property
+    def enabled(self) -> bool:
+        return PROMPT_INDEX_ENABLED and self.max_entries > 0
+
+    def lookup(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        The closest indexed entry ({"prompt", "title", "topics", "similarity"})
+        at or above the threshold, or None.
+        """
+        if not self.enabled:
+            return None
+        self._load()
+        sig = signature(prompt)
+        # Shingles barely tell "c++" from "c": these words have to match exactly
+        symbols = _symbol_words(prompt_key(prompt))
+        with self._lock:
+            candidates = set()
+            for band in _bands(sig):
+                candidates |= self._buckets.get(band, set())
+            best, best_score = None, 0.0
+            for key in candidates:
+                if _symbol_words(key) != symbols:
+                    continue
+                score = similarity(sig, self._entries[key]["signature"])
+                if score > best_score:
+                    best, best_score = key, score
+            if best is None or best_score < self.threshold:
+                metrics.incr("prompt_index.misses")
+                return None
+            self._entries.move_to_end(best)
+            entry = self._entries[best]
+
+        metrics.incr("prompt_index.hits")
+        self._persist_touch(best)
+        return {
+            "prompt": entry["prompt"],
+            "title": entry["title"],
+            "topics": list(entry["topics"]),
+            "similarity": best_score,
+        }
+
+    def add(self, prompt: str, title: str, topics: List[str]) -> None:
+        """Remembers the title and outline built for an accepted prompt."""
+        if not self.enabled or not title or not topics:
+            return
+        self._load()
+        key = prompt_key(prompt)
+        entry = {
+            "key": key,
+            "prompt": prompt,
+            "title": title,
+            "topics": list(topics),
+            "signature": signature(prompt),
+            "version": KEY_VERSION,
+        }
+        with self._lock:
+            evicted = self._insert(entry)
+        self._persist(entry, evicted)
+
+    def _insert(self, entry: Dict[str, Any]) -> List[str]:
+        """Adds an entry under the lock and returns the keys evicted to make room."""
+        key = entry["key"]
+        if key in self._entries:
+            self._unlink(key)
+        self._entries[key] = entry
+        for band in _bands(entry["signature"]):
+            self._buckets.setdefault(band, set()).add(key)
+
+        evicted = []
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._unlink(oldest)
+            evicted.append(oldest)
+        return evicted
+
+    def _unlink(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        for band in _bands(entry["signature"]):
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if self.collection is None:
+                return
+            try:
+                self.collection.delete_many({"version": {"$ne": KEY_VERSION}})
+                docs = list(
+                    self.collection.find({}, {"_id": 0, "last_used_at": 0})
+                    .sort("last_used_at", -1).limit(self.max_entries)
+                )
+            except Exception as e:
+                logger.warning(f"Could not load the prompt index: {e}")
+                return
+            # Oldest first, so the most recently used end up last in LRU order
+            for doc in reversed(docs):
+                if len(doc.get("signature", [])) == NUM_PERM:
+                    self._insert(doc)
+        logger.info(f"Prompt index loaded with {len(self._entries)} entries")
+
+    def _persist(self, entry: Dict[str, Any], evicted: List[str]) -> None:
+        if self.collection is None:
+            return
+        try:
+            self.collection.update_one(
+                {"key": entry["key"]},
+                {"$set": {**entry, "last_used_at": datetime.utcnow()}},
+                upsert=True,
+            )
+            if evicted:
+                self.collection.delete_many({"key": {"$in": evicted}})
+        except Exception as e:
+            logger.warning(f"Could not persist prompt index entry: {e}")
+
+    def _persist_touch(self, key: str) -> None:
+        if self.collection is None:
+            return
+        try:
+            self.collection.update_one({"key": key}, {"$set": {"last_used_at": datetime.utcnow()}})
+        except Exception as e:
+            logger.warning(f"Could not update prompt index entry: {e}")
+
+
+prompt_index = PromptIndex(db)
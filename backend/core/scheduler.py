@@ -0,0 +1,141 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# LLM-bound work units allowed to run at once in this process
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+# Optional per-user weights, e.g. "alice@example.com=2,bob@example.com=0.5"
+SCHEDULER_USER_WEIGHTS = os.getenv("SCHEDULER_USER_WEIGHTS", "")
+
+
+class Priority(IntEnum):
+    """Priority classes of generation work, most urgent first."""
+    FIRST_MODULE = 0
+    NEXT_MODULE = 1
+    REGENERATE = 2
+    PREFETCH = 3
+    BATCH = 4
+
+
+def _parse_weights(raw: str) -> Dict[str, float]:
+    weights = {}
+    for item in raw.split(","):
+        user, _, weight = item.strip().partition("=")
+        try:
+            if user and float(weight) > 0:
+                weights[user] = float(weight)
+        except ValueError:
+            logger.warning(f"Ignoring invalid scheduler weight: {item}")
+    return weights
+
+
+class FairScheduler:
+    """
+    Admission control in front of LLM-bound work.
+
+    Classes are served in strict priority order. Inside a class, users share
+    the capacity by start-time fair queueing: every request gets a virtual
+    start tag of max(class virtual time, user's previous finish tag), so a
+    user bulk-submitting work only ever gets their weighted share.
+    """
+
+    def __init__(self, concurrency: int = LLM_MAX_CONCURRENCY, weights: Optional[Dict[str, float]] = None):
+        self.concurrency = max(1, concurrency)
+        self.weights = weights or {}
+        self._active = 0
+        self._seq = itertools.count()
+        # priority -> heap of (start tag, seq, future, user_id, enqueued_at)
+        self._queues: Dict[Priority, List[Tuple[float, int, asyncio.Future, str, float]]] = {
+            p: [] for p in Priority
+        }
+        self._virtual_time: Dict[Priority, float] = {p: 0.0 for p in Priority}
+        self._last_finish: Dict[Priority, Dict[str, float]] = {p: {} for p in Priority}
+
+    def queue_depth(self, priority: Optional[Priority] = None) -> int:
+        queues = [self._queues[priority]] if priority is not None else self._queues.values()
+        return sum(1 for q in queues for item in q if not item[2].done())
+
+    async def acquire(self, user_id: str, priority: Priority) -> None:
+        loop = asyncio.get_running_loop()
+        if self._active < self.concurrency and self.queue_depth() == 0:
+            self._active += 1
+            self._record_wait(priority, 0.0)
+            return
+
+        start = max(self._virtual_time[priority], self._last_finish[priority].get(user_id, 0.0))
+        self._last_finish[priority][user_id] = start + 1.0 / self.weights.get(user_id, 1.0)
+
+        future = loop.create_future()
+        heapq.heappush(self._queues[priority], (start, next(self._seq), future, user_id, loop.time()))
+        self._report_depth(priority)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was granted just as we were cancelled: hand it on
+                self.release()
+            self._report_depth(priority)
+            raise
+
+    def release(self) -> None:
+        self._active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, user_id: str, priority: Priority):
+        await self.acquire(user_id, priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def run(self, user_id: str, priority: Priority, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Runs a blocking LLM-bound callable in a thread once a slot is granted."""
+        async with self.slot(user_id, priority):
+            return await asyncio.to_thread(fn, *args, **kwargs)
+
+    def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._active < self.concurrency:
+            for priority in Priority:
+                queue = self._queues[priority]
+                while queue and queue[0][2].done():
+                    heapq.heappop(queue)  # cancelled waiter
+                if queue:
+                    break
+            else:
+                return
+
+            start, _, future, user_id, enqueued_at = heapq.heappop(queue)
+            self._virtual_time[priority] = start
+            self._forget_idle_users(priority)
+            self._active += 1
+            future.set_result(None)
+            self._record_wait(priority, loop.time() - enqueued_at)
+            self._report_depth(priority)
+
+    def _forget_idle_users(self, priority: Priority) -> None:
+        # Finish tags behind the virtual clock no longer affect scheduling
+        last_finish = self._last_finish[priority]
+        for user_id in [u for u, f in last_finish.items() if f <= self._virtual_time[priority]]:
+            del last_finish[user_id]
+
+    def _record_wait(self, priority: Priority, seconds: float) -> None:
+        metrics.observe("scheduler.wait_seconds", seconds, priority=priority.name.lower())
+        metrics.incr("scheduler.dispatched", priority=priority.name.lower())
+        metrics.gauge("scheduler.active", self._active)
+
+    def _report_depth(self, priority: Priority) -> None:
+        metrics.gauge("scheduler.queue_depth", self.queue_depth(priority), priority=priority.name.lower())
+
+
+scheduler = FairScheduler(weights=_parse_weights(SCHEDULER_USER_WEIGHTS))
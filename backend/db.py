@@ -1,7 +1,11 @@
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient, MongoClient, monitoring
 from pymongo.errors import ServerSelectionTimeoutError, ConfigurationError
 from dotenv import load_dotenv
+import asyncio
 import os
+import threading
+import time
+from datetime import datetime
 from pathlib import Path
 
 env_path = Path(__file__).resolve().parent.parent / ".env"
@@ -21,13 +25,96 @@ if DATABASE_NAME:
 print(f"[INFO] MONGO_URI Loaded: {MONGO_URI is not None}")
 print(f"[INFO] DATABASE_NAME Loaded: {DATABASE_NAME}")
 
+# Connection pool and timeouts, shared by the async and the sync client
+MONGO_OPTIONS = {
+    # Connections per server; concurrent requests beyond this wait for a free one
+    "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+    "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+    "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+    # How long a request may wait for a free pooled connection
+    "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000")),
+    "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "15000")),
+    "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "10000")),
+    "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000")),
+    # Retry once on a primary failover or a transient network error
+    "retryWrites": os.getenv("MONGO_RETRY_WRITES", "true").strip().lower() != "false",
+    "retryReads": True,
+    # Wire compression of replies from the server, e.g. "zstd,zlib" with zstd support installed
+    "compressors": os.getenv("MONGO_COMPRESSORS", "zlib"),
+}
+# Seconds between background pings while connected; failed pings are retried sooner
+MONGO_PING_INTERVAL_SECONDS = float(os.getenv("MONGO_PING_INTERVAL_SECONDS", "30"))
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Connection counts of one client's pools, kept up to date from pool events."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {"open": 0, "in_use": 0, "waiting": 0, "checkout_failures": 0, "pool_clears": 0}
+
+    def _add(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self._counts[name] += delta
+
+    def snapshot(self):
+        with self._lock:
+            return {**self._counts, "max_size": MONGO_OPTIONS["maxPoolSize"]}
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._add(pool_clears=1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._add(open=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add(open=-1)
+
+    def connection_check_out_started(self, event):
+        self._add(waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._add(waiting=-1, checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self._add(waiting=-1, in_use=1)
+
+    def connection_checked_in(self, event):
+        self._add(in_use=-1)
+
+
+pool_stats = PoolStats()
+sync_pool_stats = PoolStats()
+
+# Request handlers use the async client (`db`, `users_collection`, `courses_collection`)
+# so a DB round trip never blocks the event loop. Code running in worker threads
+# (module generation, graph checkpoints, CLI scripts) uses `sync_client`/`sync_db`.
 client = None
 db = None
 users_collection = None
 courses_collection = None
+sync_client = None
+sync_db = None
 connection_error = None
 
-__all__ = ['client', 'db', 'users_collection', 'courses_collection', 'connection_error']
+__all__ = [
+    'client', 'db', 'users_collection', 'courses_collection',
+    'sync_client', 'sync_db', 'connection_error',
+    'connect', 'disconnect', 'health', 'on_connect'
+]
 
 if not MONGO_URI:
     print("[ERROR] MONGODB_URI not found in .env file!")
@@ -35,24 +122,19 @@ if not MONGO_URI:
     connection_error = "MONGODB_URI not configured in .env file"
 else:
     try:
-        print(f"[INFO] Attempting to connect to MongoDB...")
         print(f"[INFO] Connection string: {MONGO_URI[:50]}..." if len(MONGO_URI) > 50 else f"[INFO] Connection string: {MONGO_URI}")
-        client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=15000)
-        client.admin.command("ping")
-        print("[SUCCESS] Connected to MongoDB Atlas!")
+        # Neither client touches the network here (not even the SRV lookup): they
+        # connect on first use, and connect() below warms the async one up
+        sync_client = MongoClient(MONGO_URI, connect=False, event_listeners=[sync_pool_stats], **MONGO_OPTIONS)
+        client = AsyncMongoClient(MONGO_URI, event_listeners=[pool_stats], **MONGO_OPTIONS)
         if not DATABASE_NAME:
             DATABASE_NAME = "ai_course_generator"
             print(f"[INFO] Using default database name: {DATABASE_NAME}")
+        sync_db = sync_client[DATABASE_NAME]
         db = client[DATABASE_NAME]
         users_collection = db["users"]
         courses_collection = db["courses"]
-        print(f"[SUCCESS] Using database: {DATABASE_NAME}")
-        print(f"[SUCCESS] Collection 'users' is ready!")
-        print(f"[SUCCESS] Collection 'courses' is ready!")
-    except ServerSelectionTimeoutError as e:
-        connection_error = f"Connection timeout: Could not reach MongoDB server. Check your network connection and IP whitelist in MongoDB Atlas."
-        print(f"[ERROR] {connection_error}")
-        print(f"[ERROR] Full error: {e}")
+        print(f"[INFO] Using database: {DATABASE_NAME} (connecting in the background)")
     except ConfigurationError as e:
         connection_error = f"Invalid MongoDB connection string. Please check your MONGODB_URI format."
         print(f"[ERROR] {connection_error}")
@@ -61,3 +143,88 @@ else:
         connection_error = f"MongoDB connection failed: {str(e)}"
         print(f"[ERROR] {connection_error}")
         print(f"[ERROR] Error type: {type(e).__name__}")
+
+# Result of the last background ping, served by /health without touching the DB
+_status = {"connected": False, "ping_ms": None, "checked_at": None, "error": connection_error}
+_monitor = None
+_on_connect = []
+
+
+def on_connect(callback):
+    """Registers a coroutine function to run each time the connection is (re)established."""
+    _on_connect.append(callback)
+
+
+async def _ping_forever():
+    global connection_error
+    delay = 1.0
+    while True:
+        started = time.perf_counter()
+        try:
+            await client.admin.command("ping")
+        except Exception as e:
+            if isinstance(e, ServerSelectionTimeoutError):
+                error = "Connection timeout: Could not reach MongoDB server. Check your network connection and IP whitelist in MongoDB Atlas."
+            else:
+                error = f"MongoDB connection failed: {str(e)}"
+            if _status["connected"] or _status["error"] != error:
+                print(f"[ERROR] {error}")
+                print(f"[ERROR] Full error: {e}")
+            _status.update(connected=False, ping_ms=None, checked_at=datetime.utcnow(), error=error)
+            connection_error = error
+            # Retry quickly at first, then back off to the regular interval
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MONGO_PING_INTERVAL_SECONDS)
+            continue
+
+        reconnected = not _status["connected"]
+        _status.update(
+            connected=True,
+            ping_ms=round((time.perf_counter() - started) * 1000, 1),
+            checked_at=datetime.utcnow(),
+            error=None,
+        )
+        connection_error = None
+        if reconnected:
+            print("[SUCCESS] Connected to MongoDB Atlas!")
+            for callback in _on_connect:
+                try:
+                    await callback()
+                except Exception as e:
+                    print(f"[ERROR] Post-connect task failed: {e}")
+        delay = 1.0
+        await asyncio.sleep(MONGO_PING_INTERVAL_SECONDS)
+
+
+async def connect():
+    """
+    Starts connecting in the background; called from the app lifespan so that
+    an unreachable server delays readiness, not worker startup.
+    """
+    global _monitor
+    if client is not None and _monitor is None:
+        _monitor = asyncio.create_task(_ping_forever())
+
+
+async def disconnect():
+    global _monitor
+    if _monitor is not None:
+        _monitor.cancel()
+        await asyncio.gather(_monitor, return_exceptions=True)
+        _monitor = None
+    if client is not None:
+        await client.close()
+    if sync_client is not None:
+        sync_client.close()
+
+
+def health():
+    """Readiness as of the last background ping, plus connection pool usage."""
+    return {
+        "ready": _status["connected"],
+        "ping_ms": _status["ping_ms"],
+        "checked_at": _status["checked_at"].isoformat() if _status["checked_at"] else None,
+        "error": _status["error"],
+        "pool": pool_stats.snapshot(),
+        "sync_pool": sync_pool_stats.snapshot(),
+    }
@@ -0,0 +1,72 @@
+"""
+Fires concurrent requests at a running backend to check that DB-bound
+endpoints scale with concurrency instead of queueing behind each other.
+
+Usage: python loadtest_db.py [--url http://localhost:8000] [--path /user/profile]
+                             [--email you@example.com] [--requests 500]
+                             [--concurrency 1 10 50]
+
+Signs a token for --email the same way /auth/signin does, then runs
+--requests requests at each concurrency level and reports throughput and
+latency. With a non-blocking driver throughput grows with concurrency until
+the connection pool (MONGO_MAX_POOL_SIZE) or the server saturates; with
+blocking calls on the event loop it stays flat at about 1 / DB round trip.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from core.security import create_access_token
+
+
+async def run_level(client, path, headers, total, concurrency):
+    latencies, errors = [], 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                response = await client.get(path, headers=headers)
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(
+        f"concurrency {concurrency:>4}: {total / elapsed:8.1f} req/s, "
+        f"p50 {statistics.median(latencies) * 1000:7.1f} ms, p95 {p95 * 1000:7.1f} ms, "
+        f"{errors} errors"
+    )
+
+
+async def main(args):
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': args.email})}"}
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+        # Warm up the connection pools on both sides
+        await run_level(client, args.path, headers, min(args.requests, 20), 1)
+        print()
+        for concurrency in args.concurrency:
+            await run_level(client, args.path, headers, args.requests, concurrency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test a DB-bound endpoint")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/user/profile", help="GET endpoint to hit")
+    parser.add_argument("--email", default="testuser@example.com", help="existing user to sign the token for")
+    parser.add_argument("--requests", type=int, default=500, help="requests per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    asyncio.run(main(parser.parse_args()))
@@ -2,6 +2,7 @@ from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 import traceback
 import logging
 
@@ -16,7 +17,26 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    import db
+    from agent.checkpoint import close_checkpointer, get_checkpointer
+    from core.indexes import ensure_indexes
+    from core.jobs import job_queue
+
+    # Returns at once; the connection is made (and remade) in the background,
+    # and the indexes are ensured each time it comes up. The graph checkpointer
+    # is set up then too, rather than by the first generation.
+    db.on_connect(lambda: ensure_indexes(db.db))
+    db.on_connect(get_checkpointer)
+    await db.connect()
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    await close_checkpointer()
+    await db.disconnect()
+
+app = FastAPI(lifespan=lifespan)
 
 # Global exception handler
 @app.exception_handler(Exception)
@@ -40,14 +60,28 @@ app.include_router(user.router)
 def home():
     return {"msg": "Welcome to AI Course Generator"}
 
+@app.get("/metrics")
+def get_metrics():
+    from core.metrics import metrics
+    return metrics.snapshot()
+
 @app.get("/health")
 def health_check():
-    from db import users_collection, connection_error
-    return {
-        "status": "ok" if users_collection is not None else "error",
-        "database": "connected" if users_collection is not None else "disconnected",
-        "error": connection_error if connection_error else None
-    }
+    """Readiness probe: 503 until the database answers the background ping."""
+    import db
+    database = db.health()
+    return JSONResponse(
+        status_code=200 if database["ready"] else 503,
+        content={
+            "status": "ok" if database["ready"] else "error",
+            "database": "connected" if database["ready"] else "disconnected",
+            "error": database["error"],
+            "ping_ms": database["ping_ms"],
+            "checked_at": database["checked_at"],
+            "pool": database["pool"],
+            "sync_pool": database["sync_pool"],
+        },
+    )
 
 # CORS for Vite dev server and production frontend
 app.add_middleware(
@@ -5,6 +5,7 @@ from pydantic import BaseModel
 from models.user import User, RegisterResponse, Token
 from core.security import get_password_hash, verify_password, create_access_token
 from db import users_collection, connection_error
+import asyncio
 import uuid
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
@@ -14,7 +15,7 @@ class SignInRequest(BaseModel):
     password: str
 
 @router.post("/signup", response_model=RegisterResponse)
-def signup(user: User):
+async def signup(user: User):
     import logging
     import traceback
     logger = logging.getLogger(__name__)
@@ -28,7 +29,7 @@ def signup(user: User):
             )
         
         logger.info(f"Checking for existing user: {user.email}")
-        existing_user = users_collection.find_one({"email": user.email})
+        existing_user = await users_collection.find_one({"email": user.email})
         if existing_user:
             raise HTTPException(status_code=400, detail="User already exists")
 
@@ -36,7 +37,8 @@ def signup(user: User):
         user_id = str(uuid.uuid4())
         
         logger.info("Hashing password...")
-        hashed_password = get_password_hash(user.password)
+        # bcrypt is deliberately slow: keep it off the event loop
+        hashed_password = await asyncio.to_thread(get_password_hash, user.password)
         logger.info("Password hashed successfully")
 
         user_doc = {
@@ -47,7 +49,7 @@ def signup(user: User):
         }
         
         logger.info(f"Inserting user document: {user.email}")
-        result = users_collection.insert_one(user_doc)
+        result = await users_collection.insert_one(user_doc)
         logger.info(f"User inserted with ID: {result.inserted_id}")
 
         return {
@@ -66,7 +68,7 @@ def signup(user: User):
         raise HTTPException(status_code=500, detail=f"Signup failed: {str(e)}")
 
 @router.post("/signin", response_model=Token)
-def signin(request: SignInRequest):
+async def signin(request: SignInRequest):
     if users_collection is None:
         error_detail = connection_error if connection_error else "Database connection not available."
         raise HTTPException(
@@ -74,8 +76,8 @@ def signin(request: SignInRequest):
             detail=f"Database connection failed. {error_detail} Please check your MongoDB configuration in the .env file and ensure your IP is whitelisted in MongoDB Atlas."
         )
     
-    user = users_collection.find_one({"email": request.email})
-    if not user or not verify_password(request.password, user["password"]):
+    user = await users_collection.find_one({"email": request.email})
+    if not user or not await asyncio.to_thread(verify_password, request.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     access_token_expires = timedelta(minutes=30)
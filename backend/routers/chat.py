@@ -1,9 +1,11 @@
 import json
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from agent.llm import LLMClient
 from core.security import get_current_user
+from core.chat_store import append_messages, decode_chat_cursor, message_page, recent_messages
+from core.compression import decompress_module
 from db import courses_collection, db
 from datetime import datetime
 
@@ -12,6 +14,9 @@ chats_collection = db["chats"] if db is not None else None
 router = APIRouter(prefix="/chat", tags=["Chat"])
 llm_client = LLMClient()
 
+# Earlier messages of the conversation given to the LLM with each question
+CHAT_CONTEXT_MESSAGES = 10
+
 CHAT_SYSTEM_PROMPT = """
 You are "Geny", a friendly, professional, and supportive AI learning assistant.
 Your goal is to help users understand the course content and answer their doubts.
@@ -37,24 +42,49 @@ class ChatRequest(BaseModel):
     message: str
     course_id: Optional[str] = None
 
-@router.get("/history/{course_id}")
+@router.get("/{course_id}/messages")
+async def get_chat_messages(
+    course_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_user: str = Depends(get_current_user)
+):
+    """
+    One page of the course conversation, newest message first. Pass the
+    returned `next_cursor` back for the messages before it.
+    """
+    if chats_collection is None:
+        return {"messages": [], "next_cursor": None}
+    try:
+        before = decode_chat_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    messages, next_cursor = await message_page(chats_collection, course_id, current_user, limit, before)
+    return {"messages": messages, "next_cursor": next_cursor}
+
+@router.get("/history/{course_id}", deprecated=True)
 async def get_chat_history(course_id: str, current_user: str = Depends(get_current_user)):
+    """The whole conversation, oldest first; use the paginated /chat/{course_id}/messages instead."""
     if chats_collection is None:
         return []
-    
-    chat_doc = chats_collection.find_one({"course_id": course_id, "user_id": current_user})
-    if not chat_doc:
-        return []
-    
-    # Clean up _id for JSON serialisation if necessary, though list of dicts is fine
-    return chat_doc.get("messages", [])
+
+    messages, before = [], None
+    while True:
+        page, next_cursor = await message_page(chats_collection, course_id, current_user, 200, before)
+        messages.extend(page)
+        if next_cursor is None:
+            break
+        before = decode_chat_cursor(next_cursor)
+    messages.reverse()
+    return messages
 
 @router.post("/ask")
 async def ask_geny(req: ChatRequest, current_user: str = Depends(get_current_user)):
     try:
         course_context = "No specific course context provided."
         if req.course_id:
-            course_doc = courses_collection.find_one({"course_id": req.course_id, "user_id": current_user})
+            course_doc = await courses_collection.find_one({"course_id": req.course_id, "user_id": current_user})
             if course_doc:
                 data = course_doc.get("course_data", {})
                 title = data.get("title", "Untitled")
@@ -69,23 +99,23 @@ async def ask_geny(req: ChatRequest, current_user: str = Depends(get_current_use
                 # (Limited to avoid context window explosion)
                 for t in topics[:3]: 
                     if t in modules:
-                        m = modules[t]
+                        m = decompress_module(modules[t])
                         explanations = m.get("explanations", {})
                         snip = " ".join(list(explanations.values()))[:500]
                         context_parts.append(f"Module '{t}' Summary: {snip}...")
                 
                 course_context = "\n".join(context_parts)
 
-        # 2. Get existing history from DB for LLM context
+        # 2. Get the end of the conversation from DB for LLM context
         existing_history = []
         if chats_collection is not None and req.course_id:
-            chat_doc = chats_collection.find_one({"course_id": req.course_id, "user_id": current_user})
-            if chat_doc:
-                existing_history = chat_doc.get("messages", [])
+            existing_history = await recent_messages(
+                chats_collection, req.course_id, current_user, CHAT_CONTEXT_MESSAGES
+            )
 
         # Prepare chat history for LangChain format
         history_str = ""
-        for msg in existing_history[-10:]: # Last 10 messages for context
+        for msg in existing_history:
             history_str += f"{msg.get('role', 'user').capitalize()}: {msg.get('content', '')}\n"
         
         human_prompt = f"Chat History:\n{history_str}\nUser Question: {req.message}\n\nAnswer as Geny:"
@@ -105,10 +135,8 @@ async def ask_geny(req: ChatRequest, current_user: str = Depends(get_current_use
             new_user_msg = {"role": "user", "content": req.message, "timestamp": datetime.utcnow()}
             new_assistant_msg = {"role": "assistant", "content": response, "timestamp": datetime.utcnow()}
             
-            chats_collection.update_one(
-                {"course_id": req.course_id, "user_id": current_user},
-                {"$push": {"messages": {"$each": [new_user_msg, new_assistant_msg]}}},
-                upsert=True
+            await append_messages(
+                chats_collection, req.course_id, current_user, [new_user_msg, new_assistant_msg]
             )
 
         return {"answer": response}
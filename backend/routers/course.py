@@ -1,287 +1,1144 @@
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Any, AsyncGenerator, List
+from pymongo import ReturnDocument
+from typing import Dict, Any, AsyncGenerator, AsyncIterator, List, Literal, Optional, Set, Tuple
+import asyncio
+import copy
 import json
+import logging
+import os
+from contextlib import asynccontextmanager
 from datetime import datetime
 import uuid
 
-from agent.agent import run_workflow_stream
+from agent.agent import (
+    run_workflow_stream, resume_workflow_stream, get_workflow_state, generate_module_assessment,
+    regenerate_module_content, regenerate_module_parts, summarize_module
+)
+from agent.llm import track_usage
+from agent.profiles import DEFAULT_DEPTH, DEPTH_PROFILES
 from core.security import get_current_user
+from core.cancellation import CancelToken, GenerationCancelled, reset_token, use_token
+from core.deadline import Deadline, deadline_scope
+from core.course_store import (
+    claim_next_topic, complete_claim, release_claim, module_update, module_field_update, module_fields_update,
+    module_revision, module_revision_filter, edit_outline, OutlineConflict, is_path_safe,
+    course_list_pipeline, encode_list_cursor, decode_list_cursor, course_read_pipeline, progress_update
+)
+from core.metrics import metrics
+from core.jobs import job_queue
+from core.prefetch import prefetcher
+from core.prompt_index import prompt_index
+from core.catalog import catalog
+from core.compression import decompress_course, decompress_module
+from core.scheduler import Priority, scheduler
 from db import courses_collection
 
 
 router = APIRouter(prefix="/course", tags=["Course"])
+logger = logging.getLogger(__name__)
+
+# End-to-end time allowed for a new course up to its first module
+GENERATION_DEADLINE_SECONDS = float(os.getenv("GENERATION_DEADLINE_SECONDS", "300"))
+# Time allowed for generating or regenerating one module on request
+MODULE_DEADLINE_SECONDS = float(os.getenv("MODULE_DEADLINE_SECONDS", "180"))
 
 
 class CourseRequest(BaseModel):
     prompt: str
+    # Opt-in: prepare upcoming modules in the background after the first one
+    prefetch: bool = False
+    # Opt-in: generate flashcards and quizzes only when a learner opens them
+    lazy_assessments: bool = False
+    # Content depth profile: quick primer, standard, or deep dive
+    depth: Literal["quick", "standard", "deep"] = DEFAULT_DEPTH
+    # Opt-out: always generate this course's modules afresh instead of reusing shared ones
+    shared_cache: bool = True
+    # Opt-in: reuse the outline of a near-identical earlier prompt, once the client
+    # has shown it to the learner (see GET /course/similar_outline)
+    reuse_outline: bool = False
+
+
+# Per-course generation options, stored on the course and carried in job payloads
+COURSE_OPTIONS = ("prefetch", "lazy_assessments", "depth", "shared_cache")
+
+
+def _course_options(source: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    source = source or {}
+    depth = source.get("depth")
+    return {
+        "prefetch": bool(source.get("prefetch")),
+        "lazy_assessments": bool(source.get("lazy_assessments")),
+        "depth": depth if depth in DEPTH_PROFILES else DEFAULT_DEPTH,
+        # Courses from before the option existed use the cache
+        "shared_cache": source.get("shared_cache") is not False,
+    }
+
+
+async def _save_outline(
+    course_id: str, current_user: str, prompt: str, title: str, topics: List[str], options: Dict[str, Any]
+) -> bool:
+    """
+    Creates the course as soon as the outline exists so that modules can be
+    persisted one by one as they complete. An upsert, so that a resumed
+    generation can make sure the course exists. Returns whether it is stored.
+    """
+    if courses_collection is None:
+        logger.error("Database unavailable, cannot save course")
+        return False
+    try:
+        await courses_collection.update_one(
+            {"course_id": course_id},
+            {"$setOnInsert": {
+                "user_id": current_user,
+                "prompt": prompt,
+                "title": title or "Untitled Course",
+                "course_data": {
+                    "title": title,
+                    "modules": {},
+                    "topics": topics,
+                    "pending_topics": topics[:]
+                },
+                **options,
+                "created_at": datetime.utcnow()
+            }},
+            upsert=True
+        )
+    except Exception as e:
+        logger.error(f"Failed to create course in DB: {e}")
+        return False
+    logger.info(f"Course {course_id} created in DB")
+    return True
+
+
+async def _stored_topics(course_id: str, current_user: str) -> List[str]:
+    """Titles of the modules already stored for a course, without reading their content."""
+    pipeline = course_read_pipeline(course_id, current_user, []) + [{"$project": {"course_data.generated_topics": 1}}]
+    found = await (await courses_collection.aggregate(pipeline)).to_list(1)
+    return found[0]["course_data"]["generated_topics"] if found else []
+
+
+async def _course_event_stream(
+    course_id: str,
+    current_user: str,
+    prompt: str,
+    options: Dict[str, Any],
+    chunks: AsyncIterator[Dict[str, Any]],
+    resumed: Optional[Dict[str, Any]] = None,
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Turns graph node updates into the events sent to the client and
+    persists the course as it is generated. `resumed` is the checkpointed state
+    when continuing an interrupted generation.
+    """
+    course_saved = False
+    validation_processed = resumed is not None
+    try:
+        if resumed is None:
+            # Yield initial status
+            yield {"type": "status", "message": "Validating prompt...", "course_id": course_id}
+        else:
+            yield {"type": "status", "message": "Resuming course generation...", "course_id": course_id}
+            # Replay what the checkpoint already holds so the client can rebuild its view
+            values = resumed["values"]
+            if values.get("topics"):
+                # The worker may have died after the checkpoint but before saving the
+                # outline or the modules: store whatever the course is still missing
+                title = values.get("enhanced_prompt", "")
+                course_saved = await _save_outline(course_id, current_user, prompt, title, values["topics"], options)
+                yield {
+                    "type": "meta",
+                    "data": {
+                        "title": title,
+                        "topics": values["topics"]
+                    }
+                }
+            stored = set(await _stored_topics(course_id, current_user)) if course_saved else set()
+            for topic, content in values.get("generated_modules", {}).items():
+                if course_saved and topic not in stored:
+                    await courses_collection.update_one(
+                        {"course_id": course_id},
+                        module_update(topic, content, pull_pending=True)
+                    )
+                yield {"type": "module", "data": content}
+            if not resumed["next"] and values.get("course"):
+                yield {
+                    "type": "complete",
+                    "data": values["course"],
+                    "course_id": course_id
+                }
+
+        sent_topics = set(resumed["values"].get("generated_modules", {})) if resumed else set()
+
+        async for chunk in chunks:
+            # chunk is like {"node_name": {state_updates}}
+            logger.debug(f"Received chunk: {list(chunk.keys())}")
+            for node_name, updates in chunk.items():
+
+                # Progress written by a node while it runs (e.g. fan-out subtopics)
+                if node_name == "progress":
+                    yield updates
+
+                # Handle validation node
+                elif node_name == "validate_prompt":
+                    validation_processed = True
+                    logger.info(f"Validation node update: {updates}")
+                    is_valid = updates.get("is_valid", True)
+                    if not is_valid:
+                        validation_error = updates.get("validation_error", 
+                            "This prompt is not suitable for course generation. Please provide a topic, subject, or skill that can be taught. Examples: 'Python programming', 'Machine Learning basics', 'Web development'.")
+                        logger.info(f"Sending validation error: {validation_error}")
+                        yield {
+                            "type": "error",
+                            "message": validation_error,
+                            "code": "INVALID_PROMPT"
+                        }
+                        return  # Stop streaming if validation fails
+                    # If valid, continue to next step
+                    logger.info("Validation passed, continuing...")
+                    yield {"type": "status", "message": "Prompt validated. Enhancing prompt..."}
+
+                elif node_name == "enhance_prompt":
+                    title = updates.get("enhanced_prompt", "")
+                    yield {
+                        "type": "status", 
+                        "message": f"Designing curriculum for: {title}"
+                    }
+
+                elif node_name == "generate_topics":
+                    title = updates.get("enhanced_prompt", "")
+                    topics = updates.get("topics", [])
+
+                    course_saved = await _save_outline(course_id, current_user, prompt, title, topics, options)
+
+                    yield {
+                        "type": "meta",
+                        "data": {
+                            "title": title,
+                            "topics": topics
+                        }
+                    }
+
+                elif node_name == "generate_module":
+                    modules = updates.get("generated_modules", {})
+                    for topic, content in modules.items():
+                        if topic not in sent_topics:
+                            # Persist the finished module right away so it survives a disconnect
+                            if course_saved:
+                                try:
+                                    await courses_collection.update_one(
+                                        {"course_id": course_id},
+                                        module_update(topic, content, pull_pending=True)
+                                    )
+                                except Exception as e:
+                                    logger.error(f"Failed to save module '{topic}' to DB: {e}")
+                            event = {
+                                "type": "module",
+                                "data": content
+                            }
+                            if content.get("degraded"):
+                                # Tell the client which parts were cut down to meet the deadline
+                                event["degraded"] = content["degraded"]
+                            yield event
+                            sent_topics.add(topic)
+
+                elif node_name == "finalize_course":
+                    full_course = updates.get("course", {})
+
+                    logger.debug(
+                        f"Reached finalize_course for {course_id} (user={current_user}, "
+                        f"collection={'available' if courses_collection is not None else 'none'})"
+                    )
+
+                    # Modules were already saved as they completed
+                    if course_saved:
+                        logger.info(f"Course {course_id} saved to DB")
+                        if options.get("prefetch"):
+                            prefetcher.schedule(course_id, current_user)
+
+                    yield {
+                        "type": "complete",
+                        "data": full_course,
+                        "course_id": course_id # Send ID back so frontend can request next modules
+                    }
+
+    except (GenerationCancelled, asyncio.CancelledError):
+        # Not an error: the job runner reports the cancellation itself
+        validation_processed = True
+        raise
+    except Exception as exc:
+        logger.error(f"Stream error: {str(exc)}")
+        import traceback
+        logger.error(traceback.format_exc())
+
+        yield {"type": "error", "message": str(exc)}
+    finally:
+        logger.debug(f"Stream finished/closed for {course_id}")
+
+        # Ensure we always send something if validation wasn't processed
+        if not validation_processed:
+            logger.warning("Validation node was not processed, sending timeout error")
+            yield {
+                "type": "error",
+                "message": "Validation timed out. Please try again with a valid course topic.",
+                "code": "VALIDATION_TIMEOUT"
+            }
+
+
+def _ndjson(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    async def lines():
+        async for event in events:
+            yield json.dumps(event) + "\n"
+    return lines()
+
+
+def _sse(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    async def frames():
+        async for event in events:
+            yield f"id: {event['seq']}\ndata: {json.dumps(event)}\n\n"
+    return frames()
+
+
+# Fire-and-forget tasks, referenced until they finish
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _spawn(coro) -> None:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _job_events(job_id: str, after: int = 0, request: Optional[Request] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Client-facing events of a job; `seq` lets the client reattach where it left
+    off. Given the `request` following an attached job, the job is cancelled as
+    soon as that client disconnects (JOB_ABANDON_SECONDS remains the fallback
+    for an API worker that dies with its clients).
+    """
+    watcher = None
+    if request is not None:
+        async def watch():
+            while not await request.is_disconnected():
+                await asyncio.sleep(1)
+            await job_queue.cancel(job_id, "client disconnected")
+        watcher = asyncio.create_task(watch())
+
+    finished = False
+    try:
+        async for record in job_queue.follow(job_id, after):
+            yield {**record["event"], "seq": record["seq"]}
+        finished = True
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+            if not finished:
+                # The stream was torn down mid-job: not awaited, this request is going away
+                _spawn(job_queue.cancel(job_id, "client disconnected"))
+
+
+async def _run_generation_job(job: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """Job handler executing the course graph on a worker."""
+    payload = job["payload"]
+    course_id = payload["course_id"]
+    user_id = job["user_id"]
+    options = _course_options(payload)
+    yield {"type": "job", "job_id": job["job_id"], "course_id": course_id}
+
+    # A job picked up again after its worker died continues from the checkpoint
+    state = await get_workflow_state(course_id)
+    if state is not None and state["values"].get("user_id") == user_id:
+        chunks = resume_workflow_stream(course_id)
+    else:
+        state = None
+        outline = None
+        if payload.get("reuse_outline"):
+            outline = await asyncio.to_thread(prompt_index.lookup, payload["prompt"])
+        if outline is not None:
+            # Tell the client which earlier prompt the outline comes from
+            yield {
+                "type": "status",
+                "message": f"Reusing the outline of a similar course: {outline['title']}",
+                "reused_outline": {"prompt": outline["prompt"], "similarity": outline["similarity"]},
+            }
+        # Use single_step=True to generate only the first module initially.
+        # The course_id doubles as the checkpoint thread so the run can be resumed.
+        chunks = run_workflow_stream(
+            payload["prompt"], single_step=True, thread_id=course_id, user_id=user_id,
+            lazy_assessments=options["lazy_assessments"],
+            depth=options["depth"],
+            shared_cache=options["shared_cache"],
+            outline=outline
+        )
+
+    # The first module is what a waiting user stares at: highest scheduling priority
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    first_module_seen = False
+    with deadline_scope(Deadline(GENERATION_DEADLINE_SECONDS)):
+        async with scheduler.slot(user_id, Priority.FIRST_MODULE):
+            async for event in _course_event_stream(
+                course_id, user_id, payload["prompt"], options, chunks, resumed=state
+            ):
+                if event.get("type") == "module" and not first_module_seen and state is None:
+                    first_module_seen = True
+                    metrics.observe(
+                        "course.first_module_seconds", loop.time() - started, depth=options["depth"]
+                    )
+                yield event
+
+
+job_queue.register("generate_course", _run_generation_job)
+
+
+def _job_response(job: Dict[str, Any], course_id: str, detach: bool, request: Request):
+    if detach:
+        return JSONResponse(status_code=202, content={
+            "job_id": job["job_id"],
+            "course_id": course_id,
+            "status": job["status"]
+        })
+    events = _job_events(job["job_id"], request=request if job.get("attached") else None)
+    return StreamingResponse(_ndjson(events), media_type="application/x-ndjson")
+
+
+async def _catalog_events(course_id: str, course_data: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """The events of a generation, replayed for a course copied from the catalog."""
+    yield {"type": "status", "message": "Found a ready-made course", "course_id": course_id, "catalog": True}
+    yield {"type": "meta", "data": {"title": course_data["title"], "topics": course_data["topics"]}}
+    for topic in course_data["topics"]:
+        if topic in course_data["modules"]:
+            yield {"type": "module", "data": course_data["modules"][topic]}
+    yield {"type": "complete", "data": course_data, "course_id": course_id}
 
 
 @router.post("/generate")
 async def generate_course(
     req: CourseRequest,
+    request: Request,
+    detach: bool = False,
     current_user: str = Depends(get_current_user)
 ):
-    import logging
-    logger = logging.getLogger(__name__)
+    """
+    Enqueues a course generation job. By default the response streams the job's
+    events; with `detach=true` it returns the job id right away and the client
+    attaches through /course/jobs/{job_id}/events. Prompts found in the course
+    catalog are copied into the user's account at once, without a job.
+    """
     course_id = str(uuid.uuid4())
     logger.info(f"Generating course stream for user: {current_user}, prompt: {req.prompt[:50]}...")
+
+    # Popular subjects are pre-generated by build_catalog.py: copy instead of generating
+    options = _course_options(req.model_dump())
+    if options["shared_cache"] and courses_collection is not None:
+        entry = await asyncio.to_thread(catalog.find, req.prompt, options["depth"])
+        if entry is not None:
+            course_doc = catalog.course_doc(entry, course_id, current_user, req.prompt, options)
+            await courses_collection.insert_one(course_doc)
+            # Stored compressed as copied; the client gets plain text
+            course_data = decompress_course(copy.deepcopy(course_doc))["course_data"]
+            logger.info(f"Course {course_id} copied from catalog entry '{entry['key']}'")
+            if detach:
+                return JSONResponse(content={
+                    "job_id": None,
+                    "course_id": course_id,
+                    "status": "done",
+                    "catalog": True
+                })
+            return StreamingResponse(
+                _ndjson(_catalog_events(course_id, course_data)), media_type="application/x-ndjson"
+            )
+
+    job = await job_queue.submit(
+        "generate_course",
+        {"course_id": course_id, "prompt": req.prompt, "reuse_outline": req.reuse_outline, **options},
+        current_user,
+        key=course_id,
+        attached=not detach
+    )
+    return _job_response(job, course_id, detach, request)
+
+
+@router.get("/similar_outline")
+async def get_similar_outline(
+    prompt: str,
+    current_user: str = Depends(get_current_user)
+):
+    """
+    The title and outline already built for a near-identical prompt, if any.
+    The client can offer it to the learner and, if accepted, generate with
+    `reuse_outline=true` instead of waiting for a new outline.
+    """
+    outline = await asyncio.to_thread(prompt_index.lookup, prompt)
+    return {"outline": outline}
+
+
+@router.post("/{course_id}/resume")
+async def resume_course_generation(
+    course_id: str,
+    request: Request,
+    detach: bool = False,
+    current_user: str = Depends(get_current_user)
+):
+    """Continues an interrupted generation from its last checkpointed node."""
+    active = await job_queue.broker.find_active(course_id)
+    if active is not None and active["user_id"] == current_user:
+        # Still running somewhere: attach to it instead of running it twice
+        return _job_response(active, course_id, detach, request)
+
+    state = await get_workflow_state(course_id)
+    if state is None or state["values"].get("user_id") != current_user:
+        raise HTTPException(status_code=404, detail="No resumable generation found for this course")
+
+    values = state["values"]
+    if not values.get("is_valid", True):
+        raise HTTPException(status_code=400, detail=values.get("validation_error") or "Invalid prompt")
+
+    course_doc = None
+    if courses_collection is not None:
+        course_doc = await courses_collection.find_one({"course_id": course_id}, {name: 1 for name in COURSE_OPTIONS})
+    if course_doc is None:
+        # The outline was never saved: fall back to what the checkpoint knows
+        course_doc = {name: values.get(name) for name in ("lazy_assessments", "depth", "shared_cache")}
+
+    logger.info(f"Resuming course {course_id} for {current_user} at {state['next']}")
+    job = await job_queue.submit(
+        "generate_course",
+        {"course_id": course_id, "prompt": values.get("prompt", ""), **_course_options(course_doc)},
+        current_user,
+        key=course_id,
+        attached=not detach
+    )
+    return _job_response(job, course_id, detach, request)
+
+
+async def _get_own_job(job_id: str, current_user: str) -> Dict[str, Any]:
+    job = await job_queue.broker.get(job_id)
+    if not job or job["user_id"] != current_user:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, current_user: str = Depends(get_current_user)):
+    job = await _get_own_job(job_id, current_user)
+    return {
+        "job_id": job["job_id"],
+        "kind": job["kind"],
+        "course_id": job["payload"].get("course_id"),
+        "status": job["status"],
+        "error": job.get("error"),
+        "created_at": job.get("created_at"),
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at")
+    }
+
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str, current_user: str = Depends(get_current_user)):
+    """Stops a generation job; in-flight LLM and YouTube calls are abandoned."""
+    job = await _get_own_job(job_id, current_user)
+    if job["status"] not in ("done", "failed", "cancelled"):
+        await job_queue.cancel(job_id)
+    return {"job_id": job_id, "status": (await job_queue.broker.get(job_id))["status"]}
+
+
+@router.get("/jobs/{job_id}/events")
+async def attach_job_events(
+    job_id: str,
+    request: Request,
+    after: int = 0,
+    format: str = "ndjson",
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Streams a job's events from any worker, as NDJSON (default) or SSE. Pass
+    the last seen `seq` as `after` (or Last-Event-ID for SSE) to reattach.
+    """
+    job = await _get_own_job(job_id, current_user)
+
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        after = max(after, int(last_event_id))
+
+    events = _job_events(job_id, after, request=request if job.get("attached") else None)
+    if format == "sse" or "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(_sse(events), media_type="text/event-stream")
+    return StreamingResponse(_ndjson(events), media_type="application/x-ndjson")
+
+
+# A claim older than this is assumed to belong to a crashed worker and is taken over
+NEXT_MODULE_CLAIM_TTL = int(os.getenv("NEXT_MODULE_CLAIM_TTL", "600"))
+
+
+@asynccontextmanager
+async def _cancel_on_disconnect(request: Request):
+    """Cancels the generation work of this request once its client goes away."""
+    token = CancelToken()
+    previous = use_token(token)
+
+    async def watch():
+        while not await request.is_disconnected():
+            await asyncio.sleep(1)
+        token.cancel("client disconnected")
+
+    watcher = asyncio.create_task(watch())
     try:
-        with open("db_debug.log", "a") as f:
-            f.write(f"[{datetime.utcnow()}] START request for {course_id} user={current_user} prompt={req.prompt[:50]}\n")
-    except:
-        pass
+        yield token
+    finally:
+        watcher.cancel()
+        reset_token(previous)
 
-    async def event_generator() -> AsyncGenerator[str, None]:
-        try:
-            # Yield initial status
-            yield json.dumps({"type": "status", "message": "Validating prompt..."}) + "\n"
-            
-            sent_topics = set()
-            validation_processed = False
-            
-            # Use single_step=True to generate only the first module initially
-            async for chunk in run_workflow_stream(req.prompt, single_step=True):
-                # chunk is like {"node_name": {state_updates}}
-                logger.debug(f"Received chunk: {list(chunk.keys())}")
-                for node_name, updates in chunk.items():
-                    
-                    # Handle validation node
-                    if node_name == "validate_prompt":
-                        validation_processed = True
-                        logger.info(f"Validation node update: {updates}")
-                        is_valid = updates.get("is_valid", True)
-                        if not is_valid:
-                            validation_error = updates.get("validation_error", 
-                                "This prompt is not suitable for course generation. Please provide a topic, subject, or skill that can be taught. Examples: 'Python programming', 'Machine Learning basics', 'Web development'.")
-                            logger.info(f"Sending validation error: {validation_error}")
-                            yield json.dumps({
-                                "type": "error",
-                                "message": validation_error,
-                                "code": "INVALID_PROMPT"
-                            }) + "\n"
-                            return  # Stop streaming if validation fails
-                        # If valid, continue to next step
-                        logger.info("Validation passed, continuing...")
-                        yield json.dumps({"type": "status", "message": "Prompt validated. Enhancing prompt..."}) + "\n"
-                    
-                    elif node_name == "enhance_prompt":
-                        title = updates.get("enhanced_prompt", "")
-                        yield json.dumps({
-                            "type": "status", 
-                            "message": f"Designing curriculum for: {title}"
-                        }) + "\n"
-                        
-                    elif node_name == "generate_topics":
-                        yield json.dumps({
-                            "type": "meta",
-                            "data": {
-                                "title": updates.get("enhanced_prompt", ""),
-                                "topics": updates.get("topics", [])
-                            }
-                        }) + "\n"
-                        
-                    elif node_name == "generate_module":
-                        modules = updates.get("generated_modules", {})
-                        for topic, content in modules.items():
-                            if topic not in sent_topics:
-                                yield json.dumps({
-                                    "type": "module",
-                                    "data": content
-                                }) + "\n"
-                                sent_topics.add(topic)
-                                
-                    elif node_name == "finalize_course":
-                        full_course = updates.get("course", {})
-                        
-                        # DEBUG LOGGING to file
-                        try:
-                            with open("db_debug.log", "a") as f:
-                                f.write(f"[{datetime.utcnow()}] Reached finalize_course for {course_id}\n")
-                                f.write(f"Collection status: {'Available' if courses_collection is not None else 'None'}\n")
-                                f.write(f"User: {current_user}\n")
-                        except Exception as e:
-                            logger.error(f"Failed to write debug log: {e}")
-
-                        # Save to DB - Include pending_topics from state (updates["course"] should have it now)
-                        if courses_collection is not None:
-                            try:
-                                courses_collection.insert_one({
-                                    "course_id": course_id,
-                                    "user_id": current_user,
-                                    "prompt": req.prompt,
-                                    "title": full_course.get("title", "Untitled Course"),
-                                    "course_data": full_course, # This now includes 'pending_topics'
-                                    "created_at": datetime.utcnow()
-                                })
-                                logger.info(f"Course {course_id} saved to DB")
-                                with open("db_debug.log", "a") as f:
-                                    f.write(f"[{datetime.utcnow()}] Successfully saved course {course_id}\n")
-                            except Exception as e:
-                                logger.error(f"Failed to save course to DB: {e}")
-                                with open("db_debug.log", "a") as f:
-                                    f.write(f"[{datetime.utcnow()}] ERROR saving to DB: {e}\n")
-                        else:
-                            logger.error("Database unavailable, cannot save course")
-                            with open("db_debug.log", "a") as f:
-                                f.write(f"[{datetime.utcnow()}] SKIP saving: collection is None\n")
-
-                        yield json.dumps({
-                            "type": "complete",
-                            "data": full_course,
-                            "course_id": course_id # Send ID back so frontend can request next modules
-                        }) + "\n"
-                        
-        except Exception as exc:
-            logger.error(f"Stream error: {str(exc)}")
-            import traceback
-            logger.error(traceback.format_exc())
-            # LOG ERROR to file
-            try:
-                with open("db_debug.log", "a") as f:
-                    f.write(f"[{datetime.utcnow()}] ERROR in stream for {course_id}: {str(exc)}\n")
-                    f.write(traceback.format_exc() + "\n")
-            except:
-                pass
-
-            yield json.dumps({"type": "error", "message": str(exc)}) + "\n"
-        finally:
-            try:
-                with open("db_debug.log", "a") as f:
-                    f.write(f"[{datetime.utcnow()}] Stream finished/closed for {course_id}\n")
-            except:
-                pass
-
-            # Ensure we always send something if validation wasn't processed
-            if not validation_processed:
-                logger.warning("Validation node was not processed, sending timeout error")
-                yield json.dumps({
-                    "type": "error",
-                    "message": "Validation timed out. Please try again with a valid course topic.",
-                    "code": "VALIDATION_TIMEOUT"
-                }) + "\n"
-
-    return StreamingResponse(event_generator(), media_type="application/x-ndjson")
+
+async def _wait_for_claim(course_id: str, current_user: str, topic: str) -> None:
+    """Polls until no caller holds the generation claim for `topic` anymore."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + NEXT_MODULE_CLAIM_TTL
+    while loop.time() < deadline:
+        doc = await courses_collection.find_one(
+            {"course_id": course_id, "user_id": current_user},
+            {"generation_claim": 1},
+        )
+        if not doc or (doc.get("generation_claim") or {}).get("topic") != topic:
+            return
+        await asyncio.sleep(1)
 
 
 @router.post("/{course_id}/generate_next_module")
-async def generate_next_module(course_id: str, current_user: str = Depends(get_current_user)):
-    """Generates the next available module for a given course."""
+async def generate_next_module(
+    course_id: str,
+    request: Request,
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Generates the next available module for a given course.
+
+    The next topic is claimed atomically in the DB, so concurrent calls (double
+    clicks, several tabs) never generate the same topic twice: a caller that
+    finds the topic already claimed waits for it and returns the same module.
+    """
     if courses_collection is None:
         raise HTTPException(status_code=503, detail="Database not available")
-    
-    course_doc = courses_collection.find_one({"course_id": course_id, "user_id": current_user})
-    if not course_doc:
-        raise HTTPException(status_code=404, detail="Course not found")
-        
-    course_data = course_doc.get("course_data", {})
-    pending_topics = course_data.get("pending_topics", [])
-    
-    if not pending_topics:
-        return {"message": "All modules have already been generated.", "completed": True}
-        
-    # Get next topic
-    next_topic = pending_topics.pop(0)
-    
+
+    # The generation job is still writing the first module, which is in pending_topics
+    # until it is saved: claiming now would generate that module a second time
+    if await job_queue.broker.find_active(course_id) is not None:
+        raise HTTPException(status_code=409, detail="Course is still being generated, please retry")
+
+    for _ in range(3):
+        state, next_topic = await claim_next_topic(
+            courses_collection, course_id, current_user, NEXT_MODULE_CLAIM_TTL
+        )
+        if state == "missing":
+            raise HTTPException(status_code=404, detail="Course not found")
+        if state == "empty":
+            return {"message": "All modules have already been generated.", "completed": True}
+        if state == "claimed":
+            break
+
+        # Someone else is generating this topic: wait and hand out their result
+        await _wait_for_claim(course_id, current_user, next_topic)
+        course_doc = await courses_collection.find_one(
+            {"course_id": course_id, "user_id": current_user},
+            {"course_data.modules": 1, "course_data.pending_topics": 1},
+        )
+        course_data = (course_doc or {}).get("course_data", {})
+        if next_topic in course_data.get("modules", {}):
+            return {
+                "module": decompress_module(course_data["modules"][next_topic]),
+                "remaining_topics": len(course_data.get("pending_topics", [])),
+                "completed": False
+            }
+        # The other caller failed and gave the topic back: try to claim it ourselves
+    else:
+        raise HTTPException(status_code=409, detail="Module generation is busy, please retry")
+
     try:
         from agent.agent import generate_module_content
-        # Generate content using the extracted logic
-        module_content = generate_module_content(next_topic)
-        
-        # Update course data
-        if "modules" not in course_data:
-            course_data["modules"] = {}
-            
-        course_data["modules"][next_topic] = module_content
-        course_data["pending_topics"] = pending_topics
-        
-        # Save back to DB
-        courses_collection.update_one(
+        course_doc = await courses_collection.find_one(
             {"course_id": course_id},
-            {"$set": {"course_data": course_data}}
+            {**{name: 1 for name in COURSE_OPTIONS}, "course_data.title": 1, "course_data.pending_topics": 1},
         )
+        course_data = course_doc.get("course_data", {})
+
+        # Use the background-prepared module if there is one, otherwise generate it now
+        module_content = await prefetcher.take(course_id, next_topic)
+        if module_content is None:
+            with deadline_scope(Deadline(MODULE_DEADLINE_SECONDS)):
+                async with _cancel_on_disconnect(request):
+                    module_content = await scheduler.run(
+                        current_user, Priority.NEXT_MODULE,
+                        generate_module_content, next_topic, course_title=course_data.get("title", ""),
+                        include_assessments=not course_doc.get("lazy_assessments", False),
+                        depth=_course_options(course_doc)["depth"],
+                        use_cache=_course_options(course_doc)["shared_cache"]
+                    )
+
+        # Store just this module and release the claim
+        await complete_claim(courses_collection, course_id, next_topic, module_content)
+
+        if course_doc.get("prefetch"):
+            prefetcher.schedule(course_id, current_user)
         
         return {
             "module": module_content,
-            "remaining_topics": len(pending_topics),
+            "remaining_topics": len(course_data.get("pending_topics", [])),
             "completed": False
         }
         
     except Exception as e:
-        print(f"Error generating next module: {e}")
+        logger.error(f"Error generating next module: {e}")
+        await release_claim(courses_collection, course_id, next_topic)
         raise HTTPException(status_code=500, detail=f"Failed to generate module: {str(e)}")
 
 
 class RegenerateRequest(BaseModel):
     module_title: str
-    original_data: Dict[str, Any]
+    # Optional precondition: the module revision the client last saw (or send If-Match)
+    revision: Optional[int] = None
+
+
+async def _load_module(course_id: str, current_user: str, module_title: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Loads one stored module (and the course options) without fetching the rest of the course."""
+    if courses_collection is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+
+    projection = {name: 1 for name in COURSE_OPTIONS}
+    projection["course_data.title"] = 1
+    if is_path_safe(module_title):
+        projection[f"course_data.modules.{module_title}"] = 1
+        course_doc = await courses_collection.find_one({"course_id": course_id, "user_id": current_user}, projection)
+    else:
+        # Titles like "Node.js Basics" can't be projected by path: filter server-side
+        projection["course_data.modules"] = 1
+        pipeline = course_read_pipeline(course_id, current_user, [module_title]) + [{"$project": projection}]
+        found = await (await courses_collection.aggregate(pipeline)).to_list(1)
+        course_doc = found[0] if found else None
+    if not course_doc:
+        raise HTTPException(status_code=404, detail="Course not found")
+    module = decompress_module(course_doc.get("course_data", {}).get("modules", {}).get(module_title))
+    if not module:
+        raise HTTPException(status_code=404, detail="Module not found")
+    return module, course_doc
+
+
+def _module_etag(module: Dict[str, Any]) -> str:
+    return f'"{module_revision(module)}"'
+
+
+def _check_revision(module: Dict[str, Any], revision: Optional[int], if_match: Optional[str]) -> int:
+    """
+    Returns the stored revision of `module`, or 412s if the client asked to
+    regenerate a revision other than the stored one.
+    """
+    current = module_revision(module)
+    expected = revision
+    if expected is None and if_match and if_match.strip() != "*":
+        try:
+            expected = int(if_match.strip().removeprefix("W/").strip('"'))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid If-Match header")
+    if expected is not None and expected != current:
+        raise HTTPException(
+            status_code=412,
+            detail="Module has changed since it was loaded",
+            headers={"ETag": _module_etag(module)}
+        )
+    return current
+
+
+async def _write_revision(course_id: str, current_user: str, module_title: str, revision: int, update) -> None:
+    """Applies `update` only if the module is still at `revision`, 409ing otherwise."""
+    result = await courses_collection.update_one(
+        {"course_id": course_id, "user_id": current_user, **module_revision_filter(module_title, revision)},
+        update
+    )
+    if not result.matched_count:
+        raise HTTPException(status_code=409, detail="Module was changed while it was being regenerated")
 
 
 @router.post("/{course_id}/regenerate_module")
 async def regenerate_module(
     course_id: str,
     req: RegenerateRequest,
+    request: Request,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Regenerates a specific module with more details, starting from the stored
+    copy and its precomputed summary rather than anything sent by the client.
+    """
+    module, course_doc = await _load_module(course_id, current_user, req.module_title)
+    revision = _check_revision(module, req.revision, if_match)
+    course_title = course_doc.get("course_data", {}).get("title", "")
+
+    try:
+        # Generate enhanced content
+        with track_usage() as usage, deadline_scope(Deadline(MODULE_DEADLINE_SECONDS)):
+            async with _cancel_on_disconnect(request):
+                new_content = await scheduler.run(
+                    current_user, Priority.REGENERATE,
+                    regenerate_module_content,
+                    req.module_title, 
+                    module, 
+                    course_title=course_title
+                )
+        metrics.observe("regenerate.output_tokens", usage["output_tokens"], scope="full")
+    except Exception as e:
+        import traceback
+        logger.error(f"Error regenerating module: {e}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Failed to regenerate module: {str(e)}")
+
+    # Update only this module so concurrent next-module claims are not overwritten
+    new_content = {**new_content, "revision": revision + 1}
+    await _write_revision(course_id, current_user, req.module_title, revision, module_update(req.module_title, new_content))
+
+    response.headers["ETag"] = _module_etag(new_content)
+    return {"module": new_content}
+
+
+# (course_id, module_title, kind) -> generation in progress, shared by concurrent callers
+_assessment_tasks: Dict[Tuple[str, str, str], asyncio.Task] = {}
+
+
+async def _generate_assessment(
+    course_id: str, current_user: str, module_title: str, module: Dict[str, Any], kind: str, depth: str
+) -> Tuple[List[Dict[str, Any]], bool]:
+    items, degraded = await scheduler.run(
+        current_user, Priority.NEXT_MODULE,
+        generate_module_assessment, module_title, module, kind, depth
+    )
+    if degraded:
+        # Fallback output is served once but not stored, so the next request tries again
+        metrics.incr("assessments.degraded", kind=kind)
+        return items, True
+    metrics.incr("assessments.generated", kind=kind)
+    await courses_collection.update_one(
+        {"course_id": course_id, "user_id": current_user},
+        module_field_update(module_title, kind, items)
+    )
+    return items, False
+
+
+async def _module_assessment(course_id: str, current_user: str, module_title: str, kind: str) -> Dict[str, Any]:
+    """
+    Returns a module's flashcards or quiz, generating and persisting them on
+    first access (courses created with `lazy_assessments`). Fallback output is
+    returned with `degraded: true` and not persisted.
+    """
+    module, course_doc = await _load_module(course_id, current_user, module_title)
+
+    if module.get(kind):
+        metrics.incr("assessments.served", kind=kind, source="stored")
+        return {kind: module[kind]}
+
+    key = (course_id, module_title, kind)
+    task = _assessment_tasks.get(key)
+    if task is None:
+        task = asyncio.create_task(_generate_assessment(
+            course_id, current_user, module_title, module, kind, _course_options(course_doc)["depth"]
+        ))
+        _assessment_tasks[key] = task
+        task.add_done_callback(lambda t: _assessment_tasks.pop(key, None))
+    try:
+        # Shielded so one caller going away does not cancel it for the others
+        items, degraded = await asyncio.shield(task)
+    except Exception as e:
+        logger.error(f"Failed to generate {kind} for '{module_title}': {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to generate {kind}: {str(e)}")
+    if degraded:
+        metrics.incr("assessments.served", kind=kind, source="fallback")
+        return {kind: items, "degraded": True}
+    metrics.incr("assessments.served", kind=kind, source="generated")
+    return {kind: items}
+
+
+@router.get("/{course_id}/flashcards")
+async def get_module_flashcards(
+    course_id: str,
+    title: str,
+    current_user: str = Depends(get_current_user)
+):
+    """Flashcards of a module, generated on first request if the course is lazy."""
+    return await _module_assessment(course_id, current_user, title, "flashcards")
+
+
+@router.get("/{course_id}/quiz")
+async def get_module_quiz(
+    course_id: str,
+    title: str,
+    current_user: str = Depends(get_current_user)
+):
+    """Quiz of a module, generated on first request if the course is lazy."""
+    return await _module_assessment(course_id, current_user, title, "quiz")
+
+
+class PartialRegenerateRequest(BaseModel):
+    module_title: str
+    # Subtopics whose explanations are regenerated; the others are kept as they are
+    subtopics: List[str] = []
+    quiz: bool = False
+    flashcards: bool = False
+    diagram: bool = False
+    revision: Optional[int] = None
+
+
+@router.post("/{course_id}/regenerate_parts")
+async def regenerate_parts(
+    course_id: str,
+    req: PartialRegenerateRequest,
+    request: Request,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Regenerates only the selected subtopics, quiz, flashcards and/or diagram of
+    a stored module and merges them into it, so cost follows what was asked for.
+    """
+    module, course_doc = await _load_module(course_id, current_user, req.module_title)
+    revision = _check_revision(module, req.revision, if_match)
+    if not (req.subtopics or req.quiz or req.flashcards or req.diagram):
+        raise HTTPException(status_code=400, detail="Nothing selected to regenerate")
+    unknown = [st for st in req.subtopics if st not in module.get("explanations", {})]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown subtopics: {', '.join(unknown)}")
+
+    try:
+        with track_usage() as usage, deadline_scope(Deadline(MODULE_DEADLINE_SECONDS)):
+            async with _cancel_on_disconnect(request):
+                parts = await scheduler.run(
+                    current_user, Priority.REGENERATE,
+                    regenerate_module_parts,
+                    req.module_title, module, list(dict.fromkeys(req.subtopics)),
+                    req.quiz, req.flashcards, req.diagram, _course_options(course_doc)["depth"]
+                )
+    except Exception as e:
+        logger.error(f"Error regenerating parts of '{req.module_title}': {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to regenerate module: {str(e)}")
+    metrics.observe("regenerate.output_tokens", usage["output_tokens"], scope="partial")
+
+    if not parts:
+        raise HTTPException(status_code=500, detail="Failed to regenerate module: no content was produced")
+
+    fields = dict(parts)
+    if "explanations" in parts:
+        fields["explanations"] = {**module["explanations"], **parts["explanations"]}
+        fields["summary"] = summarize_module(fields["explanations"])
+    fields["is_regenerated"] = True
+    fields["revision"] = revision + 1
+    await _write_revision(course_id, current_user, req.module_title, revision, module_fields_update(req.module_title, fields))
+
+    response.headers["ETag"] = _module_etag(fields)
+    return {
+        "module": {**module, **fields},
+        "regenerated": {
+            "subtopics": list(parts.get("explanations", {})),
+            "quiz": "quiz" in parts,
+            "flashcards": "flashcards" in parts,
+            "diagram": "mermaid" in parts,
+        }
+    }
+
+
+class OutlineRequest(BaseModel):
+    # The full new module list, in order
+    topics: List[str]
+
+
+@router.put("/{course_id}/outline")
+async def update_outline(
+    course_id: str,
+    req: OutlineRequest,
     current_user: str = Depends(get_current_user)
 ):
-    """Regenerates a specific module with more details."""
+    """
+    Edits a course's module list (rename, insert, remove, reorder). Modules that
+    stay keep their content; new or renamed ones are queued for generation, so
+    an edit only costs generation for what changed.
+    """
     if courses_collection is None:
         raise HTTPException(status_code=503, detail="Database not available")
 
-    course_doc = courses_collection.find_one({"course_id": course_id, "user_id": current_user})
-    if not course_doc:
+    topics = [topic.strip() for topic in req.topics]
+    if not topics or not all(topics):
+        raise HTTPException(status_code=400, detail="The outline needs at least one non-empty topic")
+    if len(set(topics)) != len(topics):
+        raise HTTPException(status_code=400, detail="Topics must be unique")
+
+    # The outline is still being written by the generation job
+    if await job_queue.broker.find_active(course_id) is not None:
+        raise HTTPException(status_code=409, detail="Course is still being generated, please retry")
+
+    try:
+        changes = await edit_outline(courses_collection, course_id, current_user, topics)
+    except OutlineConflict:
+        raise HTTPException(status_code=409, detail="Course changed during the edit, please retry")
+    if changes is None:
         raise HTTPException(status_code=404, detail="Course not found")
 
-    course_data = course_doc.get("course_data", {})
-    course_title = course_data.get("title", "")
+    metrics.incr("outline.edits")
+    metrics.incr("outline.topics_added", len(changes["added"]))
+    metrics.incr("outline.topics_removed", len(changes["removed"]))
+
+    await prefetcher.discard(course_id, changes["removed"])
+    course_doc = await courses_collection.find_one(
+        {"course_id": course_id}, {"prefetch": 1, "course_data.pending_topics": 1}
+    ) or {}
+    pending = course_doc.get("course_data", {}).get("pending_topics", [])
+    if course_doc.get("prefetch") and pending:
+        prefetcher.schedule(course_id, current_user)
+
+    return {
+        "topics": topics,
+        **changes,
+        "pending_topics": pending,
+    }
+
 
+def _course_summary(doc: Dict[str, Any]) -> Dict[str, Any]:
+    progress = doc.get("course_progress") or {}
+    created_at = doc.get("created_at")
+    return {
+        "course_id": doc.get("course_id"),
+        "title": doc.get("title"),
+        "prompt": doc.get("prompt"),
+        "depth": doc.get("depth") or DEFAULT_DEPTH,
+        "created_at": created_at.isoformat() if created_at else None,
+        "topic_count": doc.get("topic_count", 0),
+        "module_count": doc.get("module_count", 0),
+        "pending_count": doc.get("pending_count", 0),
+        "course_progress": {
+            "completed_modules": progress.get("completed_modules", []),
+            "quiz_scores": progress.get("quiz_scores", {}),
+        },
+    }
+
+
+async def _course_list_page(user_id: str, after, limit: int) -> AsyncIterator[Dict[str, Any]]:
+    """
+    A "course" event per course on the page, then a "page" event with the
+    cursor of the next page (None after the last one).
+    """
+    # One course more than the page holds tells whether another page follows
+    cursor = await courses_collection.aggregate(course_list_pipeline(user_id, after, limit + 1))
+    shown, last = 0, None
     try:
-        from agent.agent import regenerate_module_content
-        
-        # Generate enhanced content
-        new_content = regenerate_module_content(
-            req.module_title, 
-            req.original_data, 
-            course_title=course_title
-        )
+        async for doc in cursor:
+            if shown == limit:
+                yield {"type": "page", "next_cursor": encode_list_cursor(last)}
+                return
+            shown, last = shown + 1, doc
+            yield {"type": "course", **_course_summary(doc)}
+    finally:
+        await cursor.close()
+    yield {"type": "page", "next_cursor": None}
 
-        # Update course data in DB
-        if "modules" in course_data:
-            course_data["modules"][req.module_title] = new_content
-            
-            courses_collection.update_one(
-                {"course_id": course_id},
-                {"$set": {"course_data": course_data}}
-            )
 
-        return {"module": new_content}
+# Declared before GET /{course_id}, which would otherwise match "/list"
+@router.get("/list")
+async def list_courses(
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    stream: bool = False,
+    current_user: str = Depends(get_current_user)
+):
+    """
+    The user's courses, newest first, one page at a time: summaries with
+    module counts and progress instead of full course documents. Pass the
+    returned `next_cursor` back to get the following page; with `stream`
+    the page is sent as NDJSON events as it is read from the database.
+    """
+    if courses_collection is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    try:
+        after = decode_list_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    events = _course_list_page(current_user, after, limit)
+    if stream:
+        return StreamingResponse(_ndjson(events), media_type="application/x-ndjson")
 
-    except Exception as e:
-        import traceback
-        print(f"Error regenerating module: {e}")
-        print(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=f"Failed to regenerate module: {str(e)}")
+    courses, next_cursor = [], None
+    async for event in events:
+        if event.pop("type") == "course":
+            courses.append(event)
+        else:
+            next_cursor = event["next_cursor"]
+    return {"courses": courses, "next_cursor": next_cursor}
 
 
 @router.get("/{course_id}")
-async def get_course(course_id: str, current_user: str = Depends(get_current_user)):
+async def get_course(
+    course_id: str,
+    lazy: bool = False,
+    modules: Optional[List[str]] = Query(None),
+    current_user: str = Depends(get_current_user)
+):
+    """
+    The full course, or with `lazy` only the modules listed in `modules`
+    (none by default) plus `course_data.generated_topics`; the others can then
+    be fetched one at a time from GET /course/{course_id}/module.
+    """
     if courses_collection is None:
         raise HTTPException(status_code=503, detail="Database not available")
-        
-    course = courses_collection.find_one({
-        "course_id": course_id, 
-        "user_id": current_user
-    })
+
+    if lazy:
+        pipeline = course_read_pipeline(course_id, current_user, modules or [])
+        found = await (await courses_collection.aggregate(pipeline)).to_list(1)
+        course = found[0] if found else None
+    else:
+        course = await courses_collection.find_one({
+            "course_id": course_id,
+            "user_id": current_user
+        })
     
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
         
     course["_id"] = str(course["_id"])
-    return course
+    return decompress_course(course)
+
+
+@router.get("/{course_id}/module")
+async def get_module(
+    course_id: str,
+    title: str,
+    response: Response,
+    current_user: str = Depends(get_current_user)
+):
+    """One stored module, with its revision as the ETag for later regeneration requests."""
+    module, _ = await _load_module(course_id, current_user, title)
+    response.headers["ETag"] = _module_etag(module)
+    return module
+
 
+@router.delete("/{course_id}")
+async def delete_course(course_id: str, current_user: str = Depends(get_current_user)):
+    if courses_collection is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+
+    result = await courses_collection.delete_one({"course_id": course_id, "user_id": current_user})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Course not found")
 
-@router.get("/list/all")
+    # Stop any background work for the course and discard what it prepared
+    active = await job_queue.broker.find_active(course_id)
+    if active is not None:
+        await job_queue.cancel(active["job_id"], "course deleted")
+    await job_queue.broker.delete_by_key(course_id)
+    await prefetcher.drop(course_id)
+    return {"message": "Course deleted"}
+
+
+@router.get("/list/all", deprecated=True)
 async def get_user_courses(current_user: str = Depends(get_current_user)) -> List[Dict[str, Any]]:
+    """Every course of the user in full; use the paginated GET /course/list instead."""
     if courses_collection is None:
         raise HTTPException(status_code=503, detail="Database not available")
     
@@ -289,9 +1146,9 @@ async def get_user_courses(current_user: str = Depends(get_current_user)) -> Lis
     courses = []
     
     # helper to serialise id
-    for doc in cursor:
+    async for doc in cursor:
         doc["_id"] = str(doc["_id"])
-        courses.append(doc)
+        courses.append(decompress_course(doc))
         
     return courses
 
@@ -299,7 +1156,7 @@ async def get_user_courses(current_user: str = Depends(get_current_user)) -> Lis
 class ProgressUpdate(BaseModel):
     module_title: str
     completed: bool = True
-    quiz_score: int = None
+    quiz_score: Optional[int] = None
 
 
 @router.post("/{course_id}/progress")
@@ -310,32 +1167,25 @@ async def update_course_progress(
 ):
     if courses_collection is None:
         raise HTTPException(status_code=503, detail="Database not available")
-    
-    course_doc = courses_collection.find_one({"course_id": course_id, "user_id": current_user})
+
+    # One atomic update that returns just the progress, never the course content
+    query = {"course_id": course_id, "user_id": current_user}
+    projection = {"_id": 0, "course_progress": 1}
+    update = progress_update(progress.module_title, progress.completed, progress.quiz_score)
+    if update is None:
+        course_doc = await courses_collection.find_one(query, projection)
+    else:
+        course_doc = await courses_collection.find_one_and_update(
+            query, update, projection=projection, return_document=ReturnDocument.AFTER
+        )
     if not course_doc:
         raise HTTPException(status_code=404, detail="Course not found")
-        
-    # Get existing progress or init
-    course_progress = course_doc.get("course_progress", {
-        "completed_modules": [],
-        "quiz_scores": {}
-    })
-    
-    # Update completed modules
-    if progress.completed:
-        if progress.module_title not in course_progress["completed_modules"]:
-            course_progress["completed_modules"].append(progress.module_title)
-            
-    # Update quiz score if provided
-    if progress.quiz_score is not None:
-        if "quiz_scores" not in course_progress:
-            course_progress["quiz_scores"] = {}
-        course_progress["quiz_scores"][progress.module_title] = progress.quiz_score
-        
-    # Update DB
-    courses_collection.update_one(
-        {"course_id": course_id},
-        {"$set": {"course_progress": course_progress}}
-    )
-    
-    return {"message": "Progress updated", "progress": course_progress}
+
+    course_progress = course_doc.get("course_progress") or {}
+    return {
+        "message": "Progress updated",
+        "progress": {
+            "completed_modules": course_progress.get("completed_modules", []),
+            "quiz_scores": course_progress.get("quiz_scores", {}),
+        },
+    }
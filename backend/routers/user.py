@@ -19,7 +19,7 @@ async def get_profile(current_user: str = Depends(get_current_user)):
     if users_collection is None:
         raise HTTPException(status_code=503, detail="Database connection failed")
         
-    user = users_collection.find_one({"email": current_user})
+    user = await users_collection.find_one({"email": current_user})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -50,7 +50,7 @@ async def update_profile(profile_data: UserProfileUpdate, current_user: str = De
     if not update_dict:
         return {"msg": "No changes provided"}
 
-    result = users_collection.update_one(
+    result = await users_collection.update_one(
         {"email": current_user},
         {"$set": update_dict}
     )
@@ -0,0 +1,85 @@
+"""
+Shared fixtures. The code under test talks to pymongo's async API; these
+wrappers expose the subset it uses on top of an in-memory mongomock database.
+"""
+import mongomock
+import pytest
+from pymongo import ReturnDocument
+
+
+class AsyncCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._iter = None
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, n):
+        self._cursor = self._cursor.limit(n)
+        return self
+
+    def __aiter__(self):
+        self._iter = iter(self._cursor)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length=None):
+        docs = list(self._cursor)
+        return docs[:length] if length else docs
+
+    async def close(self):
+        pass
+
+
+class AsyncCollection:
+    def __init__(self, collection):
+        self.sync = collection
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self.sync.find(*args, **kwargs))
+
+    async def aggregate(self, pipeline, **kwargs):
+        return AsyncCursor(iter(list(self.sync.aggregate(pipeline, **kwargs))))
+
+    async def find_one_and_update(self, query, update, projection=None,
+                                  return_document=ReturnDocument.BEFORE, **kwargs):
+        # mongomock re-runs `query` to fetch the updated document, which misses
+        # it whenever the update changed a queried field: refetch it by _id
+        if return_document != ReturnDocument.AFTER:
+            return self.sync.find_one_and_update(query, update, projection, **kwargs)
+        before = self.sync.find_one_and_update(query, update, {"_id": 1}, **kwargs)
+        if before is None:
+            return self.sync.find_one(query, projection) if kwargs.get("upsert") else None
+        return self.sync.find_one({"_id": before["_id"]}, projection)
+
+    def __getattr__(self, name):
+        method = getattr(self.sync, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+class AsyncDatabase:
+    def __init__(self, database):
+        self.sync = database
+
+    def __getitem__(self, name):
+        return AsyncCollection(self.sync[name])
+
+
+@pytest.fixture
+def database():
+    return AsyncDatabase(mongomock.MongoClient()["test"])
+
+
+@pytest.fixture
+def courses(database):
+    return database["courses"]
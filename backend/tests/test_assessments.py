@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+import routers.course as course_router
+
+QUESTION = {"question": "What does a loop do?", "options": ["Repeats", "Stops"], "answer": "Repeats"}
+
+
+@pytest.fixture
+def course(courses, monkeypatch):
+    monkeypatch.setattr(course_router, "courses_collection", courses)
+    courses.sync.insert_one({
+        "course_id": "c1",
+        "user_id": "u1",
+        "lazy_assessments": True,
+        "course_data": {"title": "Python", "modules": {"Loops": {"module_title": "Loops", "explanations": {}}}},
+    })
+    return lambda: courses.sync.find_one({"course_id": "c1"})["course_data"]["modules"]["Loops"]
+
+
+def _serve(monkeypatch, result, kind="quiz"):
+    monkeypatch.setattr(course_router, "generate_module_assessment", lambda *args: result)
+    return asyncio.run(course_router._module_assessment("c1", "u1", "Loops", kind))
+
+
+def test_generated_assessment_is_stored(course, monkeypatch):
+    assert _serve(monkeypatch, ([QUESTION], False)) == {"quiz": [QUESTION]}
+    assert course()["quiz"] == [QUESTION]
+
+
+def test_fallback_assessment_is_served_but_not_stored(course, monkeypatch):
+    cards = [{"front": "What is Loops?", "back": "Loops is a key concept covered in this module."}]
+
+    assert _serve(monkeypatch, ([], True)) == {"quiz": [], "degraded": True}
+    assert _serve(monkeypatch, (cards, True), kind="flashcards") == {"flashcards": cards, "degraded": True}
+    assert "quiz" not in course() and "flashcards" not in course()
+
+    # The next request tries again and keeps a real result
+    assert _serve(monkeypatch, ([QUESTION], False)) == {"quiz": [QUESTION]}
+    assert course()["quiz"] == [QUESTION]
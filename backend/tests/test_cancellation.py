@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import core.jobs as jobs
+import routers.course as course_router
+from agent.tools import youtube
+from core.cancellation import CancelToken, GenerationCancelled
+
+
+class _SlowPage(BaseHTTPRequestHandler):
+    """Sends a page one small chunk per 100ms, like a server that is slow to answer."""
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.end_headers()
+        try:
+            for _ in range(300):
+                self.wfile.write(b"<p>still loading</p>" * 1000)
+                self.wfile.flush()
+                time.sleep(0.1)
+        except OSError:
+            pass  # the client gave up
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def slow_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowPage)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/results"
+    server.shutdown()
+
+
+def test_youtube_download_stops_when_cancelled(slow_url):
+    token = CancelToken()
+    threading.Timer(0.3, token.cancel, args=("client disconnected",)).start()
+
+    started = time.monotonic()
+    with pytest.raises(GenerationCancelled):
+        youtube._fetch(slow_url, timeout=10, token=token)
+    assert time.monotonic() - started < youtube.READ_POLL_SECONDS + 1
+
+
+class _Request:
+    """The part of a Starlette request _job_events uses; set `gone` to drop the client."""
+
+    def __init__(self):
+        self.gone = False
+
+    async def is_disconnected(self):
+        return self.gone
+
+
+def test_attached_job_is_cancelled_when_its_client_disconnects(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_CANCEL_POLL_SECONDS", 0.1)
+
+    async def scenario():
+        queue = jobs.JobQueue(jobs.LocalJobBroker(), concurrency=1)
+        monkeypatch.setattr(course_router, "job_queue", queue)
+
+        async def endless(job):
+            while True:
+                yield {"type": "status", "message": "working"}
+                await asyncio.sleep(0.05)
+
+        queue.register("generate", endless)
+        await queue.start()
+        job = await queue.submit("generate", {}, "u1", key="c1", attached=True)
+
+        request = _Request()
+        events = course_router._job_events(job["job_id"], request=request)
+        await events.__anext__()
+        request.gone = True
+        # The stream is not read any further, as with a dropped connection
+        for _ in range(50):
+            if (await queue.broker.get(job["job_id"]))["status"] == "cancelled":
+                break
+            await asyncio.sleep(0.1)
+        await events.aclose()
+        await queue.stop()
+        return await queue.broker.get(job["job_id"])
+
+    job = asyncio.run(scenario())
+    assert job["status"] == "cancelled"
+    assert job["error"] == "client disconnected"
+
+
+def test_cancel_request_keeps_its_reason(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_CANCEL_POLL_SECONDS", 0.05)
+
+    async def scenario():
+        queue = jobs.JobQueue(jobs.LocalJobBroker(), concurrency=1)
+
+        async def endless(job):
+            while True:
+                yield {"type": "status", "message": "working"}
+                await asyncio.sleep(0.05)
+
+        queue.register("generate", endless)
+        await queue.start()
+        job = await queue.submit("generate", {}, "u1", key="c1")
+        while (await queue.broker.get(job["job_id"]))["status"] != "running":
+            await asyncio.sleep(0.01)
+        await queue.cancel(job["job_id"])
+        while (await queue.broker.get(job["job_id"]))["status"] != "cancelled":
+            await asyncio.sleep(0.05)
+        await queue.stop()
+        return await queue.broker.get(job["job_id"])
+
+    assert asyncio.run(scenario())["error"] == "cancelled by user"
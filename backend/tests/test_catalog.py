@@ -0,0 +1,41 @@
+import mongomock
+import pytest
+
+import core.catalog as catalog_module
+from core.catalog import CourseCatalog
+from core.prompt_index import PromptIndex
+
+COURSE = {"title": "Python Programming", "topics": ["Variables"], "modules": {"Variables": {"explanations": {}}}}
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    index = PromptIndex(None)
+    monkeypatch.setattr(catalog_module, "prompt_index", index)
+    catalog = CourseCatalog(mongomock.MongoClient()["test"]["course_catalog"])
+    for prompt, course in (("Python programming", COURSE), ("C++ programming", {**COURSE, "title": "C++"})):
+        catalog.save(prompt, "standard", course)
+        index.add(prompt, course["title"], course["topics"])
+    return catalog
+
+
+def test_same_words_in_any_order_match(catalog):
+    assert catalog.find("programming in python", "standard")["title"] == "Python Programming"
+    assert catalog.find("Python programming", "quick") is None
+
+
+def test_close_wording_matches_only_if_the_entry_covers_the_request(catalog, monkeypatch):
+    monkeypatch.setattr(catalog_module, "CATALOG_MATCH_THRESHOLD", 0.5)
+
+    assert catalog.find("python programmings", "standard") is None  # "programmings" is named nowhere
+    assert catalog.find("python for data science programming", "standard") is None
+    assert catalog.find("C programming", "standard") is None
+
+
+def test_close_wording_needs_high_similarity(catalog, monkeypatch):
+    monkeypatch.setattr(catalog_module, "CATALOG_MATCH_THRESHOLD", 0.2)
+    monkeypatch.setattr(catalog_module.prompt_index, "threshold", 0.2)
+    assert catalog.find("python", "standard")["title"] == "Python Programming"
+
+    monkeypatch.setattr(catalog_module, "CATALOG_MATCH_THRESHOLD", 0.9)
+    assert catalog.find("python", "standard") is None
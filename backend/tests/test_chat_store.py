@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+import core.chat_store as chat_store
+from core.chat_store import append_messages, decode_chat_cursor, encode_chat_cursor, message_page, recent_messages
+from core.indexes import ensure_indexes
+
+
+def _message(n):
+    return {"role": "user", "content": f"message {n}"}
+
+
+@pytest.fixture
+def chats(database, monkeypatch):
+    monkeypatch.setattr(chat_store, "CHAT_BUCKET_SIZE", 4)
+    assert asyncio.run(ensure_indexes(database))
+    return database["chats"]
+
+
+class _Interleaved:
+    """Lets other requests run between each read and write, as a real round trip would."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getattr__(self, name):
+        method = getattr(self.collection, name)
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(0)
+            return await method(*args, **kwargs)
+        return call
+
+
+def _buckets(chats):
+    return [(doc.get("bucket"), len(doc["messages"])) for doc in chats.sync.find({}, sort=[("bucket", 1)])]
+
+
+def test_full_buckets_are_followed_by_the_next_number(chats):
+    async def append_all():
+        for n in range(0, 10, 2):
+            await append_messages(chats, "c1", "u1", [_message(n), _message(n + 1)])
+
+    asyncio.run(append_all())
+    assert _buckets(chats) == [(0, 4), (1, 4), (2, 2)]
+
+
+def test_concurrent_appends_never_start_the_same_bucket_twice(chats):
+    async def append_all():
+        racing = _Interleaved(chats)
+        await asyncio.gather(*(
+            append_messages(racing, "c1", "u1", [_message(n), _message(n + 1)]) for n in range(0, 12, 2)
+        ))
+
+    asyncio.run(append_all())
+    buckets = _buckets(chats)
+    assert [number for number, _ in buckets] == [0, 1, 2]
+    assert [count for _, count in buckets] == [4, 4, 4]
+    # Each request's pair of messages stays together and in order
+    stored = [m["content"] for doc in chats.sync.find({}, sort=[("bucket", 1)]) for m in doc["messages"]]
+    assert sorted(stored, key=lambda c: int(c.split()[1])) == [f"message {n}" for n in range(12)]
+    assert all(int(stored[i].split()[1]) + 1 == int(stored[i + 1].split()[1]) for i in range(0, 12, 2))
+
+
+@pytest.fixture
+def conversation(chats):
+    """A conversation from before bucketing (messages 0-2), continued in buckets (3-9)."""
+    chats.sync.insert_one({"course_id": "c1", "user_id": "u1", "messages": [_message(n) for n in range(3)]})
+
+    async def append_all():
+        for n in range(3, 10):
+            await append_messages(chats, "c1", "u1", [_message(n)])
+
+    asyncio.run(append_all())
+    return chats
+
+
+def test_old_unnumbered_conversation_reads_as_the_oldest_bucket(conversation):
+    assert _buckets(conversation) == [(None, 3), (0, 4), (1, 3)]
+    recent = asyncio.run(recent_messages(conversation, "c1", "u1", 5))
+    assert [m["content"] for m in recent] == [f"message {n}" for n in range(5, 10)]
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 4, 10, 50])
+def test_pages_walk_back_through_every_message_once(conversation, limit):
+    async def walk():
+        seen, before = [], None
+        while True:
+            page, cursor = await message_page(conversation, "c1", "u1", limit, before)
+            assert page and len(page) <= limit
+            seen += [m["content"] for m in page]
+            if cursor is None:
+                return seen
+            before = decode_chat_cursor(cursor)
+
+    assert asyncio.run(walk()) == [f"message {n}" for n in range(9, -1, -1)]
+
+
+def test_cursor_round_trip():
+    assert decode_chat_cursor(encode_chat_cursor(3, 1)) == (3, 1)
+    assert decode_chat_cursor(encode_chat_cursor(None, 0)) == (None, 0)
+
+
+@pytest.mark.parametrize("cursor", ["", "e30=", encode_chat_cursor("3", 1), encode_chat_cursor(True, 1)])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_chat_cursor(cursor)
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+import agent.agent as agent
+import agent.checkpoint as checkpoint
+
+OUTLINE = {"title": "Python Basics", "topics": ["Variables", "Loops"]}
+
+
+@pytest.fixture
+def generated(monkeypatch):
+    """Replaces module generation (the LLM calls) and records the topics it was asked for."""
+    topics = []
+    failing = set()
+
+    def fake_generate(topic, course_title="", **kwargs):
+        topics.append(topic)
+        if topic in failing:
+            raise RuntimeError(f"worker died while generating {topic}")
+        return {"module_title": topic, "explanations": {"Overview": f"About {topic}"}}
+
+    monkeypatch.setattr(agent, "generate_module_content", fake_generate)
+    return topics, failing
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """Resets the process-wide checkpointer and selects a backend for one test."""
+    def select(name, **settings):
+        monkeypatch.setattr(checkpoint, "CHECKPOINT_BACKEND", name)
+        monkeypatch.setattr(checkpoint, "_checkpointer", None)
+        monkeypatch.setattr(checkpoint, "_disabled", name not in ("mongo", "sqlite"))
+        monkeypatch.setattr(checkpoint, "_retry_at", 0.0)
+        monkeypatch.setattr(checkpoint, "_lock", asyncio.Lock())
+        for key, value in settings.items():
+            monkeypatch.setattr(checkpoint, key, value)
+    return select
+
+
+async def _run(prompt, thread_id, single_step=False):
+    return [
+        chunk async for chunk in agent.run_workflow_stream(
+            prompt, single_step=single_step, thread_id=thread_id, user_id="u1", outline=OUTLINE
+        )
+    ]
+
+
+def test_generation_runs_without_checkpointer(backend, generated):
+    backend("none")
+
+    chunks = asyncio.run(_run("learn python", "c1"))
+
+    assert generated[0] == ["Variables", "Loops"]
+    course = next(chunk["finalize_course"]["course"] for chunk in chunks if "finalize_course" in chunk)
+    assert list(course["modules"]) == ["Variables", "Loops"]
+
+
+def test_failed_setup_is_retried_later(backend, monkeypatch):
+    backend("mongo", CHECKPOINT_RETRY_SECONDS=60)
+    attempts = []
+
+    def unreachable():
+        attempts.append(1)
+        raise ConnectionError("server selection timed out")
+
+    monkeypatch.setattr(checkpoint, "_mongo_checkpointer", unreachable)
+    assert asyncio.run(checkpoint.get_checkpointer()) is None
+    assert asyncio.run(checkpoint.get_checkpointer()) is None
+    assert len(attempts) == 1
+
+    # Once the retry delay has passed the saver is built again, and kept
+    saver = object()
+    monkeypatch.setattr(checkpoint, "_retry_at", 0.0)
+    monkeypatch.setattr(checkpoint, "_mongo_checkpointer", lambda: saver)
+    assert asyncio.run(checkpoint.get_checkpointer()) is saver
+    assert asyncio.run(checkpoint.get_checkpointer()) is saver
+
+
+def test_resume_continues_after_last_checkpoint(backend, generated, tmp_path):
+    pytest.importorskip("langgraph.checkpoint.sqlite")
+    backend("sqlite", CHECKPOINT_SQLITE_PATH=str(tmp_path / "checkpoints.sqlite"))
+    topics, failing = generated
+
+    async def scenario():
+        failing.add("Loops")
+        with pytest.raises(RuntimeError):
+            await _run("learn python", "c1")
+
+        state = await agent.get_workflow_state("c1")
+        assert state["values"]["user_id"] == "u1"
+        assert list(state["values"]["generated_modules"]) == ["Variables"]
+        assert state["next"] == ["generate_module"]
+
+        failing.clear()
+        chunks = [chunk async for chunk in agent.resume_workflow_stream("c1")]
+        await checkpoint.close_checkpointer()
+        return chunks
+
+    chunks = asyncio.run(scenario())
+
+    # The module finished before the crash is not generated again
+    assert topics == ["Variables", "Loops", "Loops"]
+    course = next(chunk["finalize_course"]["course"] for chunk in chunks if "finalize_course" in chunk)
+    assert list(course["modules"]) == ["Variables", "Loops"]
@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from core.compression import decompress_course
+from core.course_store import claim_next_topic, complete_claim, release_claim
+
+TTL = 600
+
+
+def _course(courses, pending, **fields):
+    asyncio.run(courses.insert_one({
+        "course_id": "c1",
+        "user_id": "u1",
+        "course_data": {"modules": {}, "topics": ["Intro", *pending], "pending_topics": list(pending)},
+        **fields,
+    }))
+
+
+def _stored(courses):
+    return decompress_course(courses.sync.find_one({"course_id": "c1"}))
+
+
+def test_claim_takes_first_pending_topic(courses):
+    _course(courses, ["Variables", "Loops"])
+
+    assert asyncio.run(claim_next_topic(courses, "c1", "u1", TTL)) == ("claimed", "Variables")
+    doc = _stored(courses)
+    assert doc["course_data"]["pending_topics"] == ["Loops"]
+    assert doc["generation_claim"]["topic"] == "Variables"
+
+
+def test_second_caller_sees_claim_as_busy(courses):
+    _course(courses, ["Variables", "Loops"])
+
+    asyncio.run(claim_next_topic(courses, "c1", "u1", TTL))
+    assert asyncio.run(claim_next_topic(courses, "c1", "u1", TTL)) == ("busy", "Variables")
+
+
+def test_concurrent_claims_hand_out_one_topic(courses):
+    _course(courses, ["Variables", "Loops"])
+
+    async def claim_all():
+        return await asyncio.gather(*(claim_next_topic(courses, "c1", "u1", TTL) for _ in range(5)))
+
+    results = asyncio.run(claim_all())
+    assert results.count(("claimed", "Variables")) == 1
+    assert results.count(("busy", "Variables")) == 4
+
+
+def test_complete_stores_module_and_frees_next_topic(courses):
+    _course(courses, ["Variables", "Loops"])
+    body = "Variables hold values. " * 40
+
+    asyncio.run(claim_next_topic(courses, "c1", "u1", TTL))
+    asyncio.run(complete_claim(courses, "c1", "Variables", {"title": "Variables", "explanations": {"What": body}}))
+
+    doc = _stored(courses)
+    assert "generation_claim" not in doc
+    assert doc["course_data"]["modules"]["Variables"]["explanations"]["What"] == body
+    assert asyncio.run(claim_next_topic(courses, "c1", "u1", TTL)) == ("claimed", "Loops")
+
+
+def test_release_puts_topic_back_in_front(courses):
+    _course(courses, ["Variables", "Loops"])
+
+    asyncio.run(claim_next_topic(courses, "c1", "u1", TTL))
+    asyncio.run(release_claim(courses, "c1", "Variables"))
+
+    doc = _stored(courses)
+    assert "generation_claim" not in doc
+    assert doc["course_data"]["pending_topics"] == ["Variables", "Loops"]
+    assert asyncio.run(claim_next_topic(courses, "c1", "u1", TTL)) == ("claimed", "Variables")
+
+
+def test_expired_claim_is_taken_over(courses):
+    stale = {"topic": "Variables", "claimed_at": datetime.utcnow() - timedelta(seconds=TTL + 1)}
+    _course(courses, ["Loops"], generation_claim=stale)
+
+    assert asyncio.run(claim_next_topic(courses, "c1", "u1", TTL)) == ("claimed", "Variables")
+    assert _stored(courses)["generation_claim"]["claimed_at"] > stale["claimed_at"]
+
+
+def test_empty_and_missing(courses):
+    _course(courses, [])
+
+    assert asyncio.run(claim_next_topic(courses, "c1", "u1", TTL)) == ("empty", None)
+    assert asyncio.run(claim_next_topic(courses, "c1", "someone-else", TTL)) == ("missing", None)
@@ -0,0 +1,69 @@
+import pytest
+from bson import BSON, Binary
+
+import core.compression as compression
+from core.compression import (
+    COMPRESSED_SUBTYPE, compress_module, compress_modules, compress_text, decompress_course,
+    decompress_module, decompress_text,
+)
+
+BODY = "## Loops\nA `for` loop repeats a block for every item — ünïcode included. " * 20
+CODECS = ["zlib"] + (["zstd"] if compression.zstandard is not None else [])
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_text_round_trip(codec):
+    stored = compress_text(BODY, codec=codec)
+    assert isinstance(stored, Binary) and stored.subtype == COMPRESSED_SUBTYPE
+    assert len(stored) < len(BODY.encode("utf-8"))
+    assert decompress_text(stored) == BODY
+    # Survives a trip through BSON, as it does through MongoDB
+    assert decompress_text(BSON.decode(BSON.encode({"v": stored}))["v"]) == BODY
+
+
+def test_codecs_can_be_mixed_in_one_module():
+    module = {"explanations": {"A": compress_text(BODY, codec="zlib"), "B": BODY}}
+    if compression.zstandard is not None:
+        module["explanations"]["B"] = compress_text(BODY, codec="zstd")
+    assert decompress_module(module)["explanations"] == {"A": BODY, "B": BODY}
+
+
+def test_short_and_disabled_text_stays_plain(monkeypatch):
+    assert compress_text("Short") == "Short"
+    assert compress_text(BODY, codec="none") == BODY
+    # Never stored bigger than the text itself
+    monkeypatch.setattr(compression, "CONTENT_COMPRESSION_MIN_BYTES", 0)
+    assert compress_text("ab") == "ab"
+
+
+def test_plain_values_pass_through_decompression():
+    for value in ("text", None, 3, Binary(b"raw bytes")):
+        assert decompress_text(value) == value
+
+
+def test_module_round_trip_and_idempotence():
+    module = {"module_title": "Loops", "explanations": {"Intro": BODY, "Tiny": "x"}, "quiz": [{"q": 1}]}
+    stored = compress_module(module)
+    assert module["explanations"]["Intro"] == BODY  # the input is not modified
+    assert isinstance(stored["explanations"]["Intro"], Binary)
+    assert stored["explanations"]["Tiny"] == "x"
+    assert compress_module(stored) == stored
+    assert decompress_module(stored) == module
+    assert decompress_module(decompress_module(stored)) == module
+
+
+def test_modules_without_explanations_are_left_alone():
+    assert compress_module({"module_title": "Empty"}) == {"module_title": "Empty"}
+    assert decompress_module(None) is None
+    assert decompress_module({"explanations": None}) == {"explanations": None}
+
+
+def test_course_round_trip():
+    modules = {"Loops": {"explanations": {"Intro": BODY}}, "Old": {"explanations": {"Intro": BODY}}}
+    stored = compress_modules(modules)
+    stored["Old"] = modules["Old"]  # written before compression existed
+    doc = {"course_id": "c1", "course_data": {"modules": stored}}
+
+    assert decompress_course(doc)["course_data"]["modules"] == modules
+    assert decompress_course(None) is None
+    assert decompress_course({"course_id": "c2"}) == {"course_id": "c2"}
@@ -0,0 +1,73 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+import routers.course as course_router
+from core.course_store import decode_list_cursor, encode_list_cursor
+
+NOON = datetime(2024, 5, 1, 12, 0, 0, 123000)
+
+
+def test_cursor_round_trip():
+    doc = {"_id": ObjectId(), "created_at": NOON}
+    assert decode_list_cursor(encode_list_cursor(doc)) == (NOON, doc["_id"])
+
+    undated = {"_id": ObjectId()}
+    assert decode_list_cursor(encode_list_cursor(undated)) == (None, undated["_id"])
+
+
+@pytest.mark.parametrize("cursor", ["", "not base64!", "e30=", "eyJ0IjogbnVsbCwgImlkIjogIngifQ=="])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_list_cursor(cursor)
+
+
+@pytest.fixture
+def stored(courses, monkeypatch):
+    """Seven courses of u1, two created at the same time and two without a date, and one of u2."""
+    monkeypatch.setattr(course_router, "courses_collection", courses)
+    ids = [ObjectId() for _ in range(7)]
+    dates = [datetime(2024, 5, 3), NOON, NOON, datetime(2024, 4, 30), datetime(2024, 4, 1), None, None]
+    for n, (_id, created_at) in enumerate(zip(ids, dates)):
+        doc = {"_id": _id, "course_id": f"c{n}", "user_id": "u1", "title": f"Course {n}",
+               "course_data": {"topics": ["A", "B"], "modules": {"A": {}}, "pending_topics": ["B"]}}
+        if created_at is not None:
+            doc["created_at"] = created_at
+        elif n == 5:
+            doc["created_at"] = None  # stored as null, the last one has no field at all
+        courses.sync.insert_one(doc)
+    courses.sync.insert_one({"_id": ObjectId(), "course_id": "other", "user_id": "u2", "created_at": NOON})
+    # Newest first; equal dates by _id descending, undated courses last
+    return ["c0", "c2", "c1", "c3", "c4", "c6", "c5"]
+
+
+def _pages(limit):
+    async def walk():
+        pages, after = [], None
+        while True:
+            events = [e async for e in course_router._course_list_page("u1", after, limit)]
+            pages.append([e["course_id"] for e in events if e["type"] == "course"])
+            cursor = events[-1]["next_cursor"]
+            if cursor is None:
+                return pages
+            after = decode_list_cursor(cursor)
+    return asyncio.run(walk())
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 7, 20])
+def test_pages_cover_every_course_once_in_order(stored, limit):
+    pages = _pages(limit)
+    assert [c for page in pages for c in page] == stored
+    assert all(len(page) == limit for page in pages[:-1])
+    assert pages[-1]  # no empty trailing page
+
+
+def test_summaries_count_modules_without_sending_them(stored):
+    async def first():
+        return [e async for e in course_router._course_list_page("u1", None, 1)][0]
+
+    course = asyncio.run(first())
+    assert (course["topic_count"], course["module_count"], course["pending_count"]) == (2, 1, 1)
+    assert "course_data" not in course
@@ -0,0 +1,119 @@
+import json
+import threading
+
+import pytest
+
+import agent.agent as agent
+from core.deadline import DeadlineExceeded
+
+SUBTOPICS = ["Variables", "Loops", "Functions"]
+
+
+class _LLM:
+    """
+    Explains each subtopic with `answers[subtopic]`: a string, None (a failed
+    call) or an exception to raise. "Variables" is only answered once every
+    other subtopic was, so the workers finish out of order.
+    """
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.finished = []
+        self._others_done = threading.Event()
+        self._lock = threading.Lock()
+
+    def invoke(self, input_vars, **kwargs):
+        subtopic = input_vars["subtopic"]
+        if subtopic == SUBTOPICS[0]:
+            assert self._others_done.wait(5)
+        try:
+            answer = self.answers[subtopic]
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+        finally:
+            with self._lock:
+                self.finished.append(subtopic)
+                if len(self.finished) == len(SUBTOPICS) - 1:
+                    self._others_done.set()
+
+
+@pytest.fixture(autouse=True)
+def side_parts(monkeypatch):
+    monkeypatch.setattr(agent, "FANOUT_MAX_CONCURRENCY", len(SUBTOPICS) + 3)
+    monkeypatch.setattr(agent, "generate_flashcards_for_topic", lambda *args: [{"front": "F", "back": "B"}])
+    monkeypatch.setattr(agent, "generate_quiz_for_topic", lambda *args: [{"question": "Q?"}])
+    monkeypatch.setattr(agent, "_generate_module_diagram", lambda *args: "graph LR; A-->B")
+
+
+def _fanout(monkeypatch, answers, streamed=None):
+    llm = _LLM(answers)
+    monkeypatch.setattr(agent, "llm_client", llm)
+    on_subtopic = (lambda st, text: streamed.append(st)) if streamed is not None else None
+    package = agent._generate_module_package_fanout("Python", SUBTOPICS, [None] * 3, on_subtopic)
+    return package, llm
+
+
+def test_explanations_keep_subtopic_order(monkeypatch):
+    streamed = []
+    package, llm = _fanout(monkeypatch, {st: f"About {st}." for st in SUBTOPICS}, streamed)
+
+    assert llm.finished[-1] == "Variables"
+    assert streamed[-1] == "Variables"
+    assert list(package["explanations"]) == SUBTOPICS
+    assert package["quiz"] == [{"question": "Q?"}] and package["mermaid"] == "graph LR; A-->B"
+    assert "truncated" not in package
+
+
+def test_failed_and_cut_off_workers_do_not_fail_the_module(monkeypatch):
+    answers = {
+        "Variables": "About variables.",
+        "Loops": DeadlineExceeded(partial="Loops repeat "),
+        "Functions": None,
+    }
+    package, _ = _fanout(monkeypatch, answers)
+
+    assert package["explanations"] == {
+        "Variables": "About variables.",
+        "Loops": "Loops repeat\n\n*(This section was shortened to meet the time limit.)*",
+    }
+    assert package["truncated"] is True
+    assert package["flashcards"] == [{"front": "F", "back": "B"}]
+
+
+def test_worker_cut_off_before_writing_anything_is_dropped(monkeypatch):
+    answers = {"Variables": "About variables.", "Loops": DeadlineExceeded(), "Functions": "About functions."}
+    package, _ = _fanout(monkeypatch, answers)
+
+    assert list(package["explanations"]) == ["Variables", "Functions"]
+    assert package["truncated"] is True
+
+
+def test_salvage_keeps_finished_and_cut_explanations():
+    written = json.dumps({"explanations": {"Variables": "Names for \"values\".", "Loops": "Loops repeat code"}})
+    partial = written[:written.index("code")]  # cut inside the "Loops" body
+
+    salvaged = agent._salvage_explanations(partial, SUBTOPICS)
+
+    assert salvaged == {
+        "Variables": 'Names for "values".',
+        "Loops": "Loops repeat\n\n*(This section was shortened to meet the time limit.)*",
+    }
+
+
+def test_salvage_ignores_keys_that_are_not_subtopics():
+    partial = '{"explanations": {"Variables": "Names.", "Invented": "Not asked for.", "Loops": "Rep'
+    assert list(agent._salvage_explanations(partial, SUBTOPICS)) == ["Variables", "Loops"]
+    assert agent._salvage_explanations('{"mermaid": "graph', SUBTOPICS) == {}
+
+
+def test_cut_off_single_call_package_is_salvaged(monkeypatch):
+    class _CutOff:
+        def invoke(self, **kwargs):
+            raise DeadlineExceeded(partial='{"explanations": {"Variables": "Names for values.", "Loops": "Rep')
+
+    monkeypatch.setattr(agent, "llm_client", _CutOff())
+    package = agent._generate_module_package("Python", SUBTOPICS, [None] * 3)
+
+    assert list(package["explanations"]) == ["Variables", "Loops"]
+    assert package["truncated"] is True
@@ -0,0 +1,69 @@
+"""
+Offline counterpart of check_indexes.py: mongomock has no query planner, so
+these check that every hot query can be served by a declared index (equality
+fields, then the sort) rather than asking MongoDB through explain().
+"""
+import asyncio
+
+import pytest
+
+from core.indexes import HOT_QUERIES, INDEXES, ensure_indexes, plan_stages, uses_index
+
+
+def _equality_fields(query):
+    """Fields every document matching `query` has one exact value for, per $or branch."""
+    fields = {
+        field for field, value in query.items()
+        if not field.startswith("$") and not (isinstance(value, dict) and any(k.startswith("$") for k in value))
+    }
+    if "$or" in query:
+        fields |= set.intersection(*(_equality_fields(branch) for branch in query["$or"]))
+    return fields
+
+
+def _serves(keys, query, sort):
+    """Whether an index on `keys` finds `query`'s documents already in `sort` order."""
+    equal = _equality_fields(query)
+    if keys[0][0] not in equal:
+        return False
+    prefix = 0
+    while prefix < len(keys) and keys[prefix][0] in equal:
+        prefix += 1
+    # A field with a single value is in order whatever the direction
+    sort = [(field, direction) for field, direction in sort or [] if field not in equal]
+    following = keys[prefix:prefix + len(sort)]
+    return following == sort or following == [(field, -direction) for field, direction in sort]
+
+
+@pytest.mark.parametrize("name, query, sort", HOT_QUERIES, ids=lambda v: v if isinstance(v, str) else "")
+def test_hot_query_has_an_index(name, query, sort):
+    candidates = [list(model.document["key"].items()) for model in INDEXES[name]]
+    assert any(_serves(keys, query, sort) for keys in candidates), f"{name} {query} sort {sort}"
+
+
+def test_a_query_on_a_later_index_field_is_not_served():
+    keys = [("user_id", 1), ("created_at", -1)]
+    assert not _serves(keys, {"created_at": {"$lt": 1}}, None)
+    assert not _serves(keys, {"user_id": "u"}, [("title", 1)])
+    assert _serves(keys, {"user_id": "u"}, [("created_at", 1)])
+
+
+def test_indexes_are_created_and_creating_them_again_is_harmless(database):
+    assert asyncio.run(ensure_indexes(database))
+    assert asyncio.run(ensure_indexes(database))
+    names = database["chats"].sync.index_information()
+    assert names["course_id_user_id_bucket_unique"]["unique"]
+
+
+def test_plan_with_a_collection_scan_is_flagged():
+    indexed = {"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}}
+    merged = {"queryPlanner": {"winningPlan": {"stage": "SORT_MERGE", "inputStages": [
+        {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}},
+        {"stage": "COLLSCAN"},
+    ]}}}
+    scan = {"queryPlanner": {"winningPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}}}
+
+    assert plan_stages(merged) == ["SORT_MERGE", "FETCH", "IXSCAN", "COLLSCAN"]
+    assert uses_index(indexed)
+    assert not uses_index(merged)
+    assert not uses_index(scan)
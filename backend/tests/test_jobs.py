@@ -0,0 +1,131 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import Binary
+
+from core.jobs import JobLeaseLost, JobQueue, LocalJobBroker, MongoJobBroker
+
+BODY = "A loop repeats a block of code. " * 30
+
+
+def _module_event(topic):
+    return {"type": "module", "data": {"module_title": topic, "explanations": {"Overview": BODY}}}
+
+
+def test_local_job_runs_and_streams_events():
+    async def scenario():
+        queue = JobQueue(LocalJobBroker(), concurrency=1)
+
+        async def handler(job):
+            yield {"type": "status", "message": "working"}
+            yield _module_event(job["payload"]["topic"])
+
+        queue.register("generate", handler)
+        await queue.start()
+        job = await queue.submit("generate", {"topic": "Loops"}, "u1", key="c1")
+        records = [record async for record in queue.follow(job["job_id"])]
+        await queue.stop()
+        return records, await queue.broker.get(job["job_id"])
+
+    records, job = asyncio.run(scenario())
+    assert [r["seq"] for r in records] == [1, 2]
+    assert records[1]["event"] == _module_event("Loops")
+    assert job["status"] == "done"
+
+
+def test_stored_events_are_compressed_and_read_back_plain(database):
+    broker = MongoJobBroker(database)
+
+    async def scenario():
+        job = await broker.enqueue("generate", {}, "u1", key="c1")
+        await broker.claim("w1", timeout=0)
+        await broker.publish(job["job_id"], _module_event("Loops"))
+        await broker.publish(job["job_id"], {"type": "complete", "data": {
+            "title": "Python", "modules": {"Loops": _module_event("Loops")["data"]},
+        }})
+        return job, await broker.events_after(job["job_id"], 0, timeout=0)
+
+    job, records = asyncio.run(scenario())
+    stored = database["generation_job_events"].sync.find_one({"job_id": job["job_id"], "seq": 1})
+    assert isinstance(stored["event"]["data"]["explanations"]["Overview"], Binary)
+    assert records[0]["event"] == _module_event("Loops")
+    assert records[1]["event"]["data"]["modules"]["Loops"]["explanations"]["Overview"] == BODY
+
+
+def test_delete_by_key_removes_jobs_and_events(database):
+    broker = MongoJobBroker(database)
+
+    async def scenario():
+        doomed = await broker.enqueue("generate", {}, "u1", key="c1")
+        kept = await broker.enqueue("generate", {}, "u1", key="c2")
+        for job in (doomed, kept):
+            await broker.publish(job["job_id"], {"type": "status", "message": "working"})
+        await broker.delete_by_key("c1")
+        return doomed, kept
+
+    doomed, kept = asyncio.run(scenario())
+    assert database["generation_jobs"].sync.count_documents({}) == 1
+    assert database["generation_job_events"].sync.count_documents({"job_id": doomed["job_id"]}) == 0
+    assert database["generation_job_events"].sync.count_documents({"job_id": kept["job_id"]}) == 1
+
+
+class _FlakyBroker(LocalJobBroker):
+    """Fails to record the outcome of jobs whose payload asks for it."""
+
+    async def publish(self, job_id, event, worker_id=None):
+        if event["type"] == "error" and self._jobs[job_id]["payload"].get("flaky"):
+            raise ConnectionError("database went away")
+        return await super().publish(job_id, event, worker_id)
+
+
+def test_worker_survives_a_failed_status_write():
+    async def scenario():
+        queue = JobQueue(_FlakyBroker(), concurrency=1)
+
+        async def handler(job):
+            if job["payload"].get("flaky"):
+                raise RuntimeError("LLM unavailable")
+            yield {"type": "status", "message": "working"}
+
+        queue.register("generate", handler)
+        await queue.start()
+        await queue.submit("generate", {"flaky": True}, "u1", key="c1")
+        job = await queue.submit("generate", {}, "u1", key="c2")
+        records = [record async for record in queue.follow(job["job_id"])]
+        await queue.stop()
+        return records, await queue.broker.get(job["job_id"])
+
+    records, job = asyncio.run(asyncio.wait_for(scenario(), 10))
+    assert [r["event"]["type"] for r in records] == ["status"]
+    assert job["status"] == "done"
+
+
+def test_reclaimed_job_continues_the_event_sequence(database):
+    broker = MongoJobBroker(database)
+
+    async def scenario():
+        job = await broker.enqueue("generate", {}, "u1", key="c1")
+        job_id = job["job_id"]
+        await broker.claim("w1", timeout=0)
+        await broker.publish(job_id, {"type": "status", "message": "one"}, worker_id="w1")
+        await broker.publish(job_id, {"type": "status", "message": "two"}, worker_id="w1")
+
+        # w1 misses its heartbeats (a slow LLM call) and w2 takes the job over
+        await database["generation_jobs"].update_one(
+            {"job_id": job_id}, {"$set": {"lease_until": datetime.utcnow() - timedelta(seconds=1)}}
+        )
+        assert (await broker.claim("w2", timeout=0))["job_id"] == job_id
+        await broker.publish(job_id, {"type": "status", "message": "three"}, worker_id="w2")
+
+        with pytest.raises(JobLeaseLost):
+            await broker.publish(job_id, {"type": "status", "message": "stale"}, worker_id="w1")
+        await broker.finish(job_id, "failed", error="stale worker", worker_id="w1")
+        status_after_stale_finish = (await broker.get(job_id))["status"]
+        await broker.finish(job_id, "done", worker_id="w2")
+        return status_after_stale_finish, await broker.events_after(job_id, 0, timeout=0), await broker.get(job_id)
+
+    stale_status, records, job = asyncio.run(scenario())
+    assert stale_status == "running"
+    assert [(r["seq"], r["event"]["message"]) for r in records] == [(1, "one"), (2, "two"), (3, "three")]
+    assert job["status"] == "done"
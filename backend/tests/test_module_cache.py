@@ -0,0 +1,28 @@
+import mongomock
+
+from core.module_cache import ModuleCache
+
+
+def _key(title, topic="Pointers"):
+    return ModuleCache.key(title, topic, "v1", "standard", True)
+
+
+def test_languages_named_with_symbols_get_their_own_entries():
+    keys = {_key("C"), _key("C++"), _key("C#"), _key("F#"), _key("F")}
+    assert len(keys) == 5
+    assert _key("Node.js") != _key("Node js")
+
+
+def test_case_and_spacing_do_not_matter():
+    assert _key("C++") == _key("  c++ ")
+    assert _key("Intro to  C#", topic="Pointers ") == _key("intro to c#", topic="pointers")
+
+
+def test_modules_are_only_shared_under_the_same_title():
+    cache = ModuleCache(mongomock.MongoClient()["test"])
+    module = {"module_title": "Pointers", "explanations": {"Overview": "Smart pointers"}, "revision": 3}
+
+    cache.put(_key("C++"), module, "Pointers")
+
+    assert cache.get(_key("C")) is None
+    assert cache.get(_key("c++")) == {"module_title": "Pointers", "explanations": {"Overview": "Smart pointers"}}
@@ -0,0 +1,34 @@
+import pytest
+
+import agent.agent as agent
+from core.deadline import Deadline, deadline_scope
+
+
+@pytest.fixture
+def package(monkeypatch):
+    """Stubs the LLM and YouTube stages; returns the package the LLM "answers" with."""
+    answer = {"explanations": {"Variables": "Names for values.", "Loops": "Repeating work."}}
+    monkeypatch.setattr(agent, "_generate_subtopics", lambda topic, depth=None: ["Variables", "Loops"])
+    monkeypatch.setattr(agent, "_fetch_video_with_retry", lambda *args: None)
+    monkeypatch.setattr(agent, "_generate_module_package", lambda *args: dict(answer))
+    return answer
+
+
+def _module():
+    return agent._generate_module("Basics", "Python", "single", None, True, "standard")
+
+
+def test_missing_diagram_without_a_deadline_is_not_degraded(package):
+    module = _module()
+    assert module["mermaid"]  # the outline diagram stands in
+    assert "degraded" not in module
+
+
+def test_missing_diagram_within_the_deadline_is_not_degraded(package):
+    with deadline_scope(Deadline(60)):
+        assert "degraded" not in _module()
+
+
+def test_diagram_cut_by_the_deadline_is_degraded(package):
+    package["truncated"] = True
+    assert "diagram" in _module()["degraded"]
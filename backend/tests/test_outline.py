@@ -0,0 +1,112 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+import core.course_store as course_store
+from core.course_store import OutlineConflict, edit_outline
+
+MODULE = {"module_title": "Variables", "explanations": {}}
+
+
+def _course(courses, topics, modules, pending=(), **fields):
+    asyncio.run(courses.insert_one({
+        "course_id": "c1",
+        "user_id": "u1",
+        "course_data": {
+            "topics": list(topics),
+            "pending_topics": list(pending),
+            "modules": {topic: {**MODULE, "module_title": topic} for topic in modules},
+        },
+        **fields,
+    }))
+
+
+def _edit(courses, topics):
+    return asyncio.run(edit_outline(courses, "c1", "u1", topics))
+
+
+def _stored(courses):
+    return courses.sync.find_one({"course_id": "c1"})
+
+
+def test_edit_reports_and_applies_the_diff(courses):
+    _course(courses, ["Intro", "Variables", "Loops"], ["Intro", "Variables"], pending=["Loops"])
+
+    changes = _edit(courses, ["Intro", "Loops", "Functions"])
+
+    assert changes == {"kept": ["Intro", "Loops"], "added": ["Functions"], "removed": ["Variables"]}
+    course_data = _stored(courses)["course_data"]
+    assert course_data["topics"] == ["Intro", "Loops", "Functions"]
+    # Still-pending and new topics are queued in outline order
+    assert course_data["pending_topics"] == ["Loops", "Functions"]
+    assert set(course_data["modules"]) == {"Intro"}
+
+
+def test_claim_on_a_removed_topic_is_released(courses):
+    claim = {"topic": "Loops", "claimed_at": datetime.utcnow()}
+    _course(courses, ["Intro", "Loops"], ["Intro"], generation_claim=claim)
+
+    _edit(courses, ["Intro", "Functions"])
+    assert "generation_claim" not in _stored(courses)
+
+
+def test_claim_on_a_kept_topic_survives(courses):
+    claim = {"topic": "Loops", "claimed_at": datetime.utcnow()}
+    _course(courses, ["Intro", "Loops"], ["Intro"], generation_claim=claim)
+
+    _edit(courses, ["Loops", "Intro"])
+    assert _stored(courses)["generation_claim"]["topic"] == "Loops"
+
+
+def test_removed_topic_that_is_not_a_field_path(courses, monkeypatch):
+    claim = {"topic": "Node.js Basics", "claimed_at": datetime.utcnow()}
+    _course(courses, ["Intro", "Node.js Basics"], ["Intro", "Node.js Basics"], generation_claim=claim)
+    sent = []
+
+    class _Matched:
+        matched_count = 1
+
+    async def capture(query, update):
+        sent.append(update)
+        return _Matched()
+
+    # mongomock cannot evaluate $$this inside $filter, so the pipeline is checked by shape
+    monkeypatch.setattr(courses, "update_one", capture, raising=False)
+
+    changes = _edit(courses, ["Intro"])
+
+    assert changes == {"kept": ["Intro"], "added": [], "removed": ["Node.js Basics"]}
+    [update] = sent
+    assert isinstance(update, list)
+    written = update[0]["$set"]
+    assert written["course_data.topics"] == {"$literal": ["Intro"]}
+    assert written["course_data.pending_topics"] == {"$literal": []}
+    dropped = written["course_data.modules"]["$arrayToObject"]["$filter"]["cond"]
+    assert dropped == {"$not": [{"$in": ["$$this.k", {"$literal": ["Node.js Basics"]}]}]}
+    assert update[1] == {"$unset": ["generation_claim"]}
+
+
+def test_missing_course(courses):
+    assert _edit(courses, ["Intro"]) is None
+
+
+def test_edit_gives_up_when_the_course_keeps_changing(courses, monkeypatch):
+    _course(courses, ["Intro", "Loops"], ["Intro"])
+    monkeypatch.setattr(course_store, "EDIT_OUTLINE_BACKOFF_SECONDS", 0)
+    writes = []
+
+    class _Unmatched:
+        matched_count = 0
+
+    async def always_stale(query, update):
+        # Another writer always gets in between the read and the write
+        writes.append(query)
+        return _Unmatched()
+
+    monkeypatch.setattr(courses, "update_one", always_stale, raising=False)
+
+    with pytest.raises(OutlineConflict):
+        _edit(courses, ["Intro"])
+    assert len(writes) == course_store.EDIT_OUTLINE_ATTEMPTS
+    assert _stored(courses)["course_data"]["topics"] == ["Intro", "Loops"]
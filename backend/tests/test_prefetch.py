@@ -0,0 +1,107 @@
+import asyncio
+import threading
+
+import pytest
+
+import agent.agent as agent
+import core.prefetch as prefetch
+import routers.course as course_router
+from core.compression import decompress_course
+from core.jobs import JobQueue, LocalJobBroker
+
+
+class _Request:
+    async def is_disconnected(self):
+        return False
+
+
+class _Generator:
+    """Stands in for generate_module_content; blocks until `proceed` is set."""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.started = threading.Event()
+        self.proceed = threading.Event()
+        self.fail = fail
+
+    def __call__(self, topic, course_title="", **kwargs):
+        self.calls.append(topic)
+        self.started.set()
+        assert self.proceed.wait(5)
+        if self.fail:
+            raise RuntimeError("LLM unavailable")
+        return {"module_title": topic, "explanations": {"Overview": f"All about {topic}."}}
+
+
+@pytest.fixture
+def course(database, monkeypatch):
+    courses = database["courses"]
+    prefetched = database["prefetched_modules"]
+    monkeypatch.setattr(prefetch, "courses_collection", courses)
+    monkeypatch.setattr(prefetch, "prefetched_collection", prefetched)
+    monkeypatch.setattr(course_router, "courses_collection", courses)
+    monkeypatch.setattr(course_router, "job_queue", JobQueue(LocalJobBroker()))
+    monkeypatch.setattr(course_router, "prefetcher", prefetch.ModulePrefetcher(ahead=1))
+    courses.sync.insert_one({
+        "course_id": "c1",
+        "user_id": "u1",
+        "title": "Python",
+        "course_data": {
+            "title": "Python",
+            "topics": ["Intro", "Variables", "Loops"],
+            "pending_topics": ["Variables", "Loops"],
+            "modules": {"Intro": {"module_title": "Intro", "explanations": {}}},
+        },
+    })
+    return courses, prefetched
+
+
+def _click_while_prefetching(monkeypatch, background, foreground):
+    """Requests the next module while the prefetch of that very topic is running."""
+    monkeypatch.setattr(prefetch, "generate_module_content", background)
+    monkeypatch.setattr(agent, "generate_module_content", foreground)
+
+    async def scenario():
+        course_router.prefetcher.schedule("c1", "u1")
+        assert await asyncio.to_thread(background.started.wait, 5)
+
+        click = asyncio.create_task(course_router.generate_next_module("c1", _Request(), "u1"))
+        await asyncio.sleep(0.2)
+        assert not click.done()  # waiting on the prefetch rather than generating
+
+        background.proceed.set()
+        result = await click
+        # It goes on with the next topic, which is not what is tested here
+        course_router.prefetcher.cancel("c1")
+        return result
+
+    return asyncio.run(scenario())
+
+
+def test_click_during_prefetch_waits_for_it(course, monkeypatch):
+    courses, prefetched = course
+    background, foreground = _Generator(), _Generator()
+
+    result = _click_while_prefetching(monkeypatch, background, foreground)
+
+    assert result["module"]["explanations"] == {"Overview": "All about Variables."}
+    assert background.calls.count("Variables") == 1 and foreground.calls == []
+    course_data = decompress_course(courses.sync.find_one({"course_id": "c1"}))["course_data"]
+    assert list(course_data["modules"]) == ["Intro", "Variables"]
+    assert course_data["pending_topics"] == ["Loops"]
+    # Handed over, not left parked for a second delivery
+    assert prefetched.sync.count_documents({"topic": "Variables"}) == 0
+
+
+def test_click_generates_itself_when_the_prefetch_fails(course, monkeypatch):
+    courses, prefetched = course
+    background, foreground = _Generator(fail=True), _Generator()
+    foreground.proceed.set()
+
+    result = _click_while_prefetching(monkeypatch, background, foreground)
+
+    assert result["module"]["explanations"] == {"Overview": "All about Variables."}
+    assert background.calls.count("Variables") == 1 and foreground.calls == ["Variables"]
+    course_data = decompress_course(courses.sync.find_one({"course_id": "c1"}))["course_data"]
+    assert list(course_data["modules"]) == ["Intro", "Variables"]
+    assert prefetched.sync.count_documents({"topic": "Variables"}) == 0
@@ -0,0 +1,59 @@
+import pytest
+
+import agent.agent as agent
+import routers.course as course_router
+from agent.profiles import DEFAULT_DEPTH, DEPTH_PROFILES, get_profile
+
+
+class _LLM:
+    """Records the calls it gets and answers them with `answer`."""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.calls = []
+
+    def invoke(self, **kwargs):
+        self.calls.append(kwargs)
+        return self.answer
+
+
+@pytest.mark.parametrize("depth", sorted(DEPTH_PROFILES))
+def test_known_depths_select_their_profile(depth):
+    assert get_profile(depth) is DEPTH_PROFILES[depth]
+
+
+@pytest.mark.parametrize("depth", [None, "", "extreme"])
+def test_unknown_depths_fall_back_to_the_default(depth):
+    assert get_profile(depth) is DEPTH_PROFILES[DEFAULT_DEPTH]
+
+
+def test_stored_course_with_an_unknown_depth_is_generated_at_the_default():
+    assert course_router._course_options({"depth": "extreme"})["depth"] == DEFAULT_DEPTH
+    assert course_router._course_options({"depth": "deep"})["depth"] == "deep"
+
+
+def test_profile_settings_reach_the_package_call(monkeypatch):
+    llm = _LLM({"explanations": {"Variables": "Names for values."}, "mermaid": "graph LR; A-->B"})
+    monkeypatch.setattr(agent, "llm_client", llm)
+
+    agent._generate_module_package("Python", ["Variables"], [None], profile=get_profile("quick"))
+
+    [call] = llm.calls
+    quick = DEPTH_PROFILES["quick"]
+    assert call["max_output_tokens"] == quick["max_output_tokens"]
+    assert call["input_vars"]["detail"] == quick["detail"]
+    assert call["input_vars"]["sections"] == quick["sections"]
+    assert f"{quick['quiz_questions']} multiple-choice quiz questions" in call["input_vars"]["assessment_tasks"]
+
+
+def test_depth_sets_the_number_of_subtopics(monkeypatch):
+    llm = _LLM(["Variables", "Loops"])
+    monkeypatch.setattr(agent, "llm_client", llm)
+
+    agent._generate_subtopics("Python", depth="deep")
+    agent._generate_subtopics("Python", depth="extreme")
+
+    assert [call["input_vars"]["count"] for call in llm.calls] == [
+        DEPTH_PROFILES["deep"]["subtopics"],
+        DEPTH_PROFILES[DEFAULT_DEPTH]["subtopics"],
+    ]
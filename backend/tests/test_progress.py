@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import routers.course as course_router
+from core.course_store import progress_update
+
+
+@pytest.fixture
+def progress(courses, monkeypatch):
+    monkeypatch.setattr(course_router, "courses_collection", courses)
+    courses.sync.insert_one({"course_id": "c1", "user_id": "u1", "course_data": {"modules": {}}})
+    return lambda: courses.sync.find_one({"course_id": "c1"}).get("course_progress")
+
+
+def _post(module_title, completed=True, quiz_score=None, user="u1"):
+    body = course_router.ProgressUpdate(module_title=module_title, completed=completed, quiz_score=quiz_score)
+    return course_router.update_course_progress("c1", body, current_user=user)
+
+
+def test_nothing_to_change_builds_no_update():
+    assert progress_update("Loops", False, None) is None
+
+
+def test_safe_titles_use_field_paths():
+    assert progress_update("Loops", True, 80) == {
+        "$addToSet": {"course_progress.completed_modules": "Loops"},
+        "$set": {"course_progress.quiz_scores.Loops": 80},
+    }
+    assert progress_update("Loops", False, 0) == {"$set": {"course_progress.quiz_scores.Loops": 0}}
+
+
+def test_titles_with_dots_use_a_pipeline():
+    update = progress_update("Node.js Basics", True, 90)
+    assert isinstance(update, list)
+    assert set(update[0]["$set"]) == {"course_progress.completed_modules", "course_progress.quiz_scores"}
+
+
+def test_concurrent_posts_for_different_modules_are_all_kept(progress):
+    async def post_all():
+        return await asyncio.gather(
+            _post("Variables"), _post("Loops", quiz_score=70), _post("Loops"), _post("Functions", False, 55)
+        )
+
+    asyncio.run(post_all())
+    assert sorted(progress()["completed_modules"]) == ["Loops", "Variables"]
+    assert progress()["quiz_scores"] == {"Loops": 70, "Functions": 55}
+
+
+def test_a_post_with_nothing_to_change_returns_the_progress(progress):
+    asyncio.run(_post("Loops", quiz_score=60))
+    result = asyncio.run(_post("Variables", completed=False))
+    assert result["progress"] == {"completed_modules": ["Loops"], "quiz_scores": {"Loops": 60}}
+    assert progress()["completed_modules"] == ["Loops"]
+
+
+def test_someone_elses_course_is_not_found(progress):
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(_post("Loops", user="u2"))
+    assert e.value.status_code == 404
+    assert progress() is None
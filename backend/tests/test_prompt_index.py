@@ -0,0 +1,33 @@
+import mongomock
+
+from core.prompt_index import KEY_VERSION, PromptIndex, prompt_key
+
+
+def test_subject_words_and_symbols_are_kept():
+    assert prompt_key("Teach me C++") != prompt_key("Teach me C")
+    assert prompt_key("Intro to C#") != prompt_key("Intro to C")
+    assert prompt_key("Python basics") != prompt_key("Advanced Python")
+    assert prompt_key("Learn Node.js.") == "learn node.js"
+
+
+def test_phrasing_and_word_order_are_ignored():
+    assert prompt_key("Machine learning for biology") == prompt_key("biology and machine learning")
+    assert prompt_key("How would I cook pasta?") == prompt_key("cook pasta")
+
+
+def test_outlines_of_other_languages_are_not_offered():
+    index = PromptIndex(None, threshold=0.6)
+    index.add("Teach me C++ programming", "C++ Programming", ["Pointers", "Templates"])
+
+    assert index.lookup("Teach me C programming") is None
+    assert index.lookup("teach me c++ programming")["title"] == "C++ Programming"
+
+
+def test_entries_stored_under_older_keys_are_dropped():
+    collection = mongomock.MongoClient()["test"]["prompt_index"]
+    collection.insert_one({"key": "c", "prompt": "C++", "title": "C++", "topics": ["Pointers"],
+                           "signature": [0] * 64})
+    index = PromptIndex(collection.database)
+    index.add("Rust ownership", "Rust Ownership", ["Borrowing"])
+
+    assert [doc["version"] for doc in collection.find()] == [KEY_VERSION]
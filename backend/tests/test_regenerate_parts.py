@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException, Response
+
+import agent.agent as agent
+import routers.course as course_router
+from core.compression import decompress_module
+
+MODULE = {
+    "module_title": "Loops",
+    "explanations": {"For": "Old for.", "While": "Old while.", "Break": "Old break."},
+    "videos": [None, {"url": "https://youtu.be/x"}, None],
+    "quiz": [{"question": "Old?"}],
+    "flashcards": [{"front": "Old", "back": "Card"}],
+    "mermaid": "graph TD; A-->B",
+}
+
+
+class _LLM:
+    """Answers every subtopic prompt with a new explanation, except for `failing` ones."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.subtopics = []
+
+    def invoke(self, input_vars, **kwargs):
+        self.subtopics.append(input_vars["subtopic"])
+        return "" if input_vars["subtopic"] in self.failing else f"New {input_vars['subtopic'].lower()}."
+
+
+@pytest.fixture
+def generators(monkeypatch):
+    """Stubs the quiz, flashcard and diagram generators; records which ones ran."""
+    ran = []
+
+    def generator(name, result):
+        def generate(*args):
+            ran.append(name)
+            return result
+        return generate
+
+    monkeypatch.setattr(agent, "generate_quiz_for_topic", generator("quiz", [{"question": "New?"}]))
+    monkeypatch.setattr(agent, "generate_flashcards_for_topic", generator("flashcards", [{"front": "New"}]))
+    monkeypatch.setattr(agent, "_generate_module_diagram", generator("diagram", "graph TD; C-->D"))
+    return ran
+
+
+def test_only_the_requested_parts_are_regenerated(generators, monkeypatch):
+    llm = _LLM()
+    monkeypatch.setattr(agent, "llm_client", llm)
+
+    parts = agent.regenerate_module_parts("Loops", MODULE, ["While"], quiz=True)
+
+    assert llm.subtopics == ["While"]
+    assert generators == ["quiz"]
+    # "While" has a video, so its marker is kept in the new text
+    assert parts == {"explanations": {"While": "New while.\n\n[[VIDEO_1]]"}, "quiz": [{"question": "New?"}]}
+
+
+def test_failed_parts_are_left_out(generators, monkeypatch):
+    monkeypatch.setattr(agent, "llm_client", _LLM(failing=["For"]))
+    monkeypatch.setattr(agent, "_generate_module_diagram", lambda *args: "")
+
+    parts = agent.regenerate_module_parts("Loops", MODULE, ["For", "Break"], diagram=True)
+
+    assert parts == {"explanations": {"Break": "New break."}}
+
+
+class _Request:
+    async def is_disconnected(self):
+        return False
+
+
+@pytest.fixture
+def stored(courses, monkeypatch):
+    monkeypatch.setattr(course_router, "courses_collection", courses)
+    courses.sync.insert_one({
+        "course_id": "c1",
+        "user_id": "u1",
+        "course_data": {"title": "Python", "modules": {"Loops": dict(MODULE)}},
+    })
+    return lambda: decompress_module(courses.sync.find_one({"course_id": "c1"})["course_data"]["modules"]["Loops"])
+
+
+def _regenerate_parts(**selection):
+    req = course_router.PartialRegenerateRequest(module_title="Loops", **selection)
+    return asyncio.run(course_router.regenerate_parts("c1", req, _Request(), Response(), None, "u1"))
+
+
+def test_endpoint_merges_the_regenerated_parts(stored, generators, monkeypatch):
+    monkeypatch.setattr(agent, "llm_client", _LLM())
+
+    body = _regenerate_parts(subtopics=["Break"], flashcards=True)
+
+    assert body["regenerated"] == {"subtopics": ["Break"], "quiz": False, "flashcards": True, "diagram": False}
+    module = stored()
+    assert module["explanations"] == {"For": "Old for.", "While": "Old while.", "Break": "New break."}
+    assert module["flashcards"] == [{"front": "New"}]
+    assert module["quiz"] == MODULE["quiz"] and module["mermaid"] == MODULE["mermaid"]
+    assert module["revision"] == 1
+
+
+@pytest.mark.parametrize("selection", [{}, {"subtopics": ["Break", "Continue"]}])
+def test_endpoint_rejects_unknown_or_empty_selections(stored, generators, monkeypatch, selection):
+    llm = _LLM()
+    monkeypatch.setattr(agent, "llm_client", llm)
+
+    with pytest.raises(HTTPException) as rejected:
+        _regenerate_parts(**selection)
+
+    assert rejected.value.status_code == 400
+    assert "Continue" in rejected.value.detail or not selection
+    assert llm.subtopics == [] and generators == []
+    assert stored()["explanations"] == MODULE["explanations"]
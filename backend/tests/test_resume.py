@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+import routers.course as course_router
+from core.compression import decompress_course
+from core.course_store import module_update
+
+OPTIONS = {"prefetch": False, "lazy_assessments": False, "depth": "standard", "shared_cache": True}
+
+
+def _module(topic, note=""):
+    return {"module_title": topic, "explanations": {"Overview": f"About {topic}{note}"}}
+
+
+@pytest.fixture
+def stored(courses, monkeypatch):
+    monkeypatch.setattr(course_router, "courses_collection", courses)
+    return lambda: decompress_course(courses.sync.find_one({"course_id": "c1"}))
+
+
+def _resume(values, updates):
+    async def chunks():
+        for chunk in updates:
+            yield chunk
+
+    async def collect():
+        resumed = {"values": values, "next": ["generate_module"]}
+        return [
+            event async for event in course_router._course_event_stream(
+                "c1", "u1", "learn python", OPTIONS, chunks(), resumed=resumed
+            )
+        ]
+    return asyncio.run(collect())
+
+
+def test_resume_saves_course_lost_with_the_worker(stored):
+    values = {
+        "enhanced_prompt": "Python Basics",
+        "topics": ["Variables", "Loops"],
+        "generated_modules": {"Variables": _module("Variables")},
+    }
+    finished = {"Variables": _module("Variables"), "Loops": _module("Loops")}
+
+    events = _resume(values, [{"generate_module": {"generated_modules": finished}}])
+
+    assert [e["data"]["module_title"] for e in events if e["type"] == "module"] == ["Variables", "Loops"]
+    doc = stored()
+    assert doc["user_id"] == "u1"
+    assert doc["course_data"]["topics"] == ["Variables", "Loops"]
+    assert doc["course_data"]["pending_topics"] == []
+    assert doc["course_data"]["modules"] == finished
+
+
+def test_resume_keeps_modules_already_stored(stored, courses):
+    values = {
+        "enhanced_prompt": "Python Basics",
+        "topics": ["Variables", "Loops"],
+        "generated_modules": {"Variables": _module("Variables")},
+    }
+    asyncio.run(course_router._save_outline("c1", "u1", "learn python", "Python Basics", values["topics"], OPTIONS))
+    asyncio.run(courses.update_one(
+        {"course_id": "c1"}, module_update("Variables", _module("Variables", " (regenerated)"), pull_pending=True)
+    ))
+
+    _resume(values, [])
+
+    doc = stored()
+    assert doc["course_data"]["modules"]["Variables"] == _module("Variables", " (regenerated)")
+    assert doc["course_data"]["pending_topics"] == ["Loops"]
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException, Response
+
+import routers.course as course_router
+from core.compression import decompress_module
+
+EXPLANATIONS = {"Overview": "A loop repeats a block of code."}
+
+
+class _Request:
+    async def is_disconnected(self):
+        return False
+
+
+@pytest.fixture
+def stored(courses, monkeypatch):
+    """Stores a course with module "Loops" (`revision` omitted: as written before revisions)."""
+    monkeypatch.setattr(course_router, "courses_collection", courses)
+
+    def store(**module):
+        courses.sync.insert_one({
+            "course_id": "c1",
+            "user_id": "u1",
+            "course_data": {"title": "Python", "modules": {
+                "Loops": {"module_title": "Loops", "explanations": EXPLANATIONS, **module},
+            }},
+        })
+        return lambda: decompress_module(courses.sync.find_one({"course_id": "c1"})["course_data"]["modules"]["Loops"])
+
+    return store
+
+
+def _regenerate(monkeypatch, revision=None, if_match=None, during=None):
+    def regenerate(title, module, course_title=None):
+        if during:
+            during()
+        return {"module_title": title, "explanations": {"Overview": "Loops, in more depth."}}
+
+    monkeypatch.setattr(course_router, "regenerate_module_content", regenerate)
+    response = Response()
+    req = course_router.RegenerateRequest(module_title="Loops", revision=revision)
+    body = asyncio.run(course_router.regenerate_module("c1", req, _Request(), response, if_match, "u1"))
+    return body, response
+
+
+def test_matching_revision_is_regenerated(stored, monkeypatch):
+    module = stored(revision=3)
+
+    body, response = _regenerate(monkeypatch, if_match='"3"')
+
+    assert body["module"]["revision"] == 4
+    assert response.headers["ETag"] == '"4"'
+    assert module()["explanations"] == {"Overview": "Loops, in more depth."}
+    assert module()["revision"] == 4
+
+
+def test_stale_if_match_is_refused(stored, monkeypatch):
+    module = stored(revision=3)
+
+    for precondition in ({"if_match": '"2"'}, {"revision": 2}):
+        with pytest.raises(HTTPException) as refused:
+            _regenerate(monkeypatch, **precondition)
+        assert refused.value.status_code == 412
+        assert refused.value.headers["ETag"] == '"3"'
+    assert module()["explanations"] == EXPLANATIONS
+
+
+def test_module_changed_during_regeneration_conflicts(stored, courses, monkeypatch):
+    module = stored(revision=3)
+
+    def concurrent_edit():
+        courses.sync.update_one({"course_id": "c1"}, {"$set": {"course_data.modules.Loops.revision": 4}})
+
+    with pytest.raises(HTTPException) as conflict:
+        _regenerate(monkeypatch, if_match='"3"', during=concurrent_edit)
+    assert conflict.value.status_code == 409
+    assert module()["explanations"] == EXPLANATIONS
+    assert module()["revision"] == 4
+
+
+def test_module_from_before_revisions_is_revision_zero(stored, monkeypatch):
+    module = stored()
+
+    with pytest.raises(HTTPException) as refused:
+        _regenerate(monkeypatch, if_match='"1"')
+    assert refused.value.headers["ETag"] == '"0"'
+
+    body, _ = _regenerate(monkeypatch, if_match='W/"0"')
+    assert body["module"]["revision"] == 1
+    assert module()["revision"] == 1
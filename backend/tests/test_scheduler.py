@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+from core.scheduler import FairScheduler, Priority
+
+
+async def _dispatch_order(scheduler, requests):
+    """
+    Holds the only slot while `requests` ((name, user, priority) tuples) queue
+    up, then lets them through one at a time and returns the order they ran in.
+    """
+    order = []
+
+    async def work(name, user_id, priority):
+        async with scheduler.slot(user_id, priority):
+            order.append(name)
+
+    await scheduler.acquire("holder", Priority.FIRST_MODULE)
+    tasks = [asyncio.create_task(work(*request)) for request in requests]
+    await asyncio.sleep(0)  # every request is queued
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_more_urgent_classes_go_first():
+    requests = [
+        ("batch", "u1", Priority.BATCH),
+        ("prefetch", "u1", Priority.PREFETCH),
+        ("next", "u2", Priority.NEXT_MODULE),
+        ("first", "u3", Priority.FIRST_MODULE),
+        ("regenerate", "u1", Priority.REGENERATE),
+    ]
+    order = asyncio.run(_dispatch_order(FairScheduler(concurrency=1), requests))
+    assert order == ["first", "next", "regenerate", "prefetch", "batch"]
+
+
+def test_users_take_turns_within_a_class():
+    # u1 bulk-submits before u2 asks for anything
+    requests = [(f"u1-{i}", "u1", Priority.PREFETCH) for i in range(4)]
+    requests += [(f"u2-{i}", "u2", Priority.PREFETCH) for i in range(2)]
+
+    order = asyncio.run(_dispatch_order(FairScheduler(concurrency=1), requests))
+    assert order == ["u1-0", "u2-0", "u1-1", "u2-1", "u1-2", "u1-3"]
+
+
+def test_weights_scale_a_users_share():
+    requests = [(f"u1-{i}", "u1", Priority.PREFETCH) for i in range(3)]
+    requests += [(f"u2-{i}", "u2", Priority.PREFETCH) for i in range(4)]
+
+    scheduler = FairScheduler(concurrency=1, weights={"u2": 2})
+    order = asyncio.run(_dispatch_order(scheduler, requests))
+    assert order == ["u1-0", "u2-0", "u2-1", "u1-1", "u2-2", "u2-3", "u1-2"]
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    scheduler = FairScheduler(concurrency=1)
+
+    async def scenario():
+        order = []
+
+        async def work(name):
+            async with scheduler.slot(name, Priority.PREFETCH):
+                order.append(name)
+
+        await scheduler.acquire("holder", Priority.FIRST_MODULE)
+        doomed = asyncio.create_task(work("doomed"))
+        kept = asyncio.create_task(work("kept"))
+        await asyncio.sleep(0)
+        doomed.cancel()
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth() == 1
+
+        scheduler.release()
+        await kept
+        with pytest.raises(asyncio.CancelledError):
+            await doomed
+        return order
+
+    assert asyncio.run(scenario()) == ["kept"]
+    assert scheduler._active == 0
+
+
+def test_slot_granted_to_a_cancelled_waiter_is_handed_on():
+    scheduler = FairScheduler(concurrency=1)
+
+    async def scenario():
+        order = []
+
+        async def work(name):
+            async with scheduler.slot(name, Priority.PREFETCH):
+                order.append(name)
+
+        await scheduler.acquire("holder", Priority.FIRST_MODULE)
+        doomed = asyncio.create_task(work("doomed"))
+        kept = asyncio.create_task(work("kept"))
+        await asyncio.sleep(0)
+        # The slot goes to "doomed", which is cancelled before it can run
+        scheduler.release()
+        doomed.cancel()
+
+        await kept
+        with pytest.raises(asyncio.CancelledError):
+            await doomed
+        return order
+
+    assert asyncio.run(scenario()) == ["kept"]
+    assert scheduler._active == 0
+
+
+def test_failing_work_releases_its_slot():
+    scheduler = FairScheduler(concurrency=1)
+
+    def fail():
+        raise RuntimeError("LLM call failed")
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await scheduler.run("u1", Priority.NEXT_MODULE, fail)
+        return await scheduler.run("u1", Priority.NEXT_MODULE, lambda: "done")
+
+    assert asyncio.run(scenario()) == "done"
+    assert scheduler._active == 0
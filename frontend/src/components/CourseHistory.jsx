@@ -9,24 +9,32 @@ export default function CourseHistory({ onSelectCourse }) {
     const [courses, setCourses] = useState([]);
     const [loading, setLoading] = useState(true);
 
-    const fetchCourses = async () => {
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
+
+    // One page of course summaries; `cursor` continues after the previous page
+    const fetchCourses = async (cursor = null) => {
         const headers = getAuthHeaders();
         if (!headers.Authorization) return;
 
         try {
-            setLoading(true);
-            const res = await fetch(`${API_BASE}/course/list/all`, { headers });
+            cursor ? setLoadingMore(true) : setLoading(true);
+            const params = new URLSearchParams({ limit: "20" });
+            if (cursor) params.set("cursor", cursor);
+            const res = await fetch(`${API_BASE}/course/list?${params}`, { headers });
             if (res.status === 401) {
                 logout();
                 throw new Error("Unauthorized");
             }
             if (!res.ok) throw new Error("Failed to fetch");
             const data = await res.json();
-            setCourses(data);
+            setCourses((prev) => (cursor ? [...prev, ...data.courses] : data.courses));
+            setNextCursor(data.next_cursor);
         } catch (err) {
             console.error(err);
         } finally {
             setLoading(false);
+            setLoadingMore(false);
         }
     };
 
@@ -71,7 +79,7 @@ export default function CourseHistory({ onSelectCourse }) {
                     return (
                         <button
                             key={course.course_id}
-                            onClick={() => onSelectCourse({ ...course.course_data, course_id: course.course_id })}
+                            onClick={() => onSelectCourse({ course_id: course.course_id })}
                             className="w-full text-left p-4 rounded-xl hover:bg-neutral-900 transition-all duration-200 border border-transparent hover:border-neutral-800 group relative overflow-hidden"
                         >
                             <div className="relative z-10">
@@ -89,6 +97,16 @@ export default function CourseHistory({ onSelectCourse }) {
                         </button>
                     );
                 })}
+
+                {!loading && nextCursor && (
+                    <button
+                        onClick={() => fetchCourses(nextCursor)}
+                        disabled={loadingMore}
+                        className="w-full p-3 rounded-xl text-xs text-neutral-500 hover:text-white hover:bg-neutral-900 transition-colors disabled:opacity-50"
+                    >
+                        {loadingMore ? "Loading..." : "Load more"}
+                    </button>
+                )}
             </div>
         </div>
     );
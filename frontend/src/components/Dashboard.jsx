@@ -24,12 +24,20 @@ export default function Dashboard({ onResumeCourse }) {
         try {
             setLoading(true);
             const headers = getAuthHeaders();
-            const res = await fetch(`${API_BASE}/course/list/all`, { headers });
-            if (res.ok) {
-                const data = await res.json();
-                processData(data);
-                setCourses(data);
-            }
+            // Stats cover every course: walk all pages of the (summary-only) list
+            const data = [];
+            let cursor = null;
+            do {
+                const params = new URLSearchParams({ limit: "100" });
+                if (cursor) params.set("cursor", cursor);
+                const res = await fetch(`${API_BASE}/course/list?${params}`, { headers });
+                if (!res.ok) break;
+                const page = await res.json();
+                data.push(...page.courses);
+                cursor = page.next_cursor;
+            } while (cursor);
+            processData(data);
+            setCourses(data);
         } catch (err) {
             console.error("Failed to fetch dashboard data", err);
         } finally {
@@ -45,7 +53,7 @@ export default function Dashboard({ onResumeCourse }) {
         let scoreCount = 0;
 
         data.forEach(course => {
-            const modules = course.course_data?.modules ? Object.keys(course.course_data.modules).length : 0;
+            const modules = course.module_count || 0;
             const progress = course.course_progress || { completed_modules: [], quiz_scores: {} };
             const done = progress.completed_modules.length;
 
@@ -87,7 +95,7 @@ export default function Dashboard({ onResumeCourse }) {
 
     const lastCourse = getLastActiveCourse();
     const lastCourseProgress = lastCourse?.course_progress || { completed_modules: [] };
-    const lastCourseTotalModules = lastCourse?.course_data?.modules ? Object.keys(lastCourse.course_data.modules).length : 0;
+    const lastCourseTotalModules = lastCourse?.module_count || 0;
 
     if (loading) {
         return (
@@ -129,7 +137,7 @@ export default function Dashboard({ onResumeCourse }) {
                             </p>
                         </div>
                         <button
-                            onClick={() => onResumeCourse({ ...lastCourse.course_data, course_id: lastCourse.course_id })}
+                            onClick={() => onResumeCourse({ course_id: lastCourse.course_id })}
                             className="bg-white text-black px-6 py-3 rounded-xl font-bold hover:bg-neutral-200 transition-all flex items-center gap-2 shadow-lg hover:shadow-white/10"
                         >
                             <PlayCircle className="w-5 h-5" />
@@ -178,7 +186,7 @@ export default function Dashboard({ onResumeCourse }) {
                 <div className="grid grid-cols-1 gap-4">
                     {courses.map(course => {
                         const progress = course.course_progress || { completed_modules: [] };
-                        const total = course.course_data?.modules ? Object.keys(course.course_data.modules).length : 0;
+                        const total = course.module_count || 0;
                         const completed = progress.completed_modules.length;
                         const percent = total ? Math.round((completed / total) * 100) : 0;
 
@@ -222,7 +230,7 @@ export default function Dashboard({ onResumeCourse }) {
                                         </div>
                                     </div>
                                     <button
-                                        onClick={() => onResumeCourse({ ...course.course_data, course_id: course.course_id })}
+                                        onClick={() => onResumeCourse({ course_id: course.course_id })}
                                         className="px-4 py-2 bg-neutral-800 text-white rounded-lg text-sm font-medium hover:bg-white hover:text-black transition-colors"
                                     >
                                         Resume
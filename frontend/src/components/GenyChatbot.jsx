@@ -22,23 +22,35 @@ export default function GenyChatbot({ courseId }) {
         if (isOpen) scrollToBottom();
     }, [history, isOpen]);
 
+    const [earlierCursor, setEarlierCursor] = useState(null);
+
+    // Latest page of the conversation (newest first from the API), or the
+    // page before `cursor` when loading earlier messages
+    const fetchMessages = async (cursor = null) => {
+        const params = new URLSearchParams({ limit: "50" });
+        if (cursor) params.set("cursor", cursor);
+        const res = await fetch(`${API_BASE}/chat/${courseId}/messages?${params}`, {
+            headers: getAuthHeaders()
+        });
+        if (!res.ok) return null;
+        const data = await res.json();
+        setEarlierCursor(data.next_cursor);
+        return [...data.messages].reverse();
+    };
+
     // Fetch history when courseId changes
     useEffect(() => {
         const fetchHistory = async () => {
             if (!courseId) return;
             try {
-                const res = await fetch(`${API_BASE}/chat/history/${courseId}`, {
-                    headers: getAuthHeaders()
-                });
-                if (res.ok) {
-                    const data = await res.json();
-                    if (data && data.length > 0) {
-                        setHistory(data);
-                    } else {
-                        setHistory([
-                            { role: 'assistant', content: "Hello! I'm Geny, your AI learning assistant. Ask me anything about your course!" }
-                        ]);
-                    }
+                const messages = await fetchMessages();
+                if (messages === null) return;
+                if (messages.length > 0) {
+                    setHistory(messages);
+                } else {
+                    setHistory([
+                        { role: 'assistant', content: "Hello! I'm Geny, your AI learning assistant. Ask me anything about your course!" }
+                    ]);
                 }
             } catch (err) {
                 console.error("Failed to fetch chat history:", err);
@@ -48,6 +60,15 @@ export default function GenyChatbot({ courseId }) {
         fetchHistory();
     }, [courseId]);
 
+    const loadEarlier = async () => {
+        try {
+            const messages = await fetchMessages(earlierCursor);
+            if (messages) setHistory(prev => [...messages, ...prev]);
+        } catch (err) {
+            console.error("Failed to fetch chat history:", err);
+        }
+    };
+
     const handleSend = async (e) => {
         if (e) e.preventDefault();
         if (!message.trim() || loading) return;
@@ -108,6 +129,14 @@ export default function GenyChatbot({ courseId }) {
 
                     {/* Messages */}
                     <div className="flex-1 overflow-y-auto p-6 space-y-4 bg-[#0A0A0A] custom-scrollbar">
+                        {earlierCursor && (
+                            <button
+                                onClick={loadEarlier}
+                                className="w-full text-center text-xs text-neutral-500 hover:text-white transition-colors"
+                            >
+                                Load earlier messages
+                            </button>
+                        )}
                         {history.map((msg, i) => (
                             <div key={i} className={`flex ${msg.role === 'user' ? 'justify-end' : 'justify-start'} animate-fade-in`}>
                                 <div className={`flex gap-3 max-w-[85%] ${msg.role === 'user' ? 'flex-row-reverse' : 'flex-row'}`}>
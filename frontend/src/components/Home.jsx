@@ -77,7 +77,12 @@ export default function Home() {
   }
 
   function handleSelectCourse(courseData) {
-    setCourse(courseData);
+    // Course lists only hold summaries: load the full course unless we have it
+    if (courseData.modules) {
+      setCourse(courseData);
+    } else {
+      fetchCourse(courseData.course_id);
+    }
     setPrompt("");
     setShowInput(false);
     setView("main");
@@ -34,7 +34,7 @@ export function ModuleCard({ title, data, index, courseId, onQuizComplete, isGen
                 },
                 body: JSON.stringify({
                     module_title: title,
-                    original_data: currentData
+                    revision: currentData?.revision ?? 0
                 })
             });
 
@@ -64,8 +64,10 @@ export function useCourseStream(getAuthHeaders, logout) {
                             setCourse(finalCourse);
                             setLoading(false);
                             if (onComplete) onComplete(finalCourse);
-                        } else if (event.type === "error") {
-                            const msg = event.message || "An error occurred during course generation";
+                        } else if (event.type === "error" || event.type === "cancelled") {
+                            const msg = event.message || (event.type === "cancelled"
+                                ? "Course generation was cancelled"
+                                : "An error occurred during course generation");
                             setError(msg);
                             setLoading(false);
                             setStatus("");
@@ -76,6 +78,9 @@ export function useCourseStream(getAuthHeaders, logout) {
                     }
                 }
             }
+            // The stream ended without a final event (e.g. the server went away)
+            setLoading(false);
+            setStatus("");
         } catch (err) {
             setError(err.message || "Failed to generate course");
             setLoading(false);